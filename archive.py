@@ -0,0 +1,236 @@
+"""
+Перенос закрытых периодов в архив
+
+Почти все чтения идут на текущую дату, но запросы каждый раз отбрасывают
+периоды, закончившиеся десятилетия назад. Задача архивации переносит периоды
+значений и связей, закончившиеся раньше границы (сегодня минус
+settings.archive_horizon_days), в таблицы dictionary_data_history и
+dictionary_relations_history того же состава. Граница сохраняется
+в dictionary.archived_before: чтения на даты не раньше нее обращаются только
+к основным таблицам, на более ранние - добавляют архив (см. models/model_query.py).
+
+Сначала сдвигается граница и рассылается уведомление об изменении, затем
+строки переносятся пачками по settings.archive_batch_size. Каждая пачка
+удаляется и вставляется в архив одним запросом, поэтому при чтении с архивом
+строка видна ровно один раз, а воркер, еще не получивший новую границу,
+читает основные таблицы, где строки пока есть.
+
+    python -m archive --dictionary 5 7
+    python -m archive --all --horizon-days 730
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+import queries
+from change_feed import change_feed
+from config import settings
+from database import database
+from logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ArchiveReport:
+    """
+    Результат архивации справочника
+    """
+
+    dictionary_id: int
+    archived_before: Optional[datetime.date] = None
+    data_rows: int = 0
+    relation_rows: int = 0
+    duration: float = 0.0
+
+
+class Archiver:
+    """
+    Перенос периодов, закончившихся до границы, в таблицы *_history
+    """
+
+    # Граница только сдвигается вперед: уже перенесенные строки не возвращаются
+    BOUNDARY_SQL = """
+        UPDATE dictionary
+        SET archived_before = greatest(archived_before, :before)
+        WHERE id = :id_dictionary
+        RETURNING archived_before
+    """
+
+    MOVE_DATA_SQL = """
+        WITH moved AS (
+            DELETE FROM dictionary_data
+            WHERE id_dictionary = :id_dictionary
+                AND id IN (
+                    SELECT id FROM dictionary_data
+                    WHERE id_dictionary = :id_dictionary
+                        AND finish_date < :before
+                    LIMIT :limit
+                )
+            RETURNING id, id_dictionary, id_position, id_attribute, value,
+                start_date, finish_date
+        ),
+        archived AS (
+            INSERT INTO dictionary_data_history
+            (id, id_dictionary, id_position, id_attribute, value, start_date,
+            finish_date)
+            SELECT * FROM moved
+            RETURNING 1
+        )
+        SELECT count(*) FROM archived
+    """
+
+    MOVE_RELATIONS_SQL = """
+        WITH moved AS (
+            DELETE FROM dictionary_relations
+            WHERE id IN (
+                SELECT dr.id FROM dictionary_relations dr
+                JOIN dictionary_positions dp ON dp.id = dr.id_positions
+                WHERE dp.id_dictionary = :id_dictionary
+                    AND dr.finish_date < :before
+                LIMIT :limit
+            )
+            RETURNING id, id_positions, id_parent_positions, start_date,
+                finish_date
+        ),
+        archived AS (
+            INSERT INTO dictionary_relations_history
+            (id, id_positions, id_parent_positions, start_date, finish_date)
+            SELECT * FROM moved
+            RETURNING 1
+        )
+        SELECT count(*) FROM archived
+    """
+
+    def __init__(self, horizon_days: int, batch_size: int, pause: float):
+        self.horizon_days = horizon_days
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+
+    def boundary(self, today: Optional[datetime.date] = None) -> datetime.date:
+        """Граница архива: периоды, закончившиеся раньше нее, переносятся"""
+        today = today or datetime.date.today()
+        return today - datetime.timedelta(days=self.horizon_days)
+
+    async def archive_dictionary(
+        self, dictionary_id: int, before: datetime.date
+    ) -> ArchiveReport:
+        """
+        Архивация одного справочника
+        :param dictionary_id: идентификатор справочника
+        :param before: граница архива
+        :return: отчет с числом перенесенных строк
+        """
+        started = time.perf_counter()
+        report = ArchiveReport(dictionary_id)
+        values = {"id_dictionary": dictionary_id, "before": before}
+        row = await queries.statement("archive.boundary", self.BOUNDARY_SQL).fetch_one(
+            values
+        )
+        if row is None:
+            raise LookupError(f"Dictionary {dictionary_id} not found")
+        report.archived_before = row["archived_before"]
+        await change_feed.publish(dictionary_id)
+
+        values = {
+            **values,
+            "before": report.archived_before,
+            "limit": self.batch_size,
+        }
+        report.data_rows = await self._move(
+            queries.statement("archive.move_data", self.MOVE_DATA_SQL), values
+        )
+        report.relation_rows = await self._move(
+            queries.statement("archive.move_relations", self.MOVE_RELATIONS_SQL),
+            values,
+        )
+        report.duration = time.perf_counter() - started
+        logger.info(
+            "Archived dictionary %d before %s: %d values, %d relations in %.1fs",
+            dictionary_id,
+            report.archived_before,
+            report.data_rows,
+            report.relation_rows,
+            report.duration,
+        )
+        return report
+
+    async def archive(
+        self, dictionary_ids: Optional[List[int]] = None
+    ) -> List[ArchiveReport]:
+        """
+        Архивация нескольких справочников по очереди
+        :param dictionary_ids: идентификаторы справочников (None - все)
+        :return: отчеты по справочникам
+        """
+        if dictionary_ids is None:
+            rows = await queries.statement(
+                "archive.dictionaries", "SELECT id FROM dictionary ORDER BY id"
+            ).fetch_all()
+            dictionary_ids = [row["id"] for row in rows]
+        before = self.boundary()
+        return [
+            await self.archive_dictionary(dictionary_id, before)
+            for dictionary_id in dictionary_ids
+        ]
+
+    async def _move(self, statement: queries.Statement, values: dict) -> int:
+        """Перенос пачками, пока есть что переносить"""
+        total = 0
+        while True:
+            moved = await statement.fetch_val(values)
+            total += moved
+            if moved < self.batch_size:
+                return total
+            if self.pause:
+                await asyncio.sleep(self.pause)
+
+
+archiver = Archiver(
+    settings.archive_horizon_days, settings.archive_batch_size, settings.archive_pause
+)
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--dictionary", type=int, nargs="+")
+    target.add_argument("--all", action="store_true")
+    parser.add_argument(
+        "--horizon-days", type=int, default=settings.archive_horizon_days
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.archive_batch_size)
+    parser.add_argument("--pause", type=float, default=settings.archive_pause)
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> List[ArchiveReport]:
+    await database.connect()
+    try:
+        return await Archiver(args.horizon_days, args.batch_size, args.pause).archive(
+            None if args.all else args.dictionary
+        )
+    finally:
+        await database.disconnect()
+
+
+def main(argv: List[str] | None = None) -> None:
+    setup_logging()
+    reports = asyncio.run(run(parse_args(argv)))
+    print(
+        json.dumps(
+            {"dictionaries": [asdict(report) for report in reports]},
+            indent=2,
+            default=str,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
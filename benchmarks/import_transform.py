@@ -0,0 +1,101 @@
+"""
+Замер преобразования файла импорта в строки dictionary_data (без базы данных)
+
+Сравнивает прежний построчный цикл (iterrows) с векторным преобразованием
+AttributeManager._to_long_format на синтетическом файле импорта:
+
+    python -m benchmarks.import_transform --positions 100000 --attributes 12
+
+Результат - JSON со скоростью (строк файла в секунду) обоих вариантов.
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from benchmarks.run import summarize
+from benchmarks.seed import SeedParams, import_frame
+from models.model_attribute import AttributeManager
+
+
+def iterrows_transform(
+    rows: pd.DataFrame, position_ids: List[int], attributes_info: Dict[str, Dict]
+) -> List[Dict[str, Any]]:
+    """Прежнее преобразование: цикл по строкам и ячейкам"""
+    data = []
+    valid_attributes = set(attributes_info.keys()) & set(rows.columns)
+    for idx, (_, row) in enumerate(rows.iterrows()):
+        position_id = position_ids[idx]
+        for attr in valid_attributes:
+            value = str(row[attr])
+            clean_value = (
+                None if value.strip().lower() in AttributeManager.NULL_VALUES else value
+            )
+            data.append(
+                {
+                    "id_position": position_id,
+                    "id_attribute": attributes_info[attr]["id"],
+                    "value": clean_value,
+                }
+            )
+    return data
+
+
+def vectorized_transform(
+    rows: pd.DataFrame, position_ids: List[int], attributes_info: Dict[str, Dict]
+) -> Dict[str, list]:
+    """Векторное преобразование вместе с подготовкой массивов для вставки"""
+    data = AttributeManager._to_long_format(rows, position_ids, attributes_info)
+    return {
+        "id_positions": data["id_position"].tolist(),
+        "id_attributes": data["id_attribute"].tolist(),
+        "values": data["value"].tolist(),
+    }
+
+
+def measure(transform, rows, position_ids, attributes_info, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        transform(rows, position_ids, attributes_info)
+        timings.append(time.perf_counter() - started)
+    summary = summarize(timings)
+    summary["rows_per_second"] = len(rows) / summary["median"]
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--positions", type=int, default=100_000)
+    parser.add_argument("--attributes", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    params = SeedParams(positions=args.positions, attributes=args.attributes)
+    rows = import_frame(params)
+    position_ids = list(range(1, len(rows) + 1))
+    attributes_info = {
+        name: {"id": number} for number, name in enumerate(params.attribute_names, 1)
+    }
+    results = {
+        "positions": args.positions,
+        "attributes": args.attributes,
+        "iterrows": measure(
+            iterrows_transform, rows, position_ids, attributes_info, args.repeat
+        ),
+        "vectorized": measure(
+            vectorized_transform, rows, position_ids, attributes_info, args.repeat
+        ),
+    }
+    results["speedup"] = (
+        results["vectorized"]["rows_per_second"]
+        / results["iterrows"]["rows_per_second"]
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Нагрузочное тестирование API справочников
+
+Генератор открытого цикла: запросы отправляются по расписанию с заданной
+частотой (RPS) независимо от того, успел ли ответить сервер, а задержка
+считается от запланированного момента отправки. Поэтому очередь на стороне
+клиента или сервера попадает в измерения, а не скрывает их.
+
+Запуск против работающего сервиса:
+
+    python -m benchmarks.load --url http://127.0.0.1:8000 --dictionary 1 \\
+        --rps 200 --duration 60
+
+или внутри процесса через ASGITransport (база - по переменным POSTGRES_*):
+
+    python -m benchmarks.load --in-process --dictionary 1 --rps 100 \\
+        --mix dictionary=1,dictionaryValueByCode=5,EditPosition=1
+
+Результат - JSON с p50/p95/p99, долей ошибок и пропускной способностью
+по каждому эндпоинту.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+PREFIX = "/api/v2/models"
+
+
+@dataclass
+class Target:
+    """
+    Данные справочника, по которым строятся запросы
+    """
+
+    dictionary: int
+    date: str
+    codes: List[str]
+    position_ids: List[int]
+
+
+@dataclass(frozen=True)
+class Call:
+    """
+    Вид запроса в смеси нагрузки
+    """
+
+    name: str
+    method: str
+    path: str
+    # Target, генератор случайных чисел -> (params, json)
+    build: Callable[[Target, random.Random], tuple]
+
+
+CALLS = {
+    call.name: call
+    for call in [
+        Call(
+            "dictionary",
+            "GET",
+            "/dictionary/",
+            lambda t, rnd: ({"dictionary": t.dictionary, "date": t.date}, None),
+        ),
+        Call(
+            "dictionaryValueByCode",
+            "GET",
+            "/dictionaryValueByCode/",
+            lambda t, rnd: (
+                {
+                    "dictionary": t.dictionary,
+                    "code": rnd.choice(t.codes),
+                    "date": t.date,
+                },
+                None,
+            ),
+        ),
+        Call(
+            "dictionaryValueByID",
+            "GET",
+            "/dictionaryValueByID",
+            lambda t, rnd: (
+                {
+                    "dictionary": t.dictionary,
+                    "position_id": rnd.choice(t.position_ids),
+                    "date": t.date,
+                },
+                None,
+            ),
+        ),
+        Call(
+            "findDictionaryValue",
+            "GET",
+            "/findDictionaryValue",
+            lambda t, rnd: (
+                {
+                    "dictionary": t.dictionary,
+                    "findstr": rnd.choice(t.codes)[-3:],
+                    "date": t.date,
+                },
+                None,
+            ),
+        ),
+        Call(
+            "structure",
+            "GET",
+            "/structure/",
+            lambda t, rnd: ({"dictionary": t.dictionary}, None),
+        ),
+        Call("list", "GET", "/list", lambda t, rnd: ({}, None)),
+        Call(
+            "EditPosition",
+            "POST",
+            "/EditPosition",
+            lambda t, rnd: (
+                {"position_id": rnd.choice(t.position_ids)},
+                [
+                    {"name": "NAME", "value": f"load {rnd.randrange(1_000_000)}"},
+                    {"name": "START_DATE", "value": t.date},
+                    {"name": "FINISH_DATE", "value": "9999-12-31"},
+                ],
+            ),
+        ),
+    ]
+}
+
+DEFAULT_MIX = {
+    "dictionary": 2,
+    "dictionaryValueByCode": 10,
+    "dictionaryValueByID": 10,
+    "findDictionaryValue": 3,
+    "structure": 3,
+    "list": 1,
+}
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """
+    Перцентиль методом ближайшего ранга
+    :param values: отсортированные значения
+    :param percent: перцентиль, 0..100
+    :return:
+    """
+    if not values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+@dataclass
+class EndpointStats:
+    """
+    Результаты по одному виду запроса
+    """
+
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, latency: float, status: str, failed: bool) -> None:
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.errors += failed
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "throughput": count / elapsed if elapsed else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+            "statuses": self.statuses,
+        }
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """
+    Разбор смеси запросов вида "dictionary=1,EditPosition=0.5"
+    :param text: описание смеси
+    :return: имя запроса -> вес
+    """
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in CALLS:
+            raise ValueError(f"Unknown call {name!r}, expected one of {list(CALLS)}")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("Mix must contain a call with positive weight")
+    return mix
+
+
+async def load_target(client: httpx.AsyncClient, dictionary: int, date: str):
+    """Коды и идентификаторы позиций справочника для построения запросов"""
+    response = await client.get(
+        f"{PREFIX}/dictionary/", params={"dictionary": dictionary, "date": date}
+    )
+    response.raise_for_status()
+    codes, position_ids = [], []
+    for position in response.json():
+        position_ids.append(position["id"])
+        for attr in position["attrs"]:
+            if attr["name"] == "CODE" and attr["value"]:
+                codes.append(attr["value"])
+    if not position_ids:
+        raise RuntimeError(f"Dictionary {dictionary} has no positions on {date}")
+    return Target(dictionary, date, codes or ["0"], position_ids)
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    target: Target,
+    mix: Dict[str, float],
+    rps: float,
+    duration: float,
+    concurrency: int,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Подача нагрузки
+    :param client: http-клиент
+    :param target: данные справочника
+    :param mix: смесь запросов
+    :param rps: целевая частота запросов
+    :param duration: длительность, с
+    :param concurrency: максимальное количество запросов в полете
+    :param seed: начальное значение генератора случайных чисел
+    :return: отчет
+    """
+    rnd = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stats = {name: EndpointStats() for name in names}
+    slots = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    async def send(call: Call, scheduled: float) -> None:
+        params, body = call.build(target, rnd)
+        async with slots:
+            try:
+                response = await client.request(
+                    call.method, PREFIX + call.path, params=params, json=body
+                )
+                status = str(response.status_code)
+                failed = response.status_code >= 400
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+                failed = True
+        stats[call.name].add(time.perf_counter() - scheduled, status, failed)
+
+    started = time.perf_counter()
+    total = int(rps * duration)
+    for index in range(total):
+        scheduled = started + index / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        call = CALLS[rnd.choices(names, weights)[0]]
+        tasks.append(asyncio.create_task(send(call, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    overall = EndpointStats()
+    for item in stats.values():
+        overall.latencies.extend(item.latencies)
+        overall.errors += item.errors
+        for status, count in item.statuses.items():
+            overall.statuses[status] = overall.statuses.get(status, 0) + count
+    return {
+        "elapsed": elapsed,
+        "target_rps": rps,
+        "achieved_rps": total / elapsed if elapsed else 0.0,
+        "endpoints": {name: item.report(elapsed) for name, item in stats.items()},
+        "total": overall.report(elapsed),
+    }
+
+
+@contextlib.asynccontextmanager
+async def open_client(args: argparse.Namespace):
+    """Клиент к сервису по URL или к приложению внутри процесса"""
+    limits = httpx.Limits(max_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    if not args.in_process:
+        async with httpx.AsyncClient(
+            base_url=args.url, limits=limits, timeout=timeout
+        ) as client:
+            yield client
+        return
+
+    from main import app, lifespan  # pylint: disable=import-outside-toplevel
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load", timeout=timeout
+        ) as client:
+            yield client
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix) if args.mix else dict(DEFAULT_MIX)
+    async with open_client(args) as client:
+        target = await load_target(client, args.dictionary, args.date)
+        report = await run_load(
+            client, target, mix, args.rps, args.duration, args.concurrency, args.seed
+        )
+    report["params"] = {
+        "url": "in-process" if args.in_process else args.url,
+        "dictionary": args.dictionary,
+        "date": args.date,
+        "mix": mix,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+    }
+    return report
+
+
+def print_summary(report: Dict[str, Any]) -> None:
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    print(
+        f"{'endpoint':<24}{'req':>8}{'err%':>8}{'rps':>9}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+        file=sys.stderr,
+    )
+    for name, item in rows:
+
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.1f}"
+
+        print(
+            f"{name:<24}{item['requests']:>8}{item['error_rate'] * 100:>8.1f}"
+            f"{item['throughput']:>9.1f}{ms(item['p50']):>10}"
+            f"{ms(item['p95']):>10}{ms(item['p99']):>10}",
+            file=sys.stderr,
+        )
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--url", help="адрес работающего сервиса")
+    where.add_argument(
+        "--in-process", action="store_true", help="приложение внутри процесса"
+    )
+    parser.add_argument("--dictionary", type=int, required=True)
+    parser.add_argument("--date", default=datetime.date.today().isoformat())
+    parser.add_argument(
+        "--mix", help=f"смесь запросов имя=вес через запятую, имена: {list(CALLS)}"
+    )
+    parser.add_argument("--rps", type=float, default=50.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="файл результата (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+    if args.rps <= 0 or args.duration <= 0 or args.concurrency <= 0:
+        parser.error("--rps, --duration and --concurrency must be positive")
+    return args
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(main_async(args))
+    print_summary(report)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
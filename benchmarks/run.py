@@ -0,0 +1,259 @@
+"""
+Замеры производительности операций со справочниками
+
+Запуск (из корня репозитория, база задается переменными POSTGRES_* как
+для сервиса; используйте отдельную локальную базу - скрипт создает и удаляет
+справочники):
+
+    python -m benchmarks.run --positions 10000 --attributes 8 --periods 3 \\
+        --depth 4 --repeat 5 --output bench.json
+
+Результат - JSON с параметрами, текущим коммитом и временем каждой операции
+(min/median/mean/max в секундах), пригодный для сравнения между коммитами.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks.seed import (
+    SeedParams,
+    create_dictionary,
+    drop_dictionary,
+    import_frame,
+    position_code,
+    seed_dictionary,
+)
+from database import database
+from models.model_attribute import AttributeManager
+from models.model_dictionary import DictionaryService
+from schemas import AttrShown
+
+BENCHMARKS = [
+    "get_dictionary_values",
+    "get_dictionary_position_by_code",
+    "get_dictionary_position_by_id",
+    "find_dictionary_position_by_expression",
+    "import_data",
+    "edit_position",
+    "generate_relations_for_dictionary",
+]
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """
+    Сводка по замерам
+    :param timings: время выполнения, с
+    :return:
+    """
+    return {
+        "runs": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+    }
+
+
+async def measure(
+    operation: Callable[[int], Awaitable[Any]], repeat: int, warmup: int
+) -> Dict[str, Any]:
+    """
+    Замер операции
+    :param operation: операция, получает номер запуска
+    :param repeat: количество замеряемых запусков
+    :param warmup: количество запусков без замера
+    :return: сводка и количество строк результата последнего запуска
+    """
+    timings = []
+    result = None
+    for run in range(warmup + repeat):
+        started = time.perf_counter()
+        result = await operation(run)
+        elapsed = time.perf_counter() - started
+        if run >= warmup:
+            timings.append(elapsed)
+    summary = summarize(timings)
+    if isinstance(result, list):
+        summary["rows"] = len(result)
+    return summary
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    params = SeedParams(
+        positions=args.positions,
+        attributes=args.attributes,
+        periods=args.periods,
+        depth=args.depth,
+    )
+    selected = args.only or BENCHMARKS
+    date = params.current_date
+    started = datetime.datetime.now()
+    created = []
+    results: Dict[str, Any] = {}
+
+    await database.connect()
+    try:
+        seed_started = time.perf_counter()
+        dictionary_id = await seed_dictionary(
+            params, f"benchmark {started:%Y%m%d%H%M%S}"
+        )
+        created.append(dictionary_id)
+        seed_time = time.perf_counter() - seed_started
+        positions = [
+            row["id"]
+            for row in await database.fetch_all(
+                "select id from dictionary_positions where id_dictionary = :id "
+                "order by id",
+                {"id": dictionary_id},
+            )
+        ]
+
+        def index(run_number: int) -> int:
+            """Номер позиции (k) для запуска: запуски читают разные позиции"""
+            return (run_number * 7919) % len(positions)
+
+        def position(run_number: int) -> int:
+            return positions[index(run_number)]
+
+        operations: Dict[str, Callable[[int], Awaitable[Any]]] = {
+            "get_dictionary_values": lambda number: (
+                DictionaryService.get_dictionary_values(dictionary_id, date)
+            ),
+            "get_dictionary_position_by_code": lambda number: (
+                DictionaryService.get_dictionary_position_by_code(
+                    dictionary_id, position_code(index(number)), date
+                )
+            ),
+            "get_dictionary_position_by_id": lambda number: (
+                DictionaryService.get_dictionary_position_by_id(
+                    dictionary_id, position(number), date
+                )
+            ),
+            "find_dictionary_position_by_expression": lambda number: (
+                DictionaryService.find_dictionary_position_by_expression(
+                    dictionary_id, f"NAME {number}", date
+                )
+            ),
+            "generate_relations_for_dictionary": lambda number: (
+                AttributeManager.generate_relations_for_dictionary(dictionary_id)
+            ),
+        }
+
+        async def edit(run_number: int) -> None:
+            await AttributeManager.edit_position(
+                position(run_number),
+                [
+                    AttrShown(name="NAME", value=f"EDITED {run_number}"),
+                    AttrShown(name="START_DATE", value=date.isoformat()),
+                    AttrShown(
+                        name="FINISH_DATE",
+                        value=(date + datetime.timedelta(days=30)).isoformat(),
+                    ),
+                ],
+            )
+
+        frame = import_frame(
+            SeedParams(
+                positions=args.import_rows or params.positions,
+                attributes=params.attributes,
+                depth=params.depth,
+            )
+        )
+
+        async def import_data(run_number: int) -> None:
+            target = await create_dictionary(params, f"benchmark import {run_number}")
+            created.append(target)
+            await AttributeManager.import_data(target, frame)
+
+        operations["edit_position"] = edit
+        operations["import_data"] = import_data
+
+        for name in BENCHMARKS:
+            if name not in selected:
+                continue
+            print(f"{name}...", file=sys.stderr)
+            results[name] = await measure(operations[name], args.repeat, args.warmup)
+    finally:
+        if not args.keep:
+            for created_id in created:
+                await drop_dictionary(created_id)
+        await database.disconnect()
+
+    return {
+        "commit": current_commit(),
+        "started": started.isoformat(timespec="seconds"),
+        "params": {
+            "positions": params.positions,
+            "attributes": params.attributes,
+            "periods": params.periods,
+            "depth": params.depth,
+            "fanout": params.fanout,
+            "import_rows": len(frame),
+            "date": date.isoformat(),
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+        },
+        "seed_time": seed_time,
+        "results": results,
+    }
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--positions", type=int, default=1000)
+    parser.add_argument("--attributes", type=int, default=6)
+    parser.add_argument("--periods", type=int, default=1)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument(
+        "--import-rows", type=int, help="строк в файле импорта (по умолчанию positions)"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS)
+    parser.add_argument("--output", help="файл результата (по умолчанию stdout)")
+    parser.add_argument(
+        "--keep", action="store_true", help="не удалять созданные справочники"
+    )
+    args = parser.parse_args(argv)
+    if args.attributes < 3:
+        parser.error("--attributes must be at least 3 (CODE, NAME, PARENT_CODE)")
+    if args.positions < 1 or args.periods < 1 or args.depth < 1:
+        parser.error("--positions, --periods and --depth must be positive")
+    return args
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    # Построчные INFO-сообщения моделей искажают замеры
+    logging.disable(logging.INFO)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Заполнение базы синтетическими справочниками для замеров
+
+Данные раскладываются так же, как их раскладывает AttributeManager.import_data:
+позиция в dictionary_positions, по строке dictionary_data на каждый атрибут
+и период, связи с родителем по PARENT_CODE в dictionary_relations.
+
+Атрибуты справочника: CODE, NAME, PARENT_CODE и ATTR_4..ATTR_n. Период k
+длится год, последний период продлевается до 31.12.9999. CODE и PARENT_CODE
+одинаковы во всех периодах, остальные значения меняются от периода к периоду.
+Иерархия: родитель позиции k - позиция (k - 1) // fanout, где fanout подобран
+так, чтобы глубина дерева была равна depth (depth = 1 - плоский справочник).
+"""
+
+import datetime
+import math
+from dataclasses import dataclass
+from typing import List
+
+import pandas as pd
+
+from database import database
+
+BASE_ATTRIBUTES = ["CODE", "NAME", "PARENT_CODE"]
+FINISH_DATE = datetime.date(9999, 12, 31)
+PERIOD_DAYS = 365
+
+
+@dataclass(frozen=True)
+class SeedParams:
+    """
+    Параметры синтетического справочника
+    - **positions**: количество позиций
+    - **attributes**: количество атрибутов (не меньше трех: CODE, NAME, PARENT_CODE)
+    - **periods**: количество периодов значений каждого атрибута
+    - **depth**: глубина иерархии
+    """
+
+    positions: int = 1000
+    attributes: int = 6
+    periods: int = 1
+    depth: int = 3
+    start_date: datetime.date = datetime.date(2000, 1, 1)
+
+    @property
+    def attribute_names(self) -> List[str]:
+        extra = [f"ATTR_{index}" for index in range(4, self.attributes + 1)]
+        return BASE_ATTRIBUTES + extra
+
+    @property
+    def fanout(self) -> int:
+        """Количество потомков у позиции (0 - иерархии нет)"""
+        if self.depth <= 1 or self.positions <= 1:
+            return 0
+        return max(2, math.ceil(self.positions ** (1 / (self.depth - 1))))
+
+    @property
+    def current_date(self) -> datetime.date:
+        """Дата внутри последнего (действующего) периода"""
+        return self.start_date + datetime.timedelta(
+            days=PERIOD_DAYS * (self.periods - 1)
+        )
+
+
+def position_code(index: int) -> str:
+    return f"{index:08d}"
+
+
+def parent_index(index: int, fanout: int) -> int | None:
+    if not fanout or index == 0:
+        return None
+    return (index - 1) // fanout
+
+
+def import_frame(params: SeedParams) -> pd.DataFrame:
+    """
+    Файл импорта, соответствующий параметрам (все значения - строки,
+    как после pd.read_csv(dtype=str) в роутере)
+    :param params: параметры справочника
+    :return:
+    """
+    rows = []
+    for index in range(params.positions):
+        parent = parent_index(index, params.fanout)
+        row = {
+            "CODE": position_code(index),
+            "NAME": f"NAME {index}",
+            "PARENT_CODE": None if parent is None else position_code(parent),
+        }
+        for name in params.attribute_names[len(BASE_ATTRIBUTES) :]:
+            row[name] = f"{name} {index}"
+        rows.append(row)
+    return pd.DataFrame(rows, columns=params.attribute_names, dtype=str)
+
+
+async def create_dictionary(params: SeedParams, name: str) -> int:
+    """
+    Создание справочника с атрибутами без позиций
+    :param params: параметры справочника
+    :param name: наименование
+    :return: идентификатор справочника
+    """
+    dictionary_id = await database.fetch_val(
+        """
+        insert into dictionary (name, code, description, start_date, finish_date,
+            change_date)
+        values (:name, :name, 'benchmark', :start_date, :finish_date, current_date)
+        returning id
+        """,
+        {"name": name, "start_date": params.start_date, "finish_date": FINISH_DATE},
+    )
+    await database.execute(
+        "select create_dictionary_partitions(:id)", {"id": dictionary_id}
+    )
+    await database.execute_many(
+        """
+        insert into dictionary_attribute (id_dictionary, name, required, start_date,
+            finish_date, capacity, alt_name, id_attribute_type)
+        values (:id_dictionary, :name, :required, :start_date, :finish_date,
+            250, :name, 1)
+        """,
+        [
+            {
+                "id_dictionary": dictionary_id,
+                "name": attribute,
+                "required": attribute in ("CODE", "NAME"),
+                "start_date": params.start_date,
+                "finish_date": FINISH_DATE,
+            }
+            for attribute in params.attribute_names
+        ],
+    )
+    return dictionary_id
+
+
+async def seed_dictionary(params: SeedParams, name: str) -> int:
+    """
+    Создание справочника и заполнение его позициями, значениями и связями
+    :param params: параметры справочника
+    :param name: наименование
+    :return: идентификатор справочника
+    """
+    dictionary_id = await create_dictionary(params, name)
+    values = {
+        "id_dictionary": dictionary_id,
+        "positions": params.positions,
+        "periods": params.periods,
+        "fanout": params.fanout,
+        "start_date": params.start_date,
+        "finish_date": FINISH_DATE,
+        "period_days": PERIOD_DAYS,
+    }
+    await database.execute(
+        """
+        insert into dictionary_positions (id_dictionary)
+        select :id_dictionary from generate_series(1, cast(:positions as int))
+        """,
+        values,
+    )
+    # Нумерация позиций (k) и границы периодов
+    numbered = """
+        with p as (
+            select id, (row_number() over (order by id) - 1)::int as k
+            from dictionary_positions where id_dictionary = :id_dictionary
+        ),
+        periods as (
+            select cast(:start_date as date) + g * cast(:period_days as int)
+                    as start_date,
+                case when g = cast(:periods as int) - 1
+                     then cast(:finish_date as date)
+                     else cast(:start_date as date)
+                        + (g + 1) * cast(:period_days as int) - 1
+                end as finish_date,
+                g
+            from generate_series(0, cast(:periods as int) - 1) g
+        ),
+        settings as (select nullif(cast(:fanout as int), 0) as fanout)
+    """
+    await database.execute(
+        numbered
+        + """
+        insert into dictionary_data
+            (id_dictionary, id_position, id_attribute, value, start_date,
+            finish_date)
+        select :id_dictionary, p.id, da.id,
+            case da.alt_name
+                when 'CODE' then lpad(p.k::text, 8, '0')
+                when 'PARENT_CODE' then case
+                    when p.k > 0
+                    then lpad(((p.k - 1) / settings.fanout)::text, 8, '0')
+                end
+                when 'NAME' then 'NAME ' || p.k || case
+                    when periods.g > 0 then ' v' || periods.g else '' end
+                else da.alt_name || ' ' || p.k || ' v' || periods.g
+            end,
+            periods.start_date, periods.finish_date
+        from p
+        join dictionary_attribute da on da.id_dictionary = :id_dictionary
+        cross join periods
+        cross join settings
+        """,
+        values,
+    )
+    await database.execute(
+        numbered
+        + """
+        insert into dictionary_relations
+            (id_positions, id_parent_positions, start_date, finish_date)
+        select child.id, parent.id, periods.start_date, periods.finish_date
+        from p child
+        cross join settings
+        join p parent on child.k > 0 and parent.k = (child.k - 1) / settings.fanout
+        cross join periods
+        """,
+        values,
+    )
+    await database.execute("analyze dictionary_positions")
+    await database.execute("analyze dictionary_data")
+    await database.execute("analyze dictionary_relations")
+    return dictionary_id
+
+
+async def drop_dictionary(dictionary_id: int) -> None:
+    """Удаление справочника со всеми данными"""
+    values = {"id_dictionary": dictionary_id}
+    positions = (
+        "select id from dictionary_positions where id_dictionary = :id_dictionary"
+    )
+    await database.execute(
+        f"delete from dictionary_relations where id_positions in ({positions})",
+        values,
+    )
+    await database.execute(
+        "delete from dictionary_data where id_dictionary = :id_dictionary", values
+    )
+    await database.execute(
+        "delete from dictionary_positions where id_dictionary = :id_dictionary", values
+    )
+    await database.execute(
+        "delete from dictionary_attribute where id_dictionary = :id_dictionary", values
+    )
+    await database.execute("delete from dictionary where id = :id_dictionary", values)
@@ -0,0 +1,153 @@
+"""
+Кэши данных справочников в памяти процесса
+
+Каждый кэш хранит значения, привязанные к идентификатору справочника, поэтому
+при изменении справочника (в том числе другим воркером) достаточно сбросить
+все записи этого справочника во всех зарегистрированных кэшах.
+
+Сброс выполняется после фиксации записи, поэтому чтение, начатое до нее, может
+вернуть старые данные уже после сброса. Чтобы они не попали в кэш, каждый
+сброс увеличивает поколение справочника: перед чтением из базы берется
+generation(), и set() с устаревшим поколением ничего не сохраняет.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Счетчики сбросов: по справочникам и полной очистки
+_generations: Dict[int, int] = {}
+_epoch = 0
+
+
+def generation(dictionary_id: int) -> Tuple[int, int]:
+    """
+    Поколение данных справочника, меняется при каждом сбросе его кэшей
+    :param dictionary_id: идентификатор справочника
+    :return: значение для передачи в DictionaryCache.set
+    """
+    return _epoch, _generations.get(dictionary_id, 0)
+
+
+class DictionaryCache:
+    """
+    LRU-кэш, записи которого сгруппированы по справочникам
+    """
+
+    def __init__(self, name: str, maxsize: int = settings.cache_max_entries):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple[int, Hashable], Any]" = OrderedDict()
+        self._keys: Dict[int, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, dictionary_id: int, key: Hashable = None, default: Any = None):
+        """
+        Получение значения из кэша
+        :param dictionary_id: идентификатор справочника
+        :param key: ключ внутри справочника
+        :param default: значение, если записи нет
+        :return:
+        """
+        try:
+            value = self._data[(dictionary_id, key)]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end((dictionary_id, key))
+        self.hits += 1
+        return value
+
+    def set(
+        self,
+        dictionary_id: int,
+        key: Hashable,
+        value: Any,
+        since: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        """
+        Сохранение значения в кэш
+        :param dictionary_id: идентификатор справочника
+        :param key: ключ внутри справочника
+        :param value: значение
+        :param since: поколение (generation), взятое до чтения значения из
+            базы; если справочник с тех пор сбрасывался, значение не сохраняется
+        :return:
+        """
+        if since is not None and since != generation(dictionary_id):
+            logger.debug(
+                "кэш %s: справочник %d изменился во время чтения, значение "
+                "не сохраняется",
+                self.name,
+                dictionary_id,
+            )
+            return
+        self._data[(dictionary_id, key)] = value
+        self._data.move_to_end((dictionary_id, key))
+        self._keys.setdefault(dictionary_id, set()).add(key)
+        while len(self._data) > self.maxsize:
+            (old_dictionary, old_key), _ = self._data.popitem(last=False)
+            self._discard_key(old_dictionary, old_key)
+
+    def invalidate(self, dictionary_id: int) -> None:
+        """Сброс всех записей справочника"""
+        for key in self._keys.pop(dictionary_id, ()):
+            self._data.pop((dictionary_id, key), None)
+
+    def clear(self) -> None:
+        """Полная очистка кэша"""
+        self._data.clear()
+        self._keys.clear()
+
+    def _discard_key(self, dictionary_id: int, key: Hashable) -> None:
+        keys = self._keys.get(dictionary_id)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del self._keys[dictionary_id]
+
+
+_caches: List[DictionaryCache] = []
+
+
+def register_cache(name: str, maxsize: int = settings.cache_max_entries):
+    """
+    Создание кэша, который сбрасывается при изменении справочника
+    :param name: имя кэша (для логов и метрик)
+    :param maxsize: максимальное количество записей
+    :return: кэш
+    """
+    cache = DictionaryCache(name, maxsize)
+    _caches.append(cache)
+    return cache
+
+
+def registered_caches() -> List[DictionaryCache]:
+    """Перечень зарегистрированных кэшей"""
+    return list(_caches)
+
+
+def invalidate_dictionary(dictionary_id: int) -> None:
+    """Сброс записей справочника во всех кэшах процесса"""
+    logger.debug("сброс кэшей справочника %d", dictionary_id)
+    _generations[dictionary_id] = _generations.get(dictionary_id, 0) + 1
+    for cache in _caches:
+        cache.invalidate(dictionary_id)
+
+
+def invalidate_all() -> None:
+    """Полная очистка всех кэшей процесса"""
+    global _epoch
+    logger.info("очистка всех кэшей справочников")
+    _epoch += 1
+    for cache in _caches:
+        cache.clear()
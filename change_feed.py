@@ -0,0 +1,139 @@
+"""
+Согласование кэшей между воркерами через Postgres LISTEN/NOTIFY
+
+Любая запись в справочник увеличивает его версию и отправляет NOTIFY
+с полезной нагрузкой "<id справочника>:<версия>". Каждый воркер держит
+отдельное соединение с LISTEN и сбрасывает записи справочника в своих кэшах.
+После разрыва соединения уведомления могли быть потеряны, поэтому при
+переподключении кэши сбрасываются целиком; первое подключение кэши
+(в том числе прогретые warmup.py) не трогает.
+"""
+
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+import asyncpg
+
+from cache import invalidate_all, invalidate_dictionary
+from config import settings
+from database import DATABASE_URL, database
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed:
+    """
+    Публикация и прослушивание изменений справочников
+    """
+
+    RECONNECT_DELAY = 1.0
+
+    def __init__(self, dsn: str, channel: str):
+        self.dsn = dsn
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+        self._connection: Optional[asyncpg.Connection] = None
+        # Соединение рвалось или не устанавливалось: уведомления могли потеряться
+        self._missed = False
+
+    async def publish(self, dictionary_id: int) -> Optional[int]:
+        """
+        Увеличиваем версию справочника и уведомляем остальные воркеры
+        :param dictionary_id: идентификатор справочника
+        :return: новая версия справочника
+        """
+        invalidate_dictionary(dictionary_id)
+        sql = """
+            with bumped as (
+                update dictionary set version = version + 1
+                where id = :id
+                returning id, version
+            )
+            select version,
+                   pg_notify(:channel, id::text || ':' || version::text)
+            from bumped
+        """
+        try:
+            row = await database.fetch_one(
+                sql, {"id": dictionary_id, "channel": self.channel}
+            )
+        except Exception as e:
+            logger.error(
+                "Failed to publish change of dictionary %d: %s", dictionary_id, e
+            )
+            return None
+        return row["version"] if row else None
+
+    @staticmethod
+    def parse_payload(payload: str) -> Tuple[int, Optional[int]]:
+        """
+        Разбор полезной нагрузки уведомления
+        :param payload: строка вида "<id>:<version>" или "<id>"
+        :return: идентификатор справочника и версия
+        """
+        dictionary_id, _, version = payload.partition(":")
+        return int(dictionary_id), int(version) if version else None
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            dictionary_id, version = self.parse_payload(payload)
+        except ValueError:
+            logger.error("Invalid change notification payload: %r", payload)
+            return
+        logger.debug(
+            "получено уведомление об изменении справочника %d (версия %s)",
+            dictionary_id,
+            version,
+        )
+        invalidate_dictionary(dictionary_id)
+
+    async def start(self) -> None:
+        """Запуск прослушивания уведомлений в фоне"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Остановка прослушивания"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                await self._connection.add_listener(self.channel, self._on_notify)
+                if self._missed:
+                    # Пока соединения не было, уведомления могли быть потеряны
+                    invalidate_all()
+                    self._missed = False
+                logger.info("Listening for dictionary changes on %s", self.channel)
+                while True:
+                    await asyncio.sleep(settings.cache_listener_ping)
+                    await self._connection.fetchval("select 1")
+            except asyncio.CancelledError:
+                await self._close()
+                raise
+            except Exception as e:
+                logger.error("Change feed connection lost: %s", e)
+                self._missed = True
+                await self._close()
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+    async def _close(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            await self._connection.close(timeout=5)
+        except Exception as e:
+            logger.debug("ошибка закрытия соединения LISTEN: %s", e)
+        self._connection = None
+
+
+change_feed = ChangeFeed(DATABASE_URL, settings.cache_channel)
@@ -0,0 +1,223 @@
+"""
+Уплотнение периодов значений справочников
+
+Правки и повторные импорты оставляют у пары (позиция, атрибут) соседние или
+перекрывающиеся периоды с одинаковым значением. При редактировании
+(_shift_previous_period, _shift_next_period) сливаются только периоды рядом
+с изменяемым, поэтому такие цепочки накапливаются. Задача уплотнения находит
+их оконными функциями (острова одинаковых значений на оси времени), продлевает
+первый период острова до конца последнего и удаляет остальные.
+
+Работает без остановки сервиса: позиции обрабатываются пачками по
+settings.compaction_batch_size, каждая пачка - отдельный короткий запрос.
+
+    python -m compaction --dictionary 5 7
+    python -m compaction --all
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+import queries
+from change_feed import change_feed
+from config import settings
+from database import database
+from logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompactionReport:
+    """
+    Результат уплотнения справочника
+    """
+
+    dictionary_id: int
+    positions: int = 0
+    # удалено строк dictionary_data
+    rows_reclaimed: int = 0
+    # строк, период которых продлен на удаленные
+    rows_extended: int = 0
+    duration: float = 0.0
+
+
+class Compactor:
+    """
+    Слияние соседних периодов с одинаковыми значениями
+    """
+
+    POSITIONS_SQL = """
+        SELECT id FROM dictionary_positions
+        WHERE id_dictionary = :id_dictionary AND id > :after
+        ORDER BY id
+        LIMIT :limit
+    """
+
+    # Остров - подряд идущие (по start_date) периоды пары (позиция, атрибут)
+    # с одним значением, каждый из которых начинается не позже следующего дня
+    # после конца предыдущих. Первый период острова сохраняется и продлевается
+    COMPACT_SQL = """
+        WITH ordered AS (
+            SELECT id, id_position, id_attribute, start_date, finish_date,
+                row_number() OVER w = 1
+                OR value IS DISTINCT FROM lag(value) OVER w
+                OR start_date > max(finish_date) OVER (
+                    w ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ) + 1 AS island_start
+            FROM dictionary_data
+            WHERE id_dictionary = :id_dictionary
+                AND id_position = ANY(:positions::integer[])
+            WINDOW w AS (PARTITION BY id_position, id_attribute
+                ORDER BY start_date, id)
+        ),
+        islands AS (
+            SELECT id, id_position, id_attribute, start_date, finish_date,
+                count(*) FILTER (WHERE island_start) OVER (
+                    PARTITION BY id_position, id_attribute ORDER BY start_date, id
+                ) AS island
+            FROM ordered
+        ),
+        merged AS (
+            SELECT id, first_value(id) OVER i AS keep_id,
+                max(finish_date) OVER i AS island_finish,
+                count(*) OVER i AS island_rows
+            FROM islands
+            WINDOW i AS (PARTITION BY id_position, id_attribute, island
+                ORDER BY start_date, id
+                ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+        ),
+        extended AS (
+            UPDATE dictionary_data dd SET finish_date = m.island_finish
+            FROM merged m
+            WHERE dd.id_dictionary = :id_dictionary
+                AND dd.id = m.id AND m.id = m.keep_id AND m.island_rows > 1
+                AND dd.finish_date <> m.island_finish
+            RETURNING dd.id
+        ),
+        reclaimed AS (
+            DELETE FROM dictionary_data dd
+            USING merged m
+            WHERE dd.id_dictionary = :id_dictionary
+                AND dd.id = m.id AND m.id <> m.keep_id
+            RETURNING dd.id
+        )
+        SELECT (SELECT count(*) FROM reclaimed) AS reclaimed,
+            (SELECT count(*) FROM extended) AS extended
+    """
+
+    def __init__(self, batch_size: int, pause: float):
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+
+    async def compact_dictionary(self, dictionary_id: int) -> CompactionReport:
+        """
+        Уплотнение одного справочника пачками позиций
+        :param dictionary_id: идентификатор справочника
+        :return: отчет с числом удаленных строк
+        """
+        started = time.perf_counter()
+        report = CompactionReport(dictionary_id)
+        positions = queries.statement("compaction.positions", self.POSITIONS_SQL)
+        compact = queries.statement("compaction.compact", self.COMPACT_SQL)
+        after = 0
+        while True:
+            rows = await positions.fetch_all(
+                {
+                    "id_dictionary": dictionary_id,
+                    "after": after,
+                    "limit": self.batch_size,
+                }
+            )
+            if not rows:
+                break
+            batch = [row["id"] for row in rows]
+            result = await compact.fetch_one(
+                {"id_dictionary": dictionary_id, "positions": batch}
+            )
+            report.positions += len(batch)
+            report.rows_reclaimed += result["reclaimed"]
+            report.rows_extended += result["extended"]
+            after = batch[-1]
+            if self.pause:
+                await asyncio.sleep(self.pause)
+
+        # Данные на любую дату прежние, но воркеры должны сбросить кэши,
+        # построенные по удаленным строкам
+        if report.rows_reclaimed:
+            await change_feed.publish(dictionary_id)
+        report.duration = time.perf_counter() - started
+        logger.info(
+            "Compacted dictionary %d: %d positions, %d rows reclaimed in %.1fs",
+            dictionary_id,
+            report.positions,
+            report.rows_reclaimed,
+            report.duration,
+        )
+        return report
+
+    async def compact(
+        self, dictionary_ids: Optional[List[int]] = None
+    ) -> List[CompactionReport]:
+        """
+        Уплотнение нескольких справочников по очереди
+        :param dictionary_ids: идентификаторы справочников (None - все)
+        :return: отчеты по справочникам
+        """
+        if dictionary_ids is None:
+            rows = await queries.statement(
+                "compaction.dictionaries", "SELECT id FROM dictionary ORDER BY id"
+            ).fetch_all()
+            dictionary_ids = [row["id"] for row in rows]
+        return [
+            await self.compact_dictionary(dictionary_id)
+            for dictionary_id in dictionary_ids
+        ]
+
+
+compactor = Compactor(settings.compaction_batch_size, settings.compaction_pause)
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--dictionary", type=int, nargs="+")
+    target.add_argument("--all", action="store_true")
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.compaction_batch_size
+    )
+    parser.add_argument("--pause", type=float, default=settings.compaction_pause)
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> List[CompactionReport]:
+    await database.connect()
+    try:
+        return await Compactor(args.batch_size, args.pause).compact(
+            None if args.all else args.dictionary
+        )
+    finally:
+        await database.disconnect()
+
+
+def main(argv: List[str] | None = None) -> None:
+    setup_logging()
+    reports = asyncio.run(run(parse_args(argv)))
+    print(
+        json.dumps(
+            {
+                "dictionaries": [asdict(report) for report in reports],
+                "rows_reclaimed": sum(report.rows_reclaimed for report in reports),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
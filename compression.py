@@ -0,0 +1,326 @@
+"""
+Сжатие ответов с согласованием кодировки
+
+JSON справочников хорошо сжимается: имена атрибутов повторяются в каждой
+позиции. CompressionMiddleware сжимает ответы в zstd, brotli или gzip
+в зависимости от заголовка Accept-Encoding. Ответы меньше
+settings.compression_min_size байт отдаются как есть: выигрыш в размере
+не окупает затрат на сжатие. Ответы, у которых уже задан Content-Encoding
+(заранее сжатые срезы из snapshots.py), не изменяются.
+
+Части тела от settings.compression_thread_min_size байт сжимаются в пуле
+потоков (zlib, zstd и brotli освобождают GIL), чтобы сжатие большого
+справочника не останавливало обработку остальных запросов.
+
+Тела, которые хранятся в кэше (EncodedBody), хранят рядом и свои сжатые
+варианты: каждая кодировка сжимается один раз, а не на каждый запрос.
+"""
+
+import asyncio
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from fastapi.responses import Response
+
+from config import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd необязателен
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli необязателен
+    brotli = None
+
+# Кодировки в порядке предпочтения при равном весе у клиента
+ENCODINGS = ("zstd", "br", "gzip")
+
+# Уровни сжатия ответов на лету: быстрые, с разумной степенью сжатия
+DYNAMIC_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def available_encodings() -> List[str]:
+    """Кодировки, которые могут быть сформированы в текущем окружении"""
+    return [
+        encoding
+        for encoding in ENCODINGS
+        if (encoding != "zstd" or zstandard is not None)
+        and (encoding != "br" or brotli is not None)
+    ]
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Разбор заголовка Accept-Encoding
+    :param header: значение заголовка
+    :return: кодировка -> вес (q)
+    """
+    result = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        result[name] = quality
+    return result
+
+
+def choose_encoding(header: str, encodings: List[str]) -> Optional[str]:
+    """
+    Выбор кодировки ответа
+    :param header: заголовок Accept-Encoding запроса
+    :param encodings: доступные кодировки в порядке предпочтения
+    :return: кодировка с наибольшим весом или None, если сжимать не нужно
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class Compressor(NamedTuple):
+    """
+    Потоковое сжатие тела ответа
+    """
+
+    compress: Callable[[bytes], bytes]
+    flush: Callable[[], bytes]
+
+
+def compressor(encoding: str, level: Optional[int] = None) -> Compressor:
+    """
+    Потоковый компрессор
+    :param encoding: кодировка (zstd, br, gzip)
+    :param level: уровень сжатия, по умолчанию - уровень для ответов на лету
+    :return:
+    """
+    level = DYNAMIC_LEVELS[encoding] if level is None else level
+    if encoding == "zstd":
+        obj = zstandard.ZstdCompressor(level=level).compressobj()
+        return Compressor(obj.compress, obj.flush)
+    if encoding == "br":
+        obj = brotli.Compressor(quality=level)
+        return Compressor(obj.process, obj.finish)
+    obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return Compressor(obj.compress, obj.flush)
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    Сжатие тела целиком
+    :param body: тело ответа
+    :param encoding: кодировка (zstd, br, gzip)
+    :param level: уровень сжатия, по умолчанию - уровень для ответов на лету
+    :return:
+    """
+    obj = compressor(encoding, level)
+    return obj.compress(body) + obj.flush()
+
+
+class EncodedBody:
+    """
+    Тело ответа вместе со сжатыми вариантами для хранения в кэше
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._variants: Dict[str, bytes] = {}
+
+    async def encode(self, encoding: str) -> bytes:
+        """
+        Сжатый вариант тела (сжимается при первом обращении)
+        :param encoding: кодировка (zstd, br, gzip)
+        :return:
+        """
+        variant = self._variants.get(encoding)
+        if variant is None:
+            if len(self.body) >= settings.compression_thread_min_size:
+                variant = await asyncio.to_thread(compress, self.body, encoding)
+            else:
+                variant = compress(self.body, encoding)
+            self._variants[encoding] = variant
+        return variant
+
+    async def response(
+        self, accept_encoding: str, media_type: str = "application/json"
+    ) -> Response:
+        """
+        Ответ в подходящей клиенту кодировке
+        :param accept_encoding: заголовок Accept-Encoding запроса
+        :param media_type: тип содержимого
+        :return:
+        """
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = None
+        if len(self.body) >= settings.compression_min_size:
+            encoding = choose_encoding(accept_encoding, available_encodings())
+        if encoding is None:
+            return Response(self.body, media_type=media_type, headers=headers)
+        # Заданный Content-Encoding CompressionMiddleware не сжимает повторно
+        headers["Content-Encoding"] = encoding
+        return Response(
+            await self.encode(encoding), media_type=media_type, headers=headers
+        )
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware сжатия ответов
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = settings.compression_min_size,
+        thread_min_size: int = settings.compression_thread_min_size,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_min_size = thread_min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding, available_encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(
+            send, encoding, self.minimum_size, self.thread_min_size
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    """
+    Обертка send одного ответа
+
+    Начало ответа задерживается, пока не станет ясно, нужно ли сжатие:
+    тело накапливается до minimum_size байт. Если ответ закончился раньше,
+    он отправляется без изменений, иначе - сжимается потоково.
+    """
+
+    def __init__(self, send, encoding: str, minimum_size: int, thread_min_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.thread_min_size = thread_min_size
+        self._start: Optional[dict] = None
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._compressor: Optional[Compressor] = None
+        self._passthrough = False
+
+    async def send(self, message: dict) -> None:
+        if self._passthrough:
+            await self._send(message)
+            return
+        if message["type"] == "http.response.start":
+            headers = {
+                name.lower(): value for name, value in message.get("headers", [])
+            }
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if b"content-encoding" in headers or not content_type.startswith(
+                COMPRESSIBLE_TYPES
+            ):
+                self._passthrough = True
+                await self._send(message)
+                return
+            self._start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._compressor is not None:
+            chunk = await self._compress(body, final=not more_body)
+            if chunk or not more_body:
+                await self._send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": more_body,
+                    }
+                )
+            return
+
+        self._buffer.append(body)
+        self._buffered += len(body)
+        if self._buffered < self.minimum_size:
+            if not more_body:
+                await self._send_start(compressed=False)
+                await self._send(
+                    {"type": "http.response.body", "body": b"".join(self._buffer)}
+                )
+            return
+
+        data = b"".join(self._buffer)
+        self._buffer = []
+        self._compressor = compressor(self.encoding)
+        chunk = await self._compress(data, final=not more_body)
+        await self._send_start(compressed=True, body=None if more_body else chunk)
+        await self._send(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
+
+    async def _compress(self, data: bytes, final: bool) -> bytes:
+        """
+        Сжатие очередной части тела; большие части - в пуле потоков
+        :param data: часть тела
+        :param final: последняя часть (компрессор завершается)
+        :return: сжатые данные
+        """
+
+        def run() -> bytes:
+            chunk = self._compressor.compress(data)
+            return chunk + self._compressor.flush() if final else chunk
+
+        if len(data) >= self.thread_min_size:
+            return await asyncio.to_thread(run)
+        return run()
+
+    async def _send_start(self, compressed: bool, body: Optional[bytes] = None):
+        """
+        Отправка задержанного начала ответа
+        :param compressed: ответ сжимается
+        :param body: сжатое тело целиком (для Content-Length), если известно
+        """
+        message = dict(self._start)
+        headers, vary = [], []
+        for name, value in message.get("headers", []):
+            lowered = name.lower()
+            if lowered == b"vary":
+                vary.append(value)
+            elif not (compressed and lowered == b"content-length"):
+                headers.append((name, value))
+        if b"accept-encoding" not in b",".join(vary).lower():
+            vary.append(b"Accept-Encoding")
+        headers.append((b"vary", b", ".join(vary)))
+        if compressed:
+            headers.append((b"content-encoding", self.encoding.encode()))
+            if body is not None:
+                headers.append((b"content-length", str(len(body)).encode()))
+        message["headers"] = headers
+        await self._send(message)
@@ -1,6 +1,8 @@
 """
 Просто конф
 """
+from typing import List
+
 from pydantic_settings import BaseSettings
 
 
@@ -9,6 +11,8 @@ class Settings(BaseSettings):
     log_file: str = "dict.log"
     log_format: str ="%(asctime)s %(name)-30s %(levelname)-8s %(message)s"
     log_date: str = "%Y-%m-%d %H:%M:%S"
+    log_json: bool = True
+    log_debug_sample_rate: float = 1.0
 
     postgres_user: str = "postgres"
     postgres_password: str = "postgres"
@@ -16,6 +20,47 @@ class Settings(BaseSettings):
     postgres_port: str = "5432"
     postgres_schema: str = "postgres"
 
+    read_replica_urls: List[str] = []
+    replica_check_interval: float = 5.0
+    replica_check_timeout: float = 2.0
+
+    cache_channel: str = "dictionary_changed"
+    cache_max_entries: int = 1024
+    cache_listener_ping: float = 30.0
+
+    snapshot_dir: str = "snapshots"
+    snapshot_zstd_level: int = 10
+    # Качество 10-11 сжимает около 1 МБ/с и задерживает первый запрос к срезу
+    snapshot_brotli_level: int = 6
+
+    compression_min_size: int = 1024
+    # Части ответа от этого размера сжимаются в пуле потоков, а не в цикле событий
+    compression_thread_min_size: int = 64 * 1024
+
+    page_default_limit: int = 100
+    page_max_limit: int = 1000
+
+    batch_max_dictionaries: int = 50
+    batch_concurrency: int = 4
+
+    code_check_max_items: int = 1_000_000
+
+    compaction_batch_size: int = 500
+    compaction_pause: float = 0.05
+
+    archive_horizon_days: int = 1095
+    archive_batch_size: int = 5000
+    archive_pause: float = 0.05
+
+    warmup_dictionaries: List[int] = []
+    warmup_concurrency: int = 4
+
+    slow_query_threshold: float = 0.5
+    slow_query_log_file: str = "slow_query.log"
+    slow_query_explain: bool = False
+    slow_query_explain_file: str = "slow_query_plans.log"
+    slow_query_params_limit: int = 2000
+
     class Config:
         env_file = ".env"
 
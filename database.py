@@ -1,10 +1,145 @@
+"""
+Подключение к базе данных
+
+Общий объект database замеряет время каждого запроса. Запросы дольше
+settings.slow_query_threshold секунд пишутся в журнал медленных запросов
+вместе с параметрами, а при settings.slow_query_explain для них в фоне
+снимается план в отдельный журнал планов: для запросов только на чтение
+(Statement с readonly=True) - EXPLAIN (ANALYZE, BUFFERS) в транзакции только
+на чтение, для остальных - EXPLAIN без выполнения запроса.
+"""
+
+import asyncio
 import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+
 import databases
 from config import settings
-logging.getLogger("database").setLevel(logging.CRITICAL)
 
 DATABASE_URL = (f"postgresql://{settings.postgres_user}:"
                 f"{settings.postgres_password}@{settings.postgres_host}:"
                 f"{settings.postgres_port}/{settings.postgres_schema}")
 
-database = databases.Database(DATABASE_URL)
+# Файлы журналов медленных запросов и планов настраиваются в logging_config.py
+slow_logger = logging.getLogger("slow_query")
+plan_logger = logging.getLogger("slow_query.plan")
+
+
+class InstrumentedDatabase(databases.Database):
+    """
+    Database с замером времени запросов и журналом медленных запросов
+    """
+
+    def __init__(self, url: str, **options: Any):
+        super().__init__(url, **options)
+        self.threshold = settings.slow_query_threshold
+        self.explain = settings.slow_query_explain
+        # Запросы, план которых снимается в данный момент
+        self._explaining: Set[str] = set()
+        # Задачи снятия планов (ссылки, чтобы задачи не собрал сборщик мусора)
+        self._explain_tasks: Set[asyncio.Task] = set()
+
+    async def fetch_all(self, query, values: Optional[dict] = None) -> List[Any]:
+        started = time.perf_counter()
+        try:
+            return await super().fetch_all(query, values)
+        finally:
+            self.observe(query, values, time.perf_counter() - started)
+
+    async def fetch_one(self, query, values: Optional[dict] = None) -> Any:
+        started = time.perf_counter()
+        try:
+            return await super().fetch_one(query, values)
+        finally:
+            self.observe(query, values, time.perf_counter() - started)
+
+    async def fetch_val(
+        self, query, values: Optional[dict] = None, column: Any = 0
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await super().fetch_val(query, values, column)
+        finally:
+            self.observe(query, values, time.perf_counter() - started)
+
+    async def execute(self, query, values: Optional[dict] = None) -> Any:
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, values)
+        finally:
+            self.observe(query, values, time.perf_counter() - started)
+
+    async def execute_many(self, query, values: list) -> None:
+        started = time.perf_counter()
+        try:
+            return await super().execute_many(query, values)
+        finally:
+            self.observe(query, values, time.perf_counter() - started)
+
+    def observe(
+        self, query, values: Any, elapsed: float, readonly: bool = False
+    ) -> None:
+        """
+        Учет выполненного запроса
+        :param query: текст запроса (с параметрами вида :name)
+        :param values: параметры запроса (список - для пакетного выполнения)
+        :param elapsed: время выполнения, с
+        :param readonly: запрос только читает данные и может быть выполнен
+            повторно для снятия плана с ANALYZE
+        :return:
+        """
+        if elapsed < self.threshold:
+            return
+        sql = " ".join(str(query).split())
+        if isinstance(values, list):
+            params = f"{len(values)} rows, first: {values[:1]!r}"
+        else:
+            params = repr(values)
+        limit = settings.slow_query_params_limit
+        if len(params) > limit:
+            params = params[:limit] + "..."
+        slow_logger.warning("%.3fs %s; params: %s", elapsed, sql, params)
+
+        # План пакетного запроса не снимается: каждая строка - отдельный вызов
+        if self.explain and isinstance(values, (dict, type(None))):
+            if sql not in self._explaining:
+                self._explaining.add(sql)
+                task = asyncio.get_running_loop().create_task(
+                    self._explain(sql, values, readonly)
+                )
+                self._explain_tasks.add(task)
+                task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain(
+        self, sql: str, values: Optional[Dict[str, Any]], readonly: bool = False
+    ) -> None:
+        """
+        Снятие плана медленного запроса
+
+        Запрос только на чтение выполняется повторно (ANALYZE, BUFFERS) в
+        отдельном соединении, в транзакции только на чтение, которая
+        откатывается. Изменяющий запрос повторно не выполняется: для него
+        снимается план без ANALYZE, не берущий блокировок на строки.
+        """
+        try:
+            async with self.connection() as connection:
+                if readonly:
+                    transaction = await connection.transaction(readonly=True)
+                    try:
+                        rows = await connection.fetch_all(
+                            f"EXPLAIN (ANALYZE, BUFFERS) {sql}", values
+                        )
+                    finally:
+                        await transaction.rollback()
+                else:
+                    rows = await connection.fetch_all(f"EXPLAIN {sql}", values)
+            plan = "\n".join(row[0] for row in rows)
+            plan_logger.info("%s; params: %r\n%s", sql, values, plan)
+        except Exception as exc:  # pylint: disable=broad-except
+            plan_logger.warning("Failed to explain %s: %s", sql, exc)
+        finally:
+            self._explaining.discard(sql)
+
+
+database = InstrumentedDatabase(DATABASE_URL)
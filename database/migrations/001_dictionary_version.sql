@@ -0,0 +1,4 @@
+-- Версия справочника, увеличивается при каждом изменении данных или структуры.
+-- Используется для рассылки уведомлений об изменениях (LISTEN/NOTIFY)
+alter table dictionary
+    add column if not exists version bigint default 0 not null;
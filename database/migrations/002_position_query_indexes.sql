@@ -0,0 +1,9 @@
+-- Индексы для запросов чтения позиций на дату (models/model_query.py)
+create index if not exists dictionary_positions_id_dictionary_index
+    on dictionary_positions (id_dictionary, id);
+
+create index if not exists dictionary_data_position_attribute_index
+    on dictionary_data (id_position, id_attribute, start_date, finish_date);
+
+create index if not exists dictionary_relations_position_index
+    on dictionary_relations (id_positions, start_date, finish_date);
@@ -0,0 +1,219 @@
+-- Секционирование dictionary_positions и dictionary_data по справочнику.
+--
+-- Каждый справочник получает свои секции (partition by list (id_dictionary)),
+-- поэтому индексы и очистка (vacuum) небольшого справочника не зависят от
+-- больших классификаторов, а запросы с условием id_dictionary читают одну
+-- секцию. Для этого в dictionary_data добавлен столбец id_dictionary, который
+-- заполняется при вставке значений.
+--
+-- Секции нового справочника создает create_dictionary_partitions (вызывается из
+-- DictionaryService.create); строки справочников без своей секции попадают
+-- в секции по умолчанию. При секционировании по хешу (partition by hash
+-- (id_dictionary) с постоянным числом секций) функция ничего не создает.
+--
+-- Первичный ключ секционированной таблицы должен включать ключ секционирования,
+-- поэтому на dictionary_positions нельзя ссылаться по одному id: внешний ключ
+-- dictionary_data ссылается на (id_dictionary, id), а внешние ключи
+-- dictionary_relations (id_positions, id_parent_positions) удаляются и
+-- заменяются триггерами: вставка и изменение связи с несуществующей позицией и
+-- удаление позиции, на которую ссылается связь, завершаются ошибкой
+-- foreign_key_violation. Проверка выполняется один раз на оператор, поэтому
+-- пакетная вставка связей при импорте не проверяет строки по одной.
+begin;
+
+alter table dictionary_data add column if not exists id_dictionary integer;
+
+update dictionary_data dd
+set id_dictionary = dp.id_dictionary
+from dictionary_positions dp
+where dp.id = dd.id_position and dd.id_dictionary is null;
+
+do $$
+declare
+    fk record;
+begin
+    for fk in
+        select conrelid::regclass as tbl, conname
+        from pg_constraint
+        where contype = 'f' and confrelid = 'dictionary_positions'::regclass
+    loop
+        execute format('alter table %s drop constraint %I', fk.tbl, fk.conname);
+    end loop;
+end
+$$;
+
+alter table dictionary_positions rename to dictionary_positions_old;
+alter table dictionary_data rename to dictionary_data_old;
+
+create table dictionary_positions
+(
+    id            integer generated always as identity,
+    id_dictionary integer not null
+        constraint dictionary_positions_dictionary_id_fk
+            references dictionary
+) partition by list (id_dictionary);
+
+create table dictionary_data
+(
+    id            integer generated always as identity,
+    id_dictionary integer not null,
+    id_position   integer not null,
+    id_attribute  integer
+        constraint dictionary_data_dictionary_attribute_id_fk
+            references dictionary_attribute,
+    value         varchar,
+    start_date    date,
+    finish_date   date
+) partition by list (id_dictionary);
+
+create or replace function create_dictionary_partitions(p_dictionary integer)
+    returns void
+    language plpgsql
+as
+$$
+declare
+    parent text;
+begin
+    foreach parent in array array ['dictionary_positions', 'dictionary_data']
+        loop
+            if exists (select null
+                       from pg_partitioned_table pt
+                       where pt.partrelid = to_regclass(parent)
+                         and pt.partstrat = 'l') then
+                execute format(
+                        'create table if not exists %I partition of %I for values in (%s)',
+                        parent || '_' || p_dictionary, parent, p_dictionary
+                        );
+            end if;
+        end loop;
+end
+$$;
+
+create table dictionary_positions_default partition of dictionary_positions default;
+create table dictionary_data_default partition of dictionary_data default;
+
+select create_dictionary_partitions(id) from dictionary;
+
+insert into dictionary_positions (id, id_dictionary) overriding system value
+select id, id_dictionary from dictionary_positions_old;
+
+insert into dictionary_data (id, id_dictionary, id_position, id_attribute, value,
+                             start_date, finish_date) overriding system value
+select id, id_dictionary, id_position, id_attribute, value, start_date, finish_date
+from dictionary_data_old
+-- значения без позиции не переносятся
+where id_dictionary is not null;
+
+drop table dictionary_data_old;
+drop table dictionary_positions_old;
+
+select setval(pg_get_serial_sequence('dictionary_positions', 'id'),
+              coalesce(max(id), 0) + 1, false)
+from dictionary_positions;
+select setval(pg_get_serial_sequence('dictionary_data', 'id'),
+              coalesce(max(id), 0) + 1, false)
+from dictionary_data;
+
+alter table dictionary_positions
+    add constraint dictionary_positions_pk primary key (id_dictionary, id);
+alter table dictionary_data
+    add constraint dictionary_data_pk primary key (id_dictionary, id);
+alter table dictionary_data
+    add constraint dictionary_data_dictionary_positions_fk
+        foreign key (id_dictionary, id_position)
+            references dictionary_positions (id_dictionary, id);
+
+-- Поиск справочника по позиции (MetadataCache.dictionary_by_position) и
+-- изменение значения по id
+create index dictionary_positions_id_index on dictionary_positions (id);
+create index dictionary_data_id_index on dictionary_data (id);
+
+-- Индекс 002_position_query_indexes.sql, теперь по секциям; индекс позиций
+-- (id_dictionary, id) заменен первичным ключом
+create index dictionary_data_position_attribute_index
+    on dictionary_data (id_position, id_attribute, start_date, finish_date);
+
+-- Замена внешних ключей dictionary_relations -> dictionary_positions
+create or replace function dictionary_relations_check_positions()
+    returns trigger
+    language plpgsql
+as
+$$
+declare
+    missing integer;
+begin
+    select r.id_position
+    into missing
+    from (select id_positions as id_position
+          from new_relations
+          union
+          select id_parent_positions
+          from new_relations
+          where id_parent_positions is not null) r
+    where not exists (select null
+                      from dictionary_positions dp
+                      where dp.id = r.id_position)
+    limit 1;
+    if found then
+        raise foreign_key_violation using
+            message = format('dictionary_positions.id = %s does not exist', missing),
+            table = 'dictionary_relations';
+    end if;
+    return null;
+end
+$$;
+
+create trigger dictionary_relations_positions_insert_check
+    after insert
+    on dictionary_relations
+    referencing new table as new_relations
+    for each statement
+execute function dictionary_relations_check_positions();
+
+create trigger dictionary_relations_positions_update_check
+    after update
+    on dictionary_relations
+    referencing new table as new_relations
+    for each statement
+execute function dictionary_relations_check_positions();
+
+create or replace function dictionary_positions_restrict_relations()
+    returns trigger
+    language plpgsql
+as
+$$
+declare
+    referenced integer;
+begin
+    select op.id
+    into referenced
+    from old_positions op
+    where exists (select null
+                  from dictionary_relations dr
+                  where dr.id_positions = op.id
+                     or dr.id_parent_positions = op.id)
+    limit 1;
+    if found then
+        raise foreign_key_violation using
+            message = format('dictionary_positions.id = %s is referenced '
+                                 'from dictionary_relations', referenced),
+            table = 'dictionary_positions';
+    end if;
+    return null;
+end
+$$;
+
+create trigger dictionary_positions_relations_restrict
+    after delete
+    on dictionary_positions
+    referencing old table as old_positions
+    for each statement
+execute function dictionary_positions_restrict_relations();
+
+create index if not exists dictionary_relations_parent_index
+    on dictionary_relations (id_parent_positions);
+
+analyze dictionary_positions;
+analyze dictionary_data;
+
+commit;
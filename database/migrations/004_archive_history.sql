@@ -0,0 +1,25 @@
+-- Архив закрытых периодов (archive.py).
+--
+-- Периоды значений и связей, закончившиеся раньше dictionary.archived_before,
+-- хранятся в таблицах *_history того же состава столбцов. Запросы на даты
+-- не раньше archived_before читают только основные таблицы, на более ранние -
+-- основные вместе с архивными.
+alter table dictionary
+    add column if not exists archived_before date;
+
+create table if not exists dictionary_data_history
+(
+    like dictionary_data including defaults
+);
+
+create table if not exists dictionary_relations_history
+(
+    like dictionary_relations including defaults
+);
+
+create index if not exists dictionary_data_history_position_attribute_index
+    on dictionary_data_history (id_dictionary, id_position, id_attribute,
+                                start_date, finish_date);
+
+create index if not exists dictionary_relations_history_position_index
+    on dictionary_relations_history (id_positions, start_date, finish_date);
@@ -0,0 +1,15 @@
+-- Покрывающий индекс периодов атрибута: соответствие кодов позициям на дату
+-- (DictionaryService.get_code_map) и интервалы действия кодов
+-- (models/model_validity.py) читаются только из индекса (index-only scan).
+-- id_dictionary входит в ключ: запросы фильтруют по нему, и без него каждую
+-- строку пришлось бы проверять по таблице
+drop index if exists dictionary_data_attribute_period_index;
+drop index if exists dictionary_data_history_attribute_period_index;
+
+create index if not exists dictionary_data_attribute_period_index
+    on dictionary_data (id_dictionary, id_attribute, start_date, finish_date)
+    include (id_position, value);
+
+create index if not exists dictionary_data_history_attribute_period_index
+    on dictionary_data_history (id_dictionary, id_attribute, start_date, finish_date)
+    include (id_position, value);
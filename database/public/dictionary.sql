@@ -21,7 +21,8 @@ create table dictionary
             references dictionary_status,
     id_type         integer
         constraint dictionary_dictionary_type_id_fk
-            references dictionary_type
+            references dictionary_type,
+    version         bigint default 0 not null
 );
 
 alter table dictionary
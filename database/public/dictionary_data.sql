@@ -0,0 +1,36 @@
+create table dictionary_data
+(
+    id            integer generated always as identity,
+    id_dictionary integer not null,
+    id_position   integer not null,
+    id_attribute  integer
+        constraint dictionary_data_dictionary_attribute_id_fk
+            references dictionary_attribute,
+    value         varchar,
+    start_date    date,
+    finish_date   date,
+    constraint dictionary_data_pk
+        primary key (id_dictionary, id),
+    constraint dictionary_data_dictionary_positions_fk
+        foreign key (id_dictionary, id_position)
+            references dictionary_positions (id_dictionary, id)
+)
+    partition by list (id_dictionary);
+
+alter table dictionary_data
+    owner to admin_eisgs;
+
+-- секции справочников создает create_dictionary_partitions
+-- (database/migrations/003_partition_by_dictionary.sql)
+create table dictionary_data_default
+    partition of dictionary_data
+        default;
+
+alter table dictionary_data_default
+    owner to admin_eisgs;
+
+create index dictionary_data_id_index
+    on dictionary_data (id);
+
+create index dictionary_data_position_attribute_index
+    on dictionary_data (id_position, id_attribute, start_date, finish_date);
@@ -1,13 +1,32 @@
 create table dictionary_positions
 (
-    id            integer generated always as identity
-        constraint dictionary_positions_pk
-            primary key,
-    id_dictionary integer
+    id            integer generated always as identity,
+    id_dictionary integer not null
         constraint dictionary_positions_dictionary_id_fk
-            references dictionary
-);
+            references dictionary,
+    constraint dictionary_positions_pk
+        primary key (id_dictionary, id)
+)
+    partition by list (id_dictionary);
 
 alter table dictionary_positions
     owner to admin_eisgs;
 
+-- секции справочников создает create_dictionary_partitions
+-- (database/migrations/003_partition_by_dictionary.sql)
+create table dictionary_positions_default
+    partition of dictionary_positions
+        default;
+
+alter table dictionary_positions_default
+    owner to admin_eisgs;
+
+create index dictionary_positions_id_index
+    on dictionary_positions (id);
+
+create trigger dictionary_positions_relations_restrict
+    after delete
+    on dictionary_positions
+    referencing old table as old_positions
+    for each statement
+execute procedure dictionary_positions_restrict_relations();
@@ -1,13 +1,36 @@
-create table dictionary_positions
+create table dictionary_relations
 (
-    id            integer generated always as identity
-        constraint dictionary_positions_pk
+    id                  integer generated always as identity
+        constraint dictionary_relations_pk
             primary key,
-    id_dictionary integer
-        constraint dictionary_positions_dictionary_id_fk
-            references dictionary
+    -- ссылки на dictionary_positions.id проверяют триггеры
+    -- dictionary_relations_positions_*_check
+    -- (database/migrations/003_partition_by_dictionary.sql)
+    id_positions        integer,
+    id_parent_positions integer,
+    start_date          date,
+    finish_date         date
 );
 
-alter table dictionary_positions
+alter table dictionary_relations
     owner to admin_eisgs;
 
+create index dictionary_relations_position_index
+    on dictionary_relations (id_positions, start_date, finish_date);
+
+create index dictionary_relations_parent_index
+    on dictionary_relations (id_parent_positions);
+
+create trigger dictionary_relations_positions_insert_check
+    after insert
+    on dictionary_relations
+    referencing new table as new_relations
+    for each statement
+execute procedure dictionary_relations_check_positions();
+
+create trigger dictionary_relations_positions_update_check
+    after update
+    on dictionary_relations
+    referencing new table as new_relations
+    for each statement
+execute procedure dictionary_relations_check_positions();
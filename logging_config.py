@@ -0,0 +1,182 @@
+"""
+Настройка журналирования сервиса
+
+Журналирование настраивается один раз при старте приложения (setup_logging
+в main.py). Модули только получают свой логгер через logging.getLogger.
+
+Запись в файл и консоль выполняется в отдельном потоке QueueListener:
+в цикле событий сообщение лишь кладется в очередь. Сообщения выводятся
+в JSON (settings.log_json) по одному объекту на строку. Отладочные
+сообщения можно прореживать (settings.log_debug_sample_rate): из каждой
+серии одинаковых шаблонов сообщения пропускается каждое N-е.
+"""
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from config import settings
+
+# Атрибуты LogRecord, которые не считаются дополнительными полями (extra)
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+# Сторонние логгеры, которые пишут каждый запрос на уровне DEBUG/INFO
+QUIET_LOGGERS = {"databases": logging.WARNING}
+
+SLOW_QUERY_LOGGER = "slow_query"
+PLAN_LOGGER = "slow_query.plan"
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирование записи в одну строку JSON
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created)
+            .astimezone()
+            .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """
+    Прореживание отладочных сообщений: из сообщений с одинаковым шаблоном
+    пропускается каждое every-е (первое - всегда)
+    """
+
+    MAX_TEMPLATES = 10_000
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counters: Dict[Tuple[str, str], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if self.every == 0:
+            return False
+        key = (record.name, str(record.msg))
+        if key not in self._counters and len(self._counters) >= self.MAX_TEMPLATES:
+            self._counters.clear()
+        count = self._counters.get(key, 0)
+        self._counters[key] = count + 1
+        return count % self.every == 0
+
+
+class _ExcludeLogger(logging.Filter):
+    """Отсев записей логгера name и его потомков"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not super().filter(record)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в цикле событий
+
+    Стандартный QueueHandler.prepare полностью форматирует запись перед
+    помещением в очередь. Здесь подставляются только аргументы сообщения
+    (они могут измениться после возврата из logger.debug), а сериализация
+    в JSON выполняется в потоке QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _formatter() -> logging.Formatter:
+    if settings.log_json:
+        return JsonFormatter()
+    return logging.Formatter(settings.log_format, settings.log_date)
+
+
+def _file_handler(path: str, formatter: logging.Formatter) -> logging.Handler:
+    # Каталог журналов (например, logs/ из LOG_FILE в Dockerfile) создается
+    # при старте, а не хранится в репозитории
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handler = logging.FileHandler(path, delay=True, encoding="utf-8")
+    handler.setFormatter(formatter)
+    return handler
+
+
+def setup_logging() -> None:
+    """
+    Настройка журналирования процесса (повторный вызов ничего не делает)
+    """
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        return
+
+    formatter = _formatter()
+    main_handlers = [
+        _file_handler(settings.log_file, formatter),
+        logging.StreamHandler(),
+    ]
+    main_handlers[1].setFormatter(formatter)
+    for handler in main_handlers:
+        handler.addFilter(_ExcludeLogger(PLAN_LOGGER))
+
+    slow_handler = _file_handler(settings.slow_query_log_file, formatter)
+    slow_handler.addFilter(logging.Filter(SLOW_QUERY_LOGGER))
+    slow_handler.addFilter(_ExcludeLogger(PLAN_LOGGER))
+    plan_handler = _file_handler(settings.slow_query_explain_file, formatter)
+    plan_handler.addFilter(logging.Filter(PLAN_LOGGER))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSampler(settings.log_debug_sample_rate))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.log_level)
+    for name, level in QUIET_LOGGERS.items():
+        logging.getLogger(name).setLevel(level)
+    logging.getLogger(SLOW_QUERY_LOGGER).setLevel(logging.WARNING)
+    logging.getLogger(PLAN_LOGGER).setLevel(logging.INFO)
+
+    _listener = QueueListener(log_queue, *main_handlers, slow_handler, plan_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Запись оставшихся в очереди сообщений и остановка потока"""
+    global _listener  # pylint: disable=global-statement
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
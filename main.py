@@ -1,10 +1,17 @@
 from contextlib import asynccontextmanager
 import logging
 from fastapi import FastAPI, APIRouter
+from fastapi.responses import JSONResponse, Response
+import metrics
 from routers.dictionary import dict_router
 from routers.dictionary_v1 import dict_router as dict_router1
 from database import database
-from config import settings
+from change_feed import change_feed
+from compression import CompressionMiddleware
+from logging_config import setup_logging
+from pagination import NEXT_CURSOR_HEADER
+from replicas import ReadYourWritesMiddleware, replica_pool
+from warmup import warmup
 from fastapi.middleware.cors import CORSMiddleware
 
 from fastapi.openapi.docs import (
@@ -15,12 +22,7 @@ from fastapi.openapi.docs import (
 
 from fastapi.staticfiles import StaticFiles
 
-logging.basicConfig(
-    level=settings.log_level,
-    format=settings.log_format,
-    datefmt=settings.log_date,
-    handlers=[logging.FileHandler(settings.log_file), logging.StreamHandler()],
-)
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +32,13 @@ async def lifespan(app: FastAPI):
     logger.info("Trying connect to database")
     await database.connect()
     logger.info("Connected to database")
+    await replica_pool.connect()
+    await change_feed.start()
+    warmup.start()
     yield
+    await warmup.stop()
+    await change_feed.stop()
+    await replica_pool.disconnect()
     await database.disconnect()
     logger.info("Disconnected from database")
 
@@ -61,7 +69,11 @@ app.add_middleware(
     allow_credentials=True,  # Разрешает куки и заголовки авторизации
     allow_methods=["*"],  # Разрешает все методы (GET, POST, PUT и т. д.)
     allow_headers=["*"],  # Разрешает все заголовки
+    expose_headers=[NEXT_CURSOR_HEADER],  # Курсор следующей страницы
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
@@ -82,6 +94,17 @@ async def swagger_ui_redirect():
     return get_swagger_ui_oauth2_redirect_html()
 
 
+@app.get("/ready", include_in_schema=False)
+async def readiness():
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if warmup.ready else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/redoc", include_in_schema=False)
 async def redoc_html():
     return get_redoc_html(
@@ -0,0 +1,307 @@
+"""
+Метрики сервиса в формате Prometheus
+
+Метрики хранятся в памяти процесса и отдаются эндпоинтом /metrics
+(см. main.py), внешний сборщик не нужен:
+- количество и время обработки запросов по маршрутам (MetricsMiddleware);
+- количество и время выполнения именованных запросов к БД (queries.py);
+- количество строк, полученных из БД при обработке запроса;
+- занятость пула соединений и попадания в кэши (собираются при выгрузке).
+"""
+
+import contextvars
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from cache import registered_caches
+from database import database
+from replicas import replica_pool
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Строка выгрузки: имя, метки, значение
+Sample = Tuple[str, Dict[str, str], float]
+
+# Счетчик строк, полученных из БД в рамках текущего HTTP-запроса
+_request_rows: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar(
+    "request_rows", default=None
+)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    items = []
+    for key, value in labels.items():
+        value = (
+            str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        )
+        items.append('%s="%s"' % (key, value))
+    return "{" + ",".join(items) + "}"
+
+
+class Metric:
+    """
+    Метрика с набором меток
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labelvalues: Sequence[str]) -> Tuple[str, ...]:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(value) for value in labelvalues)
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Монотонно возрастающий счетчик"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        key = self._key(labelvalues)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(self._key(labelvalues), 0.0)
+
+    def samples(self) -> Iterable[Sample]:
+        for key, value in self._values.items():
+            yield self.name, dict(zip(self.labelnames, key, strict=True)), value
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными границами интервалов"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # метки -> (счетчики по интервалам, сумма)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        key = self._key(labelvalues)
+        counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        total[0] += value
+
+    def count(self, *labelvalues: str) -> int:
+        counts, _ = self._values.get(self._key(labelvalues), ([], [0.0]))
+        return sum(counts)
+
+    def samples(self) -> Iterable[Sample]:
+        for key, (counts, total) in self._values.items():
+            labels = dict(zip(self.labelnames, key, strict=True))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts, strict=True):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    {**labels, "le": _format_value(bound)},
+                    cumulative,
+                )
+            yield f"{self.name}_count", labels, cumulative
+            yield f"{self.name}_sum", labels, total[0]
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        # Функции, возвращающие (имя, тип, описание, строки) в момент выгрузки
+        self._collectors: List[Callable[[], Iterable[Tuple]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Выгрузка всех метрик в текстовом формате Prometheus"""
+        families = [
+            (metric.name, metric.kind, metric.documentation, metric.samples())
+            for metric in self._metrics
+        ]
+        for collector in self._collectors:
+            families.extend(collector())
+
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(
+                    f"{sample_name}{_format_labels(labels)} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_REQUEST_ROWS = registry.histogram(
+    "http_request_db_rows",
+    "Rows fetched from database per HTTP request",
+    ("method", "route"),
+    ROWS_BUCKETS,
+)
+DB_QUERIES = registry.counter(
+    "db_queries_total", "Named database queries", ("query", "status")
+)
+DB_QUERY_DURATION = registry.histogram(
+    "db_query_duration_seconds", "Named database query latency", ("query",)
+)
+
+
+def observe_query(name: str, elapsed: float, rows: int, failed: bool) -> None:
+    """
+    Учет выполнения именованного запроса
+    :param name: имя запроса
+    :param elapsed: время выполнения, с
+    :param rows: количество полученных строк
+    :param failed: запрос завершился ошибкой
+    """
+    DB_QUERIES.inc(name, "error" if failed else "ok")
+    DB_QUERY_DURATION.observe(elapsed, name)
+    counter = _request_rows.get()
+    if counter is not None:
+        counter[0] += rows
+
+
+def _collect_pool():
+    servers = [("primary", database)] + [
+        (replica.name, replica.database) for replica in replica_pool.replicas
+    ]
+    connections = []
+    for server, db in servers:
+        pool = getattr(getattr(db, "_backend", None), "_pool", None)
+        if pool is None:
+            continue
+        for state, value in (
+            ("total", pool.get_size()),
+            ("idle", pool.get_idle_size()),
+            ("max", pool.get_max_size()),
+        ):
+            connections.append(
+                ("db_pool_connections", {"server": server, "state": state}, value)
+            )
+    healthy = [
+        ("db_replica_healthy", {"server": replica.name}, int(replica.healthy))
+        for replica in replica_pool.replicas
+    ]
+    return [
+        ("db_pool_connections", "gauge", "Database pool connections", connections),
+        ("db_replica_healthy", "gauge", "Read replica health", healthy),
+    ]
+
+
+def _collect_caches():
+    caches = registered_caches()
+    hits = [("cache_hits_total", {"cache": c.name}, c.hits) for c in caches]
+    misses = [("cache_misses_total", {"cache": c.name}, c.misses) for c in caches]
+    entries = [("cache_entries", {"cache": c.name}, len(c)) for c in caches]
+    ratio = [
+        ("cache_hit_ratio", {"cache": c.name}, c.hits / (c.hits + c.misses))
+        for c in caches
+        if c.hits + c.misses
+    ]
+    return [
+        ("cache_hits_total", "counter", "Cache hits", hits),
+        ("cache_misses_total", "counter", "Cache misses", misses),
+        ("cache_entries", "gauge", "Cache entries", entries),
+        ("cache_hit_ratio", "gauge", "Cache hit ratio", ratio),
+    ]
+
+
+registry.add_collector(_collect_pool)
+registry.add_collector(_collect_caches)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware учета HTTP-запросов
+
+    Метка route - шаблон пути маршрута (/api/v2/models/dictionary/), а не
+    фактический путь, чтобы количество рядов метрики не зависело от параметров.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+        rows = [0]
+        token = _request_rows.set(rows)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_rows.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, route, str(status["code"]))
+            HTTP_REQUEST_DURATION.observe(elapsed, method, route)
+            HTTP_REQUEST_ROWS.observe(rows[0], method, route)
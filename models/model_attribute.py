@@ -12,24 +12,21 @@
 import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
 
+import numpy as np
 import pandas as pd
 
-from config import settings
-from database import database
-from schemas import AttrShown
+from change_feed import change_feed
+import queries
+from models.model_metadata import MetadataCache
+from schemas import AttrShown, ImportIssue, ImportReport
 
-logging.basicConfig(
-    level=settings.log_level,
-    format=settings.log_format,
-    datefmt=settings.log_date,
-    handlers=[logging.FileHandler(settings.log_file), logging.StreamHandler()],
-)
+logger = logging.getLogger(__name__)
 
-logging.getLogger("databases").setLevel(logging.CRITICAL)
 
-logger = logging.getLogger(__name__)
+class ArchivedPeriodError(ValueError):
+    """Изменение затрагивает периоды, перенесенные в архив (archive.py)"""
 
 
 class AttributeManager:
@@ -40,13 +37,16 @@ class AttributeManager:
     # Константы
     NULL_VALUES = ("nan", "none", "null", "")
     BATCH_SIZE = 1000
+    # Значений в одном запросе массовой вставки (_bulk_insert_data)
+    BULK_SIZE = 20000
+    # Номеров строк в одной ошибке отчета о проверке импорта
+    REPORT_ROWS_LIMIT = 100
 
     @staticmethod
     async def _fetch_dates(dictionary_id: int) -> Dict[str, datetime.date]:
-        """Получаем сразу все даты для справочника одним запросом"""
-        sql = "SELECT start_date, finish_date FROM dictionary WHERE id = :id"
-        row = await database.fetch_one(sql, {"id": dictionary_id})
-        return {"start_date": row["start_date"], "finish_date": row["finish_date"]}
+        """Даты действия справочника из кэша метаданных"""
+        metadata = await MetadataCache.get(dictionary_id)
+        return {"start_date": metadata.start_date, "finish_date": metadata.finish_date}
 
     @staticmethod
     async def _batch_create_positions(dictionary_id: int, count: int) -> List[int]:
@@ -56,8 +56,8 @@ class AttributeManager:
             SELECT :id_dictionary FROM generate_series(1, :count)
             RETURNING id
         """
-        rows = await database.fetch_all(
-            sql, {"id_dictionary": dictionary_id, "count": count}
+        rows = await queries.statement("position.create_batch", sql).fetch_all(
+            {"id_dictionary": dictionary_id, "count": count}
         )
         return [row["id"] for row in rows]
 
@@ -69,37 +69,354 @@ class AttributeManager:
             values (:id_dictionary)
             RETURNING id
         """
-        row = await database.fetch_one(sql, {"id_dictionary": dictionary_id})
+        row = await queries.statement("position.create", sql).fetch_one(
+            {"id_dictionary": dictionary_id}
+        )
         return row["id"]
 
     @staticmethod
     async def _get_attributes_info(dictionary_id: int) -> Dict[str, Dict]:
-        """Получаем всю информацию об атрибутах одним запросом"""
-        sql = """
-                SELECT id, alt_name FROM dictionary_attribute
-                WHERE id_dictionary = :id_dictionary AND alt_name IS NOT NULL
-            """
-        rows = await database.fetch_all(sql, {"id_dictionary": dictionary_id})
-        return {row["alt_name"]: {"id": row["id"]} for row in rows}
+        """Информация об атрибутах из кэша метаданных"""
+        metadata = await MetadataCache.get(dictionary_id)
+        return {
+            alt_name: {"id": attribute_id}
+            for alt_name, attribute_id in metadata.attributes.items()
+        }
 
     @staticmethod
     async def _get_dictionary_by_position(position_id: int) -> int:
-        sql = """
-        SELECT id_dictionary FROM dictionary_positions dp
-        where id = :position_id
-        """
-        row = await database.fetch_one(sql, {"position_id": position_id})
-        return row["id_dictionary"]
+        return await MetadataCache.dictionary_by_position(position_id)
 
     @staticmethod
     async def _batch_insert_data(data: List[Dict]) -> None:
         """Пакетная вставка данных"""
         sql = """
                INSERT INTO dictionary_data
-               (id_position, id_attribute, start_date, finish_date, value)
-               VALUES (:id_position, :id_attribute, :start_date, :finish_date, :value)
+               (id_dictionary, id_position, id_attribute, start_date, finish_date,
+               value)
+               VALUES (:id_dictionary, :id_position, :id_attribute, :start_date,
+               :finish_date, :value)
            """
-        await database.execute_many(sql, data)
+        await queries.statement("data.insert", sql).execute_many(data)
+
+    @staticmethod
+    async def _bulk_insert_data(
+        dictionary_id: int,
+        data: pd.DataFrame,
+        start_date: datetime.date,
+        finish_date: datetime.date,
+    ) -> None:
+        """
+        Массовая вставка значений одного периода
+
+        Значения передаются столбцами-массивами и разворачиваются через unnest:
+        один запрос на BULK_SIZE значений вместо строки параметров на значение
+        :param dictionary_id: идентификатор справочника
+        :param data: значения в длинном формате (id_position, id_attribute, value)
+        :param start_date: начало периода
+        :param finish_date: окончание периода
+        """
+        sql = """
+            INSERT INTO dictionary_data
+            (id_dictionary, id_position, id_attribute, start_date, finish_date,
+            value)
+            SELECT :id_dictionary, v.id_position, v.id_attribute, :start_date,
+                :finish_date, v.value
+            FROM unnest(:id_positions::integer[], :id_attributes::integer[],
+                :values::text[]) AS v(id_position, id_attribute, value)
+        """
+        statement = queries.statement("data.insert_bulk", sql)
+        for start in range(0, len(data), AttributeManager.BULK_SIZE):
+            chunk = data.iloc[start : start + AttributeManager.BULK_SIZE]
+            await statement.execute(
+                {
+                    "id_dictionary": dictionary_id,
+                    "id_positions": chunk["id_position"].tolist(),
+                    "id_attributes": chunk["id_attribute"].tolist(),
+                    "values": chunk["value"].tolist(),
+                    "start_date": start_date,
+                    "finish_date": finish_date,
+                }
+            )
+
+    @staticmethod
+    def _to_long_format(
+        rows: pd.DataFrame, position_ids: List[int], attributes_info: Dict[str, Dict]
+    ) -> pd.DataFrame:
+        """
+        Перевод строк файла импорта в длинный формат без цикла по строкам
+
+        Пустые значения (NULL_VALUES) заменяются на None проверкой столбцов
+        целиком, идентификаторы позиций присваиваются массивом, а столбцы
+        атрибутов разворачиваются в строки (melt)
+        :param rows: строки файла импорта
+        :param position_ids: идентификаторы позиций в порядке строк
+        :param attributes_info: атрибуты справочника по alt_name
+        :return: DataFrame со столбцами id_position, id_attribute, value
+        """
+        columns = [column for column in rows.columns if column in attributes_info]
+        values = rows[columns].astype(str)
+        values = values.mask(AttributeManager._null_mask(values), None)
+        values.insert(0, "id_position", position_ids)
+        data = values.melt(
+            id_vars="id_position", var_name="alt_name", value_name="value"
+        )
+        data["id_attribute"] = data["alt_name"].map(
+            {name: info["id"] for name, info in attributes_info.items()}
+        )
+        return data[["id_position", "id_attribute", "value"]]
+
+    @staticmethod
+    def _null_mask(values: pd.DataFrame) -> pd.DataFrame:
+        """
+        Маска пустых значений (NULL_VALUES), вычисляемая по столбцам целиком
+        :param values: значения, приведенные к строкам (astype(str))
+        :return: DataFrame той же формы из True/False
+        """
+        return values.apply(
+            lambda column: column.str.strip()
+            .str.lower()
+            .isin(AttributeManager.NULL_VALUES)
+        )
+
+    @staticmethod
+    async def _fetch_codes(dictionary_id: int, alt_name: str = "CODE") -> pd.DataFrame:
+        """
+        Все периоды кодов позиций справочника одним запросом
+        :param dictionary_id: идентификатор справочника
+        :param alt_name: атрибут с кодом (CODE или PARENT_CODE)
+        :return: DataFrame со столбцами code, id_position, start_date, finish_date
+        """
+        sql = """
+            SELECT dd.value AS code, dd.id_position, dd.start_date, dd.finish_date
+            FROM dictionary_data dd
+            JOIN dictionary_attribute da ON da.id = dd.id_attribute
+            WHERE dd.id_dictionary = :id_dictionary
+                AND da.id_dictionary = :id_dictionary AND da.alt_name = :alt_name
+                AND dd.value IS NOT NULL
+        """
+        rows = await queries.statement("dictionary.codes", sql).fetch_all(
+            {"id_dictionary": dictionary_id, "alt_name": alt_name}
+        )
+        return pd.DataFrame.from_records(
+            [tuple(row) for row in rows],
+            columns=["code", "id_position", "start_date", "finish_date"],
+        )
+
+    @staticmethod
+    def _date_ordinals(column: pd.Series) -> np.ndarray:
+        """
+        Разбор дат формата ГГГГ-ММ-ДД в порядковые номера дней
+
+        Разбирается каждое различное значение один раз; pd.to_datetime
+        не подходит - он не принимает даты после 2262 года (31.12.9999)
+        :param column: значения (пустые - NaN)
+        :return: порядковые номера дней, NaN для пустых и ошибочных значений
+        """
+        codes, uniques = pd.factorize(column)
+        ordinals = np.full(len(uniques) + 1, np.nan)
+        for index, value in enumerate(uniques):
+            try:
+                ordinals[index] = datetime.strptime(value, "%Y-%m-%d").toordinal()
+            except ValueError:
+                pass
+        # codes == -1 (пустое значение) указывает на последний элемент - NaN
+        return ordinals[codes]
+
+    @staticmethod
+    def _issue(
+        check: str,
+        column: Optional[str],
+        mask: pd.Series,
+        values: Optional[pd.Series] = None,
+    ) -> Optional[ImportIssue]:
+        """
+        Ошибка проверки по маске ошибочных строк
+        :param check: вид проверки
+        :param column: столбец
+        :param mask: маска ошибочных строк
+        :param values: значения столбца (для примеров)
+        :return: ошибка или None, если ошибочных строк нет
+        """
+        count = int(mask.sum())
+        if not count:
+            return None
+        limit = AttributeManager.REPORT_ROWS_LIMIT
+        positions = np.flatnonzero(mask.to_numpy())[:limit]
+        return ImportIssue(
+            check=check,
+            column=column,
+            count=count,
+            # Строка 1 файла - заголовок
+            rows=(positions + 2).tolist(),
+            values=[] if values is None else values.iloc[positions].tolist(),
+        )
+
+    @staticmethod
+    async def validate_import(dictionary_id: int, df: pd.DataFrame) -> ImportReport:
+        """
+        Проверка файла импорта без записи в базу данных
+
+        Все проверки выполняются по столбцам целиком: обязательные атрибуты,
+        повторяющиеся коды, коды родителей без позиции (в файле или
+        в справочнике), формат START_DATE/FINISH_DATE, превышение размерности
+        и неизвестные столбцы
+        :param dictionary_id: идентификатор справочника
+        :param df: импортируемый dataframe (все значения - строки)
+        :return: отчет о проверке
+        """
+        metadata = await MetadataCache.get(dictionary_id)
+        required_fields = await AttributeManager._get_required_fields(dictionary_id)
+        df = df.reset_index(drop=True)
+        values = df.astype(str)
+        nulls = AttributeManager._null_mask(values)
+        filled = values.mask(nulls)
+        issues = []
+
+        for column in df.columns:
+            if column not in metadata.attributes:
+                issues.append(
+                    ImportIssue(check="unknown_column", column=column, count=len(df))
+                )
+        for column in required_fields:
+            if column not in df.columns:
+                issues.append(
+                    ImportIssue(check="missing_column", column=column, count=len(df))
+                )
+            else:
+                issues.append(
+                    AttributeManager._issue("missing_value", column, nulls[column])
+                )
+
+        if "CODE" in df.columns:
+            codes = filled["CODE"]
+            issues.append(
+                AttributeManager._issue(
+                    "duplicate_code",
+                    "CODE",
+                    codes.notna() & codes.duplicated(keep=False),
+                    codes,
+                )
+            )
+            if "PARENT_CODE" in df.columns:
+                existing = await AttributeManager._fetch_codes(dictionary_id)
+                parents = filled["PARENT_CODE"]
+                known = parents.isin(codes) | parents.isin(existing["code"])
+                issues.append(
+                    AttributeManager._issue(
+                        "unknown_parent",
+                        "PARENT_CODE",
+                        parents.notna() & ~known,
+                        parents,
+                    )
+                )
+
+        dates = {}
+        for column in ("START_DATE", "FINISH_DATE"):
+            if column in df.columns:
+                dates[column] = AttributeManager._date_ordinals(filled[column])
+                issues.append(
+                    AttributeManager._issue(
+                        "bad_date",
+                        column,
+                        filled[column].notna() & np.isnan(dates[column]),
+                        filled[column],
+                    )
+                )
+        if len(dates) == 2:
+            issues.append(
+                AttributeManager._issue(
+                    "bad_period",
+                    "FINISH_DATE",
+                    pd.Series(dates["START_DATE"] > dates["FINISH_DATE"]),
+                    filled["FINISH_DATE"],
+                )
+            )
+
+        for column, capacity in metadata.capacities.items():
+            if column in df.columns and capacity:
+                issues.append(
+                    AttributeManager._issue(
+                        "over_capacity",
+                        column,
+                        filled[column].str.len() > capacity,
+                        filled[column],
+                    )
+                )
+
+        issues = [issue for issue in issues if issue is not None]
+        return ImportReport(valid=not issues, rows=len(df), issues=issues)
+
+    @staticmethod
+    def _resolve_relations(
+        children: pd.DataFrame, parents: pd.DataFrame
+    ) -> pd.DataFrame:
+        """
+        Связи позиций с родителями соединением по коду (hash join) в памяти
+
+        Ребенок связывается с каждым периодом родительского кода, который
+        пересекается с периодом его PARENT_CODE; связь действует на пересечении.
+        Учитываются только пары, где ребенок или родитель новые - связи между
+        уже существующими позициями не меняются
+        :param children: периоды PARENT_CODE (code, id_position, start_date,
+            finish_date, new)
+        :param parents: периоды CODE с теми же столбцами
+        :return: DataFrame со столбцами id_positions, id_parent_positions,
+            start_date, finish_date
+        """
+        pairs = children.merge(parents, on="code", suffixes=("", "_parent"))
+        pairs = pairs[
+            (pairs["new"] | pairs["new_parent"])
+            & (pairs["start_date_parent"] < pairs["finish_date"])
+            & (pairs["finish_date_parent"] > pairs["start_date"])
+        ]
+        return pd.DataFrame(
+            {
+                "id_positions": pairs["id_position"].to_numpy(),
+                "id_parent_positions": pairs["id_position_parent"].to_numpy(),
+                "start_date": np.where(
+                    pairs["start_date_parent"] > pairs["start_date"],
+                    pairs["start_date_parent"],
+                    pairs["start_date"],
+                ),
+                "finish_date": np.where(
+                    pairs["finish_date_parent"] < pairs["finish_date"],
+                    pairs["finish_date_parent"],
+                    pairs["finish_date"],
+                ),
+            },
+            columns=[
+                "id_positions",
+                "id_parent_positions",
+                "start_date",
+                "finish_date",
+            ],
+        )
+
+    @staticmethod
+    async def _bulk_insert_relations(relations: pd.DataFrame) -> None:
+        """
+        Массовая вставка связей массивами через unnest, по BULK_SIZE за запрос
+        :param relations: результат _resolve_relations
+        """
+        sql = """
+            INSERT INTO dictionary_relations
+            (id_positions, id_parent_positions, start_date, finish_date)
+            SELECT * FROM unnest(:id_positions::integer[],
+                :id_parent_positions::integer[], :start_dates::date[],
+                :finish_dates::date[])
+        """
+        statement = queries.statement("relations.insert_bulk", sql)
+        for start in range(0, len(relations), AttributeManager.BULK_SIZE):
+            chunk = relations.iloc[start : start + AttributeManager.BULK_SIZE]
+            await statement.execute(
+                {
+                    "id_positions": chunk["id_positions"].tolist(),
+                    "id_parent_positions": chunk["id_parent_positions"].tolist(),
+                    "start_dates": chunk["start_date"].tolist(),
+                    "finish_dates": chunk["finish_date"].tolist(),
+                }
+            )
 
     @staticmethod
     def _dates_overlap(row: dict, parent_row: dict) -> bool:
@@ -118,32 +435,36 @@ class AttributeManager:
         """
         try:
             # Удаляем старые отношения
-            await database.execute(
+            await queries.statement(
+                "relations.delete_position",
                 "DELETE FROM dictionary_relations WHERE id_positions = :id",
-                {"id": position_id},
-            )
+            ).execute({"id": position_id})
 
             # Получаем все родительские коды одним запросом
-            parent_codes = await database.fetch_all(
+            parent_codes = await queries.statement(
+                "relations.parent_codes",
                 """SELECT dd.value, dd.start_date, dd.finish_date
                 FROM dictionary_data dd
                 JOIN dictionary_attribute da ON dd.id_attribute = da.id
-                WHERE dd.id_position = :id_position AND da.alt_name = 'PARENT_CODE' """,
-                {"id_position": position_id},
-            )
+                WHERE dd.id_dictionary = :id_dictionary
+                AND dd.id_position = :id_position AND da.alt_name = 'PARENT_CODE' """,
+            ).fetch_all({"id_dictionary": dictionary_id, "id_position": position_id})
 
             # Подготавливаем данные для пакетной вставки
             relations_to_insert = []
 
             for code in parent_codes:
-                candidates = await database.fetch_all(
+                candidates = await queries.statement(
+                    "relations.parent_candidates",
                     """SELECT dd.id_position, dd.start_date, dd.finish_date
                     FROM dictionary_data dd
                     JOIN dictionary_attribute da ON dd.id_attribute = da.id
-                    WHERE da.id_dictionary = :id_dictionary
+                    WHERE dd.id_dictionary = :id_dictionary
+                    AND da.id_dictionary = :id_dictionary
                     AND da.alt_name = 'CODE'
                     AND dd.value = CAST(:parent_code AS text)""",
-                    {"id_dictionary": dictionary_id, "parent_code": code["value"]},
+                ).fetch_all(
+                    {"id_dictionary": dictionary_id, "parent_code": code["value"]}
                 )
 
                 for candidate in candidates:
@@ -167,13 +488,13 @@ class AttributeManager:
                     )
             # Вставляем все отношения одним запросом
             if relations_to_insert:
-                await database.execute_many(
+                await queries.statement(
+                    "relations.insert",
                     """INSERT INTO dictionary_relations
                     (id_positions, id_parent_positions, start_date, finish_date)
                     VALUES (:id_positions, :id_parent_positions,
                     :start_date, :finish_date)""",
-                    relations_to_insert,
-                )
+                ).execute_many(relations_to_insert)
 
             logger.info("Successfully updated relations for position: %s", position_id)
         except Exception as e:
@@ -202,46 +523,63 @@ class AttributeManager:
         valid_rows = df[df["CODE"].notna() & df["NAME"].notna()]
         total_rows = len(valid_rows)
 
+        # Коды справочника до импорта - для связей с уже существующими позициями
+        existing_codes = await AttributeManager._fetch_codes(dictionary_id)
+        existing_parents = await AttributeManager._fetch_codes(
+            dictionary_id, "PARENT_CODE"
+        )
+
         # Создаем все позиции одним запросом
         position_ids = await AttributeManager._batch_create_positions(
             dictionary_id, total_rows
         )
 
-        # Подготавливаем данные для пакетной вставки
-        data_to_insert = []
-        valid_attributes = set(attributes_info.keys()) & set(df.columns)
-
-        for idx, (_, row) in enumerate(valid_rows.iterrows()):
-            position_id = position_ids[idx]
-            for attr in valid_attributes:
-                value = str(row[attr])
-                clean_value = (
-                    None
-                    if value.strip().lower() in AttributeManager.NULL_VALUES
-                    else value
-                )
-
-                data_to_insert.append(
-                    {
-                        "id_position": position_id,
-                        "id_attribute": attributes_info[attr]["id"],
-                        "start_date": dates["start_date"],
-                        "finish_date": dates["finish_date"],
-                        "value": clean_value,
-                    }
-                )
+        data = AttributeManager._to_long_format(
+            valid_rows, position_ids, attributes_info
+        )
+        await AttributeManager._bulk_insert_data(
+            dictionary_id, data, dates["start_date"], dates["finish_date"]
+        )
 
-                # Вставляем батчами
-                if len(data_to_insert) >= AttributeManager.BATCH_SIZE:
-                    await AttributeManager._batch_insert_data(data_to_insert)
-                    data_to_insert = []
+        # Связи строятся по кодам в памяти, без запросов по каждой позиции
+        def imported(alt_name: str) -> pd.DataFrame:
+            attribute = attributes_info.get(alt_name, {}).get("id")
+            return data[data["id_attribute"] == attribute]
 
-        # Вставляем оставшиеся записи
-        if data_to_insert:
-            await AttributeManager._batch_insert_data(data_to_insert)
+        relations = AttributeManager._resolve_relations(
+            AttributeManager._code_periods(
+                existing_parents, imported("PARENT_CODE"), dates
+            ),
+            AttributeManager._code_periods(existing_codes, imported("CODE"), dates),
+        )
+        await AttributeManager._bulk_insert_relations(relations)
+        await change_feed.publish(dictionary_id)
 
-        # Генерируем отношения
-        await AttributeManager.generate_relations_for_dictionary(dictionary_id)
+    @staticmethod
+    def _code_periods(
+        existing: pd.DataFrame, imported: pd.DataFrame, dates: Dict[str, datetime.date]
+    ) -> pd.DataFrame:
+        """
+        Периоды кодов справочника вместе с загруженными из файла
+        :param existing: результат _fetch_codes
+        :param imported: значения атрибута кода в длинном формате
+        :param dates: период действия загруженных значений
+        :return: DataFrame для _resolve_relations (флаг new - позиция из файла)
+        """
+        imported = imported[imported["value"].notna()]
+        imported = pd.DataFrame(
+            {
+                "code": imported["value"].to_numpy(),
+                "id_position": imported["id_position"].to_numpy(),
+                "start_date": dates["start_date"],
+                "finish_date": dates["finish_date"],
+                "new": True,
+            },
+            columns=["code", "id_position", "start_date", "finish_date", "new"],
+        )
+        return pd.concat(
+            [existing.assign(new=False), imported], ignore_index=True
+        ).astype({"new": bool})
 
     @staticmethod
     async def generate_relations_for_dictionary(dictionary_id: int) -> None:
@@ -252,10 +590,10 @@ class AttributeManager:
         """
 
         # Получаем все позиции одним запросом
-        positions = await database.fetch_all(
+        positions = await queries.statement(
+            "position.list",
             "SELECT id FROM dictionary_positions WHERE id_dictionary = :id_dictionary",
-            {"id_dictionary": dictionary_id},
-        )
+        ).fetch_all({"id_dictionary": dictionary_id})
 
         # Используем asyncio.gather для параллельного выполнения
         tasks = [
@@ -271,16 +609,12 @@ class AttributeManager:
         :param dictionary_id: идентификатор справочника
         :return: справочник полей
         """
-        sql = """
-                select alt_name from dictionary_attribute
-                where id_dictionary =:id_dictionary
-                and required=true
-        """
-        rows = await database.fetch_all(sql, {"id_dictionary": dictionary_id})
-        return [row["alt_name"] for row in rows]
+        metadata = await MetadataCache.get(dictionary_id)
+        return list(metadata.required_fields)
 
     @staticmethod
     async def _delete_nested_period(
+        dictionary_id: int,
         position_id: int,
         attribute_id: int,
         start_date: datetime.date,
@@ -290,6 +624,7 @@ class AttributeManager:
          Удаляем значения, полностью попадающие в указанный временной период
 
         Args:
+            dictionary_id: идентификатор справочника (секция dictionary_data)
             position_id: идентификатор позиции
             attribute_id: идентификатор атрибута
             start_date: начало действия
@@ -303,21 +638,22 @@ class AttributeManager:
 
         sql = """
                DELETE FROM dictionary_data
-               WHERE id_position = :position_id
+               WHERE id_dictionary = :id_dictionary
+               AND id_position = :position_id
                AND id_attribute = :attribute_id
                AND start_date >= :start_date
                AND finish_date <= :finish_date
            """
 
         try:
-            await database.execute(
-                sql,
+            await queries.statement("data.delete_nested", sql).execute(
                 {
+                    "id_dictionary": dictionary_id,
                     "position_id": position_id,
                     "attribute_id": attribute_id,
                     "start_date": start_date,
                     "finish_date": finish_date,
-                },
+                }
             )
             logger.debug(
                 "Deleted nested period for position %d, attribute %d (%s to %s)",
@@ -337,6 +673,7 @@ class AttributeManager:
 
     @staticmethod
     async def _shift_next_period(
+        dictionary_id: int,
         position_id: int,
         attribute_id: int,
         finish_date: datetime.date,
@@ -351,6 +688,7 @@ class AttributeManager:
         - Если значения совпадают - объединяем периоды
 
         Args:
+            dictionary_id: ID справочника (секция dictionary_data)
             position_id: ID позиции справочника
             attribute_id: ID атрибута
             finish_date: Дата окончания текущего периода
@@ -364,49 +702,54 @@ class AttributeManager:
         """
 
         # Получаем следующий период
-        next_period = await database.fetch_one(
+        next_period = await queries.statement(
+            "data.next_period",
             """
             SELECT id, value, finish_date
             FROM dictionary_data
-            WHERE id_position = :position_id
+            WHERE id_dictionary = :id_dictionary
+              AND id_position = :position_id
               AND id_attribute = :attribute_id
               AND start_date <= :finish_date
               AND finish_date > :finish_date
             """,
+        ).fetch_one(
             {
+                "id_dictionary": dictionary_id,
                 "position_id": position_id,
                 "attribute_id": attribute_id,
                 "finish_date": finish_date,
-            },
+            }
         )
         if not next_period:
             return finish_date
 
             # Обработка разных значений
         if next_period["value"] != value:
-            await database.execute(
+            await queries.statement(
+                "data.shift_start",
                 """
                 UPDATE dictionary_data
                 SET start_date = :new_start_date
-                WHERE id = :record_id
+                WHERE id_dictionary = :id_dictionary AND id = :record_id
                 """,
+            ).execute(
                 {
+                    "id_dictionary": dictionary_id,
                     "new_start_date": finish_date + timedelta(days=1),
                     "record_id": next_period["id"],
-                },
+                }
             )
             return finish_date
 
             # Обработка одинаковых значений (объединение периодов)
-        await database.execute(
-            "DELETE FROM dictionary_data WHERE id = :record_id",
-            {"record_id": next_period["id"]},
-        )
+        await AttributeManager._delete_period(dictionary_id, next_period["id"])
 
         return next_period["finish_date"]
 
     @staticmethod
     async def _shift_previous_period(
+        dictionary_id: int,
         position_id: int,
         attribute_id: int,
         start_date: datetime.date,
@@ -420,6 +763,7 @@ class AttributeManager:
         - Если значения разные - сдвигает конец предыдущего периода
 
         Args:
+            dictionary_id: ID справочника (секция dictionary_data)
             position_id: ID позиции справочника
             attribute_id: ID атрибута
             start_date: Начальная дата нового периода
@@ -433,20 +777,24 @@ class AttributeManager:
             ValueError: Если данные некорректны
         """
         # Получаем предыдущий период
-        previous_period = await database.fetch_one(
+        previous_period = await queries.statement(
+            "data.previous_period",
             """
             SELECT id, value, start_date, finish_date
             FROM dictionary_data
-            WHERE id_position = :position_id
+            WHERE id_dictionary = :id_dictionary
+              AND id_position = :position_id
               AND id_attribute = :attribute_id
               AND start_date < :start_date
               AND finish_date >= :start_date
             """,
+        ).fetch_one(
             {
+                "id_dictionary": dictionary_id,
                 "position_id": position_id,
                 "attribute_id": attribute_id,
                 "start_date": start_date,
-            },
+            }
         )
 
         if not previous_period:
@@ -454,44 +802,54 @@ class AttributeManager:
 
         # Обработка одинаковых значений (объединение периодов)
         if previous_period["value"] == value:
-            await database.execute(
-                "DELETE FROM dictionary_data WHERE id = :record_id",
-                {"record_id": previous_period["id"]},
-            )
+            await AttributeManager._delete_period(dictionary_id, previous_period["id"])
             return previous_period["start_date"]
 
             # Обработка разных значений (сдвиг конца предыдущего периода)
-        await database.execute(
+        await queries.statement(
+            "data.shift_finish",
             """
             UPDATE dictionary_data
             SET finish_date = :new_finish_date
-            WHERE id = :record_id
+            WHERE id_dictionary = :id_dictionary AND id = :record_id
             """,
+        ).execute(
             {
+                "id_dictionary": dictionary_id,
                 "new_finish_date": start_date - timedelta(days=1),
                 "record_id": previous_period["id"],
-            },
+            }
         )
         return start_date
 
+    @staticmethod
+    async def _delete_period(dictionary_id: int, record_id: int) -> None:
+        """Удаление периода значения при объединении с соседним"""
+        await queries.statement(
+            "data.delete",
+            """DELETE FROM dictionary_data
+            WHERE id_dictionary = :id_dictionary AND id = :record_id""",
+        ).execute({"id_dictionary": dictionary_id, "record_id": record_id})
+
     @staticmethod
     async def _insert_position(data: Dict) -> None:
         """Пакетная вставка данных"""
         sql = """
                    INSERT INTO dictionary_data
-                   (id_position, id_attribute, start_date, finish_date, value)
-                   VALUES (:id_position, :id_attribute, :start_date, :finish_date,
-                    :value)
+                   (id_dictionary, id_position, id_attribute, start_date,
+                   finish_date, value)
+                   VALUES (:id_dictionary, :id_position, :id_attribute, :start_date,
+                   :finish_date, :value)
                """
-        await database.execute(
-            sql,
+        await queries.statement("data.insert_one", sql).execute(
             {
+                "id_dictionary": data["id_dictionary"],
                 "id_position": data["id_position"],
                 "id_attribute": data["id_attribute"],
                 "start_date": data["start_date"],
                 "finish_date": data["finish_date"],
                 "value": data["value"],
-            },
+            }
         )
 
     @staticmethod
@@ -542,6 +900,7 @@ class AttributeManager:
                 )
                 data_to_insert.append(
                     {
+                        "id_dictionary": dictionary_id,
                         "id_position": position_id,
                         "id_attribute": attributes_info[attr]["id"],
                         "start_date": dates["start_date"],
@@ -556,6 +915,7 @@ class AttributeManager:
             await AttributeManager._update_position_relations(
                 position_id, dictionary_id
             )
+            await change_feed.publish(dictionary_id)
         except ValueError as ve:
             logger.error("Validation error: %s", ve)
             raise
@@ -572,6 +932,7 @@ class AttributeManager:
         :param position_id:
         :param attrs_list:
         :return:
+        :raises ArchivedPeriodError: дата начала раньше границы архива
         """
         data = {attr.name: attr.value for attr in attrs_list}
         try:
@@ -589,6 +950,13 @@ class AttributeManager:
             dictionary_id = await AttributeManager._get_dictionary_by_position(
                 position_id
             )
+            # Изменение меняет только оперативные таблицы: период до границы
+            # архива пересекся бы с периодом в истории и задвоил значения
+            archived_before = (await MetadataCache.get(dictionary_id)).archived_before
+            if archived_before is not None and dates["start_date"] < archived_before:
+                raise ArchivedPeriodError(
+                    f"Periods before {archived_before} are archived and read-only"
+                )
             attributes_info = await AttributeManager._get_attributes_info(dictionary_id)
             df.drop(columns=["START_DATE", "FINISH_DATE"], inplace=True)
             valid_attributes = set(attributes_info.keys()) & set(df.columns)
@@ -600,18 +968,21 @@ class AttributeManager:
                     else value
                 )
                 await AttributeManager._delete_nested_period(
+                    dictionary_id=dictionary_id,
                     position_id=position_id,
                     attribute_id=attributes_info[attr]["id"],
                     start_date=dates["start_date"],
                     finish_date=dates["finish_date"],
                 )
                 finsh_date_attr = await AttributeManager._shift_next_period(
+                    dictionary_id=dictionary_id,
                     position_id=position_id,
                     attribute_id=attributes_info[attr]["id"],
                     finish_date=dates["finish_date"],
                     value=clean_value,
                 )
                 start_date_attr = await AttributeManager._shift_previous_period(
+                    dictionary_id=dictionary_id,
                     position_id=position_id,
                     attribute_id=attributes_info[attr]["id"],
                     start_date=dates["start_date"],
@@ -619,6 +990,7 @@ class AttributeManager:
                 )
                 await AttributeManager._insert_position(
                     {
+                        "id_dictionary": dictionary_id,
                         "id_position": position_id,
                         "id_attribute": attributes_info[attr]["id"],
                         "start_date": start_date_attr,
@@ -629,6 +1001,7 @@ class AttributeManager:
             await AttributeManager._update_position_relations(
                 position_id, dictionary_id
             )
+            await change_feed.publish(dictionary_id)
         except ValueError as ve:
             logger.error("Validation error: %s", ve)
             raise
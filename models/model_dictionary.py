@@ -3,24 +3,24 @@
 """
 
 # pylint: disable=import-error
+import dataclasses
 import datetime
+import json
 import logging
 
-from typing import List
+from typing import AsyncIterator, List, Literal, Optional
 
 import schemas
-from database import database
-from config import settings
+from cache import generation, register_cache
+from change_feed import change_feed
+from compression import EncodedBody
+import queries
 from models.model_attribute import AttributeManager
+from models.model_metadata import MetadataCache
+from models.model_query import PositionQuery, period_tables
+from replicas import read_primary
 from schemas import DictionaryPosition
 
-logging.basicConfig(
-    level=settings.log_level,
-    format=settings.log_format,
-    datefmt=settings.log_date,
-    handlers=[logging.FileHandler(settings.log_file), logging.StreamHandler()],
-)
-
 logger = logging.getLogger(__name__)
 
 
@@ -102,6 +102,10 @@ class DictionaryService:
         },
     ]
 
+    # Готовые тела ответов get_code_map по (дата, target), сбрасываются
+    # при изменении справочника
+    _code_maps = register_cache("code_maps")
+
     @staticmethod
     async def get_all() -> List[schemas.DictionaryOut]:
         """Получение всех справочников"""
@@ -112,7 +116,9 @@ class DictionaryService:
         description_bel, gko, organization,classifier,id_status, id_type
         from dictionary
         """
-        rows = await database.fetch_all(sql)
+        rows = await queries.statement(
+            "dictionary.get_all", sql, readonly=True
+        ).fetch_all()
         return [schemas.DictionaryOut(**dict(row)) for row in rows]
 
     @staticmethod
@@ -130,7 +136,9 @@ class DictionaryService:
             from dictionary where name like
             '%'||:name||'%'
             """
-        rows = await database.fetch_all(sql, {"name": name})
+        rows = await queries.statement(
+            "dictionary.find_by_name", sql, readonly=True
+        ).fetch_all({"name": name})
         return [schemas.DictionaryOut(**dict(row)) for row in rows]
 
     @staticmethod
@@ -150,7 +158,10 @@ class DictionaryService:
             :description_eng, :description_bel, :gko,
             :organization, :classifier,:id_status,:id_type) returning id
         """
-        dict_id = await database.execute(sql, values=dictionary.model_dump())
+        dict_id = await queries.statement("dictionary.create", sql).execute(
+            dictionary.model_dump()
+        )
+        await DictionaryService._create_partitions(dict_id)
 
         # Создаем обязательные параметры
 
@@ -164,9 +175,22 @@ class DictionaryService:
             )
             await DictionaryService._create_attribute(attr)
 
+        await change_feed.publish(dict_id)
         logger.info("Created dictionary ID: %d", dict_id)
         return dict_id
 
+    @staticmethod
+    async def _create_partitions(dict_id: int) -> None:
+        """
+        Создание секций dictionary_positions и dictionary_data для справочника
+        (см. database/migrations/003_partition_by_dictionary.sql)
+        :param dict_id: идентификатор справочника
+        """
+        await queries.statement(
+            "dictionary.create_partitions",
+            "select create_dictionary_partitions(:id_dictionary)",
+        ).execute({"id_dictionary": dict_id})
+
     @staticmethod
     async def update(dict_id: int, dictionary: schemas.DictionaryIn) -> bool:
         """
@@ -198,10 +222,12 @@ class DictionaryService:
         values = dictionary.model_dump()
         values["dict_id"] = dict_id
 
-        await database.execute(sql, values=values)
+        await queries.statement("dictionary.update", sql).execute(values)
 
         # Обновляем обязательные атрибуты (если требуется)
 
+        MetadataCache.invalidate(dict_id)
+        await change_feed.publish(dict_id)
         logger.info("Updated dictionary ID: %d", dict_id)
         return True
 
@@ -222,7 +248,9 @@ class DictionaryService:
             ) RETURNING id
         """
         try:
-            return await database.execute(sql, values=attribute.model_dump())
+            return await queries.statement("attribute.create", sql).execute(
+                attribute.model_dump()
+            )
         except Exception as e:
             logger.error(e)
             logger.error(attribute.model_dump())
@@ -236,92 +264,367 @@ class DictionaryService:
             logger.error(e)
             return False
 
+    @staticmethod
+    async def validate_dictionary_values(
+        id_dictionary: int, dataframe
+    ) -> schemas.ImportReport:
+        """
+        Проверка файла импорта без записи
+        :param id_dictionary: идентификатор справочника
+        :param dataframe: импортируемый dataframe
+        :return: отчет о проверке
+        """
+        return await AttributeManager.validate_import(id_dictionary, dataframe)
+
     @staticmethod
     async def get_dictionary_values(
-        dictionary_id: int, date: datetime.date
+        dictionary_id: int,
+        date: datetime.date,
+        attrs: Optional[List[str]] = None,
+        after: int = 0,
+        limit: Optional[int] = None,
     ) -> list[schemas.DictionaryPosition]:
         """
-        Получение справочника целиком
+        Получение справочника целиком или страницы справочника
         :param dictionary_id:
         :param date:
-        :return:
+        :param attrs: alt_name выводимых атрибутов, по умолчанию - все
+        :param after: страница начинается с позиции, следующей за after
+        :param limit: размер страницы, по умолчанию - весь справочник
+        :return: позиции по порядку id
         """
         logger.debug(
-            f"получение всех значений справочника с id ={dictionary_id}  на дату {date}"
+            "получение всех значений справочника с id = %d на дату %s",
+            dictionary_id,
+            date,
+        )
+        return await DictionaryService._fetch_positions(
+            PositionQuery(),
+            {"id_dictionary": dictionary_id, "dt": date},
+            attrs,
+            after,
+            limit,
+        )
+
+    @staticmethod
+    async def _fetch_positions(
+        query: PositionQuery,
+        values: dict,
+        attrs: Optional[List[str]],
+        after: int = 0,
+        limit: Optional[int] = None,
+    ) -> list[schemas.DictionaryPosition]:
+        """
+        Чтение позиций; при заданном attrs соединение с dictionary_attribute
+        ограничивается этими атрибутами прямо в запросе, при заданном limit
+        читается одна страница
+        :param query: фильтры запроса
+        :param values: значения параметров
+        :param attrs: alt_name выводимых атрибутов
+        :param after: идентификатор последней позиции предыдущей страницы
+        :param limit: размер страницы
+        :return:
+        """
+        if attrs:
+            query = dataclasses.replace(query, attrs=True)
+            values = {**values, "attrs": attrs}
+        if limit is not None:
+            query = dataclasses.replace(query, paged=True)
+            values = {**values, "after": after, "limit": limit}
+        if await DictionaryService._reads_history(
+            values["id_dictionary"], values["dt"]
+        ):
+            query = dataclasses.replace(query, history=True)
+        return await query.fetch(values)
+
+    @staticmethod
+    async def _archived_before(dictionary_id: int) -> Optional[datetime.date]:
+        """
+        Граница архива справочника (см. archive.py)
+        :param dictionary_id: идентификатор справочника
+        :return: None, если архива нет или справочник не найден
+        """
+        try:
+            metadata = await MetadataCache.get(dictionary_id)
+        except LookupError:
+            return None
+        return metadata.archived_before
+
+    @staticmethod
+    async def _reads_history(dictionary_id: int, *dates: datetime.date) -> bool:
+        """
+        Нужен ли архив для чтения справочника на даты
+        :param dictionary_id: идентификатор справочника
+        :param dates: даты чтения
+        :return:
+        """
+        archived_before = await DictionaryService._archived_before(dictionary_id)
+        return archived_before is not None and min(dates) < archived_before
+
+    @staticmethod
+    async def get_dictionary_version(dictionary_id: int) -> int | None:
+        """
+        Получение текущей версии справочника
+        :param dictionary_id: идентификатор справочника
+        :return: версия или None, если справочника нет
+        """
+        sql = "select version from dictionary where id = :id"
+        row = await queries.statement("dictionary.version", sql).fetch_one(
+            {"id": dictionary_id}
         )
+        return row["version"] if row else None
 
+    @staticmethod
+    async def get_snapshot_interval(
+        dictionary_id: int, date: datetime.date
+    ) -> tuple[datetime.date, datetime.date]:
+        """
+        Интервал дат вокруг date, на котором состояние справочника не меняется
+        :param dictionary_id: идентификатор справочника
+        :param date: дата среза
+        :return: начало и окончание интервала
+        """
+        archived_before = await DictionaryService._archived_before(dictionary_id)
+        history = archived_before is not None and date < archived_before
         sql = """
-        WITH position_data AS (
- select
-    dp.id,
-    t1.id_parent_positions AS parent_id,
-    t1.value AS parent_code,
-    dp.id_dictionary
-            FROM dictionary_positions dp
-            left join
-            ( select dr.id_positions, dr.id_parent_positions,dd1.value
-            from  dictionary_relations dr
-            JOIN dictionary_data dd1 ON dd1.id_position = dr.id_positions
-            JOIN dictionary_attribute da1
-            ON dd1.id_attribute = da1.id AND da1.alt_name = 'PARENT_CODE'
-            where  :dt between dr.start_date and dr.finish_date
-            and  :dt  between dd1.start_date and dd1.finish_date
-            ) t1 on (dp.id = t1.id_positions)
-            WHERE dp.id_dictionary = :id_dictionary
-   ),
-        attributes AS (
-   select  pd.id,
-                pd.parent_id,
-                pd.parent_code,
-                da.name AS attr_name,
-                dd.value AS attr_value from position_data pd
-   join dictionary_attribute da  on pd.id_dictionary =da.id_dictionary
-   left outer join dictionary_data dd
-   on (dd.id_position =pd.id and dd.id_attribute =da.id )
-   where  :dt between dd.start_date and dd.finish_date
-         )
-        SELECT
-            id,
-            parent_id,
-            parent_code,
-            json_agg(
-                json_build_object('name', attr_name, 'value', attr_value)
-            ) AS attrs
-        FROM attributes
-        GROUP BY id, parent_id, parent_code
-        ORDER BY id
-        """
-        rows = await database.fetch_all(
-            sql, {"id_dictionary": dictionary_id, "dt": date}
+        with periods as (
+            select dd.start_date, dd.finish_date
+            from {data} dd
+            where dd.id_dictionary = :id_dictionary
+            union all
+            select dr.start_date, dr.finish_date
+            from {relations} dr
+            join dictionary_positions dp on dp.id = dr.id_positions
+            where dp.id_dictionary = :id_dictionary
+        )
+        select
+            greatest(
+                max(start_date) filter (where start_date <= :dt),
+                max(finish_date + 1) filter (where finish_date < :dt)
+            ) as start_date,
+            least(
+                min(finish_date) filter (where finish_date >= :dt),
+                min(start_date - 1) filter (where start_date > :dt)
+            ) as finish_date
+        from periods
+        """
+        sql = sql.format(**period_tables(history))
+        name = "dictionary.snapshot_interval" + (".history" if history else "")
+        row = await queries.statement(name, sql).fetch_one(
+            {"id_dictionary": dictionary_id, "dt": date}
         )
-        logger.debug("количество строк %d", len(rows))
-        return [schemas.DictionaryPosition(**dict(row)) for row in rows]
+        start_date = row["start_date"] or date
+        # Без архива границы периодов до archived_before не видны
+        if archived_before is not None and not history:
+            start_date = max(start_date, archived_before)
+        return (start_date, row["finish_date"] or date)
 
     @staticmethod
-    async def get_dictionary_structure(dictionary_id: int) -> list[schemas.AttributeIn]:
-        logger.debug(f"получаем структуру справочника с id = {dictionary_id}")
-        sql = (
-            "select id, name, id_attribute_type,"
-            "start_date,finish_date,required,capacity, alt_name  from "
-            "dictionary_attribute where id_dictionary =:id"
+    async def get_dictionary_diff(
+        dictionary_id: int, date_from: datetime.date, date_to: datetime.date
+    ) -> AsyncIterator[schemas.PositionDiff]:
+        """
+        Отличия справочника на date_to от справочника на date_from
+
+        Вычисляются одним запросом по периодам значений и связей, которые
+        пересекают хотя бы одну из дат; результат читается курсором
+        :param dictionary_id: идентификатор справочника
+        :param date_from: первая дата
+        :param date_to: вторая дата
+        :return: появившиеся, исчезнувшие и изменившиеся позиции по порядку id
+        """
+        sql = """
+        with data as (
+            select
+                dd.id_position,
+                dd.id_attribute,
+                bool_or(:date_from between dd.start_date and dd.finish_date)
+                    as in_old,
+                bool_or(:date_to between dd.start_date and dd.finish_date)
+                    as in_new,
+                max(dd.value) filter (
+                    where :date_from between dd.start_date and dd.finish_date
+                ) as old_value,
+                max(dd.value) filter (
+                    where :date_to between dd.start_date and dd.finish_date
+                ) as new_value
+            from {data} dd
+            where dd.id_dictionary = :id_dictionary
+            and (
+                :date_from between dd.start_date and dd.finish_date
+                or :date_to between dd.start_date and dd.finish_date
+            )
+            group by dd.id_position, dd.id_attribute
+        ),
+        positions as (
+            select
+                d.id_position,
+                bool_or(d.in_old) as in_old,
+                bool_or(d.in_new) as in_new,
+                json_agg(
+                    json_build_object(
+                        'name', da.name,
+                        'old_value', d.old_value,
+                        'new_value', d.new_value
+                    ) order by da.id
+                ) filter (where d.old_value is distinct from d.new_value)
+                    as changes
+            from data d
+            join dictionary_attribute da on da.id = d.id_attribute
+            group by d.id_position
+        ),
+        relations as (
+            select
+                dr.id_positions as id_position,
+                max(dr.id_parent_positions) filter (
+                    where :date_from between dr.start_date and dr.finish_date
+                ) as old_parent_id,
+                max(dr.id_parent_positions) filter (
+                    where :date_to between dr.start_date and dr.finish_date
+                ) as new_parent_id
+            from {relations} dr
+            join dictionary_positions dp on dp.id = dr.id_positions
+            where dp.id_dictionary = :id_dictionary
+            and (
+                :date_from between dr.start_date and dr.finish_date
+                or :date_to between dr.start_date and dr.finish_date
+            )
+            group by dr.id_positions
         )
-        rows = await database.fetch_all(sql, values={"id": dictionary_id})
-        return [schemas.AttributeIn(**dict(row)) for row in rows]
+        select
+            p.id_position as id,
+            case
+                when not p.in_old then 'added'
+                when not p.in_new then 'removed'
+                else 'changed'
+            end as status,
+            case when p.in_old then r.old_parent_id end as old_parent_id,
+            case when p.in_new then r.new_parent_id end as new_parent_id,
+            p.changes
+        from positions p
+        left join relations r on r.id_position = p.id_position
+        where not (p.in_old and p.in_new)
+            or p.changes is not null
+            or r.old_parent_id is distinct from r.new_parent_id
+        order by p.id_position
+        """
+        history = await DictionaryService._reads_history(
+            dictionary_id, date_from, date_to
+        )
+        statement = queries.statement(
+            "dictionary.diff" + (".history" if history else ""),
+            sql.format(**period_tables(history)),
+            readonly=True,
+        )
+        async for row in statement.iterate(
+            {"id_dictionary": dictionary_id, "date_from": date_from, "date_to": date_to}
+        ):
+            yield schemas.PositionDiff(**dict(row))
+
+    @staticmethod
+    async def get_code_map(
+        dictionary_id: int,
+        date: datetime.date,
+        target: Literal["id", "name"] = "id",
+    ) -> EncodedBody:
+        """
+        Соответствие кодов позиций идентификаторам или наименованиям на дату
+
+        Строится одним запросом по периодам атрибута CODE (index-only scan по
+        индексу 005_code_map_index.sql) и хранится готовым JSON вместе со
+        сжатыми вариантами до изменения справочника
+        :param dictionary_id: идентификатор справочника
+        :param date: дата
+        :param target: что сопоставляется коду: id позиции или NAME
+        :return: тело ответа {"codes": [...], "ids" | "names": [...]},
+            массивы отсортированы по коду
+        :raises LookupError: справочник не найден
+        """
+        body = DictionaryService._code_maps.get(dictionary_id, (date, target))
+        if body is not None:
+            return body
+
+        since = generation(dictionary_id)
+        metadata = await MetadataCache.get(dictionary_id)
+        history = (
+            metadata.archived_before is not None and date < metadata.archived_before
+        )
+        if target == "name":
+            value = "n.value"
+            join = """
+            left join {data} n
+                on n.id_dictionary = :id_dictionary
+                and n.id_attribute = :name_attribute
+                and n.id_position = c.id_position
+                and :dt between n.start_date and n.finish_date"""
+        else:
+            value = "c.id_position"
+            join = ""
+        sql = f"""
+            select c.value as code, {value} as value
+            from {{data}} c{join}
+            where c.id_dictionary = :id_dictionary
+            and c.id_attribute = :code_attribute
+            and :dt between c.start_date and c.finish_date
+            and c.value is not null
+            order by c.value
+        """
+        sql = sql.format(**period_tables(history))
+        values = {
+            "id_dictionary": dictionary_id,
+            "code_attribute": metadata.attributes.get("CODE"),
+            "dt": date,
+        }
+        if target == "name":
+            values["name_attribute"] = metadata.attributes.get("NAME")
+        name = f"dictionary.code_map.{target}" + (".history" if history else "")
+        # Соответствие кэшируется до изменения справочника, поэтому читается
+        # с основного сервера: отстающая реплика вернула бы данные до записи
+        with read_primary():
+            rows = await queries.statement(name, sql, readonly=True).fetch_all(values)
+
+        body = EncodedBody(
+            json.dumps(
+                {
+                    "codes": [row["code"] for row in rows],
+                    f"{target}s": [row["value"] for row in rows],
+                },
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).encode()
+        )
+        DictionaryService._code_maps.set(dictionary_id, (date, target), body, since)
+        return body
+
+    @staticmethod
+    async def get_dictionary_structure(dictionary_id: int) -> list[schemas.AttributeIn]:
+        logger.debug("получаем структуру справочника с id = %d", dictionary_id)
+        try:
+            metadata = await MetadataCache.get(dictionary_id)
+        except LookupError:
+            return []
+        return list(metadata.structure)
 
     @staticmethod
     async def create_attr_in_dictionary(attribute: schemas.AttributeDict):
         logger.debug("create new attribute")
         await DictionaryService._create_attribute(attribute)
+        MetadataCache.invalidate(attribute.id_dictionary)
+        await change_feed.publish(attribute.id_dictionary)
 
     @staticmethod
     async def get_dictionary_position_by_code(
-        dictionary_id: int, code: str, date: datetime.date
+        dictionary_id: int,
+        code: str,
+        date: datetime.date,
+        attrs: Optional[List[str]] = None,
     ) -> list[schemas.DictionaryPosition]:
         """
         Получение позиции справочника по коду
         :param dictionary_id:
         :param code:
         :param date:
+        :param attrs: alt_name выводимых атрибутов, по умолчанию - все
         :return:
         """
 
@@ -329,132 +632,49 @@ class DictionaryService:
             "получение позиции справочника с id = %d по коду %s  на дату %s",
             dictionary_id,
             code,
-            str(date),
+            date,
         )
-        sql = """
-                WITH position_data AS (
-         select
-            dp.id,
-            t1.id_parent_positions AS parent_id,
-            t1.value AS parent_code,
-            dp.id_dictionary
-                    FROM dictionary_positions dp
-                    left join
-                    ( select dr.id_positions, dr.id_parent_positions,dd1.value
-                    from  dictionary_relations dr
-                    JOIN dictionary_data dd1 ON dd1.id_position = dr.id_positions
-                    JOIN dictionary_attribute da1
-                    ON dd1.id_attribute = da1.id AND da1.alt_name = 'PARENT_CODE'
-                    where  :dt between dr.start_date and dr.finish_date
-                    and  :dt  between dd1.start_date and dd1.finish_date
-                    ) t1 on (dp.id = t1.id_positions)
-                    WHERE dp.id_dictionary = :id_dictionary
-                    and exists (
-                    select null
-                    from dictionary_data dd, dictionary_attribute da
-           where dd.id_attribute =da.id
-           and da.alt_name ='CODE'
-           and dd.value  like '%'||:code||'%'
-           and dd.id_position =dp.id
-           and :dt between dd.start_date and dd.finish_date)
-           ),
-                attributes AS (
-           select  pd.id,
-                        pd.parent_id,
-                        pd.parent_code,
-                        da.name AS attr_name,
-                        dd.value AS attr_value from position_data pd
-           join dictionary_attribute da  on pd.id_dictionary =da.id_dictionary
-           left outer join dictionary_data dd on
-           (dd.id_position =pd.id and dd.id_attribute =da.id )
-           where  :dt between dd.start_date and dd.finish_date
-                 )
-                SELECT
-                    id,
-                    parent_id,
-                    parent_code,
-                    json_agg(
-                        json_build_object('name', attr_name, 'value', attr_value)
-                    ) AS attrs
-                FROM attributes
-                GROUP BY id, parent_id, parent_code
-                ORDER BY id
-                """
-        rows = await database.fetch_all(
-            sql, {"id_dictionary": dictionary_id, "code": code, "dt": date}
+        return await DictionaryService._fetch_positions(
+            PositionQuery(code=True),
+            {"id_dictionary": dictionary_id, "code": code, "dt": date},
+            attrs,
         )
-        return [schemas.DictionaryPosition(**dict(row)) for row in rows]
 
     @staticmethod
     async def get_dictionary_position_by_id(
-        dictionary_id: int, id_position: int, date: datetime.date
+        dictionary_id: int,
+        id_position: int,
+        date: datetime.date,
+        attrs: Optional[List[str]] = None,
     ) -> list[DictionaryPosition]:
         """
         Получение позиции справочника по id
         :param dictionary_id: идентификатор справочника
         :param id_position: идентификатор позиции
         :param date:
+        :param attrs: alt_name выводимых атрибутов, по умолчанию - все
         :return:
         """
         logger.debug(
             "Получение позиции справочника по ID = %d из справочника %d на дату %s",
             id_position,
             dictionary_id,
-            str(date),
+            date,
         )
-        sql = """
-                       WITH position_data AS (
-                select
-                    dp.id,
-                   t1.id_parent_positions AS parent_id,
-                   t1.value AS parent_code,
-                   dp.id_dictionary
-                           FROM dictionary_positions dp
-                           left join
-                           ( select dr.id_positions, dr.id_parent_positions,dd1.value
-                           from  dictionary_relations dr
-                           JOIN dictionary_data dd1 ON dd1.id_position = dr.id_positions
-                           JOIN dictionary_attribute da1 ON
-                           dd1.id_attribute = da1.id AND da1.alt_name = 'PARENT_CODE'
-                           where :dt between dr.start_date
-                           and dr.finish_date
-                           and :dt between dd1.start_date and dd1.finish_date
-                           ) t1 on (dp.id = t1.id_positions)
-                           WHERE dp.id_dictionary = :id_dictionary
-                        and dp.id = :id
-
-                  ),
-                       attributes AS (
-                  select  pd.id,
-                               pd.parent_id,
-                               pd.parent_code,
-                               da.name AS attr_name,
-                               dd.value AS attr_value from position_data pd
-                  join dictionary_attribute da  on pd.id_dictionary =da.id_dictionary
-                  left outer join dictionary_data dd on
-                    (dd.id_position =pd.id and dd.id_attribute =da.id )
-                   where  :dt between dd.start_date and dd.finish_date
-                        )
-                       SELECT
-                           id,
-                           parent_id,
-                           parent_code,
-                           json_agg(
-                               json_build_object('name', attr_name, 'value', attr_value)
-                           ) AS attrs
-                       FROM attributes
-                       GROUP BY id, parent_id, parent_code
-                       ORDER BY id;
-                       """
-        rows = await database.fetch_all(
-            sql,
-            {"id_dictionary": dictionary_id, "id": id_position, "dt": date},
+        return await DictionaryService._fetch_positions(
+            PositionQuery(position_id=True),
+            {"id_dictionary": dictionary_id, "id_position": id_position, "dt": date},
+            attrs,
         )
-        return [schemas.DictionaryPosition(**dict(row)) for row in rows]
 
     @staticmethod
     async def find_dictionary_position_by_expression(
-        dictionary_id: int, find_str: str, date: datetime.date
+        dictionary_id: int,
+        find_str: str,
+        date: datetime.date,
+        attrs: Optional[List[str]] = None,
+        after: int = 0,
+        limit: Optional[int] = None,
     ) -> List[schemas.DictionaryPosition]:
         logger.debug(
             "поиск значений справочника по  поисковая строка:%s в справочнике %d",
@@ -463,53 +683,10 @@ class DictionaryService:
         )
         if date is None:
             date = datetime.date.today()
-        sql = """
-                       WITH position_data AS (
-                select
-                    dp.id,
-                   t1.id_parent_positions AS parent_id,
-                   t1.value AS parent_code,
-                   dp.id_dictionary
-                           FROM dictionary_positions dp
-                           left join
-                           ( select dr.id_positions, dr.id_parent_positions,dd1.value
-                           from  dictionary_relations dr
-                           JOIN dictionary_data dd1 ON dd1.id_position = dr.id_positions
-                           JOIN dictionary_attribute da1 ON
-                            dd1.id_attribute = da1.id AND da1.alt_name = 'PARENT_CODE'
-                           where :dt between dr.start_date
-                           and dr.finish_date
-                           and :dt between dd1.start_date and dd1.finish_date
-                           ) t1 on (dp.id = t1.id_positions)
-                           WHERE dp.id_dictionary = :id_dictionary
-                           and exists (select null from dictionary_data dd
-                            where dd.value  like '%'||:code||'%'
-                            and dd.id_position =dp.id
-                            and :dt between dd.start_date and dd.finish_date)
-                  ),
-                       attributes AS (
-                  select  pd.id,
-                               pd.parent_id,
-                               pd.parent_code,
-                               da.name AS attr_name,
-                               dd.value AS attr_value from position_data pd
-                  join dictionary_attribute da  on pd.id_dictionary =da.id_dictionary
-                  left outer join dictionary_data dd
-                    on (dd.id_position =pd.id and dd.id_attribute =da.id )
-                   where  :dt between dd.start_date and dd.finish_date
-                        )
-                       SELECT
-                           id,
-                           parent_id,
-                           parent_code,
-                           json_agg(
-                               json_build_object('name', attr_name, 'value', attr_value)
-                           ) AS attrs
-                       FROM attributes
-                       GROUP BY id, parent_id, parent_code
-                       ORDER BY id;
-                       """
-        rows = await database.fetch_all(
-            sql, {"id_dictionary": dictionary_id, "code": find_str, "dt": date}
+        return await DictionaryService._fetch_positions(
+            PositionQuery(search=True),
+            {"id_dictionary": dictionary_id, "search": find_str, "dt": date},
+            attrs,
+            after,
+            limit,
         )
-        return [schemas.DictionaryPosition(**dict(row)) for row in rows]
@@ -0,0 +1,145 @@
+"""
+Кэш метаданных справочников
+
+Атрибуты справочника, обязательные поля и даты действия меняются редко,
+а нужны при каждой записи (создание и изменение позиции, импорт). Метаданные
+загружаются одним запросом и хранятся в памяти процесса до изменения
+справочника (см. change_feed.py).
+"""
+
+# pylint: disable=import-error
+import datetime
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import queries
+import schemas
+from cache import generation, register_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DictionaryMetadata:
+    """
+    Метаданные справочника
+    - **attributes**: alt_name -> идентификатор атрибута
+    - **required_fields**: alt_name обязательных атрибутов
+    - **structure**: описание атрибутов в формате API
+    - **capacities**: alt_name -> размерность атрибута
+    - **archived_before**: периоды, закончившиеся раньше этой даты,
+      перенесены в архив (см. archive.py); None - архива нет
+    """
+
+    dictionary_id: int
+    start_date: datetime.date
+    finish_date: datetime.date
+    attributes: Dict[str, int]
+    required_fields: List[str]
+    structure: List[schemas.AttributeIn]
+    capacities: Dict[str, Optional[int]] = field(default_factory=dict)
+    archived_before: Optional[datetime.date] = None
+
+
+class MetadataCache:
+    """
+    Доступ к метаданным справочников через кэш
+    """
+
+    POSITIONS_LIMIT = 100_000
+
+    _cache = register_cache("metadata")
+    # Позиция не переходит между справочниками, поэтому сброс не нужен
+    _position_dictionary: Dict[int, int] = {}
+
+    @staticmethod
+    async def get(dictionary_id: int) -> DictionaryMetadata:
+        """
+        Получение метаданных справочника
+        :param dictionary_id: идентификатор справочника
+        :return: метаданные
+        """
+        metadata = MetadataCache._cache.get(dictionary_id)
+        if metadata is None:
+            since = generation(dictionary_id)
+            metadata = await MetadataCache._load(dictionary_id)
+            MetadataCache._cache.set(dictionary_id, None, metadata, since)
+        return metadata
+
+    @staticmethod
+    def invalidate(dictionary_id: int) -> None:
+        """Сброс метаданных справочника"""
+        MetadataCache._cache.invalidate(dictionary_id)
+
+    @staticmethod
+    async def dictionary_by_position(position_id: int) -> int:
+        """
+        Идентификатор справочника, которому принадлежит позиция
+        :param position_id: идентификатор позиции
+        :return:
+        """
+        dictionary_id = MetadataCache._position_dictionary.get(position_id)
+        if dictionary_id is not None:
+            return dictionary_id
+        sql = """
+        SELECT id_dictionary FROM dictionary_positions dp
+        where id = :position_id
+        """
+        row = await queries.statement("position.dictionary", sql).fetch_one(
+            {"position_id": position_id}
+        )
+        if len(MetadataCache._position_dictionary) >= MetadataCache.POSITIONS_LIMIT:
+            MetadataCache._position_dictionary.clear()
+        MetadataCache._position_dictionary[position_id] = row["id_dictionary"]
+        return row["id_dictionary"]
+
+    @staticmethod
+    async def _load(dictionary_id: int) -> DictionaryMetadata:
+        logger.debug("загрузка метаданных справочника %d", dictionary_id)
+        sql = """
+        select d.start_date as dictionary_start_date,
+               d.finish_date as dictionary_finish_date,
+               d.archived_before,
+               da.id, da.name, da.id_attribute_type, da.start_date, da.finish_date,
+               da.required, da.capacity, da.alt_name
+        from dictionary d
+        left join dictionary_attribute da on da.id_dictionary = d.id
+        where d.id = :id
+        order by da.id
+        """
+        rows = await queries.statement("dictionary.metadata", sql).fetch_all(
+            {"id": dictionary_id}
+        )
+        if not rows:
+            raise LookupError(f"Dictionary {dictionary_id} not found")
+        attributes = [row for row in rows if row["id"] is not None]
+        return DictionaryMetadata(
+            dictionary_id=dictionary_id,
+            start_date=rows[0]["dictionary_start_date"],
+            finish_date=rows[0]["dictionary_finish_date"],
+            attributes={
+                row["alt_name"]: row["id"]
+                for row in attributes
+                if row["alt_name"] is not None
+            },
+            required_fields=[row["alt_name"] for row in attributes if row["required"]],
+            structure=[
+                schemas.AttributeIn(
+                    name=row["name"],
+                    id_attribute_type=row["id_attribute_type"],
+                    start_date=row["start_date"],
+                    finish_date=row["finish_date"],
+                    required=row["required"],
+                    capacity=row["capacity"],
+                    alt_name=row["alt_name"],
+                )
+                for row in attributes
+            ],
+            capacities={
+                row["alt_name"]: row["capacity"]
+                for row in attributes
+                if row["alt_name"] is not None
+            },
+            archived_before=rows[0]["archived_before"],
+        )
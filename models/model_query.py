@@ -0,0 +1,219 @@
+"""
+Построитель запросов чтения позиций справочника на дату
+
+Все запросы чтения позиций (весь справочник, по коду, по идентификатору,
+поиск) строятся из одного конвейера position_data -> attributes, а фильтры
+подставляются в самое раннее соединение, где их можно проверить:
+- идентификатор позиции, код и строка поиска - в отбор позиций;
+- дата - в условия соединений (left join остается внешним);
+- перечень атрибутов - в соединение с dictionary_attribute (внешнее, поэтому
+  позиция без запрошенных атрибутов выводится с пустым attrs);
+- справочник - в каждое обращение к dictionary_data, чтобы при
+  секционировании по справочнику читалась только его секция;
+- страница - в отбор позиций по индексу первичного ключа (dp.id > :after
+  order by dp.id limit :limit), поэтому любая страница стоит как первая.
+
+Периоды, закончившиеся до границы архива справочника, лежат в таблицах
+*_history (см. archive.py) и подключаются только флагом history.
+
+Запросы только читают данные и выполняются на репликах (см. replicas.py).
+"""
+
+# pylint: disable=import-error
+import functools
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List
+
+import queries
+import schemas
+
+
+@dataclass(frozen=True)
+class PositionQuery:
+    """
+    Набор фильтров запроса позиций
+
+    Параметры запроса:
+    - **id_dictionary**, **dt** - всегда;
+    - **id_position** - при position_id;
+    - **code** - при code (вхождение подстроки в CODE);
+    - **search** - при search (вхождение подстроки в любой атрибут);
+    - **attrs** - при attrs (список alt_name выводимых атрибутов);
+    - **after**, **limit** - при paged (позиции с id больше after,
+      не более limit).
+
+    При history значения и связи читаются вместе с архивом.
+    """
+
+    position_id: bool = False
+    code: bool = False
+    search: bool = False
+    attrs: bool = False
+    paged: bool = False
+    history: bool = False
+
+    @property
+    def name(self) -> str:
+        """Имя запроса в реестре"""
+        active = [field.name for field in fields(self) if getattr(self, field.name)]
+        return ".".join(["positions", *active])
+
+    @property
+    def sql(self) -> str:
+        return _build_sql(self)
+
+    async def fetch(self, values: Dict[str, Any]) -> List[schemas.DictionaryPosition]:
+        """
+        Выполнение запроса
+        :param values: значения параметров
+        :return: позиции справочника
+        """
+        rows = await queries.statement(self.name, self.sql, readonly=True).fetch_all(
+            values
+        )
+        return [schemas.DictionaryPosition(**dict(row)) for row in rows]
+
+
+# Периоды значений и связей вместе с архивными
+_DATA_WITH_HISTORY = """(
+            select id, id_dictionary, id_position, id_attribute, value,
+                start_date, finish_date
+            from dictionary_data
+            union all
+            select id, id_dictionary, id_position, id_attribute, value,
+                start_date, finish_date
+            from dictionary_data_history
+        )"""
+
+_RELATIONS_WITH_HISTORY = """(
+            select id, id_positions, id_parent_positions, start_date, finish_date
+            from dictionary_relations
+            union all
+            select id, id_positions, id_parent_positions, start_date, finish_date
+            from dictionary_relations_history
+        )"""
+
+
+def period_tables(history: bool) -> Dict[str, str]:
+    """
+    Источники периодов для подстановки в текст запроса ({data}, {relations})
+    :param history: читать вместе с архивом
+    :return:
+    """
+    if history:
+        return {"data": _DATA_WITH_HISTORY, "relations": _RELATIONS_WITH_HISTORY}
+    return {"data": "dictionary_data", "relations": "dictionary_relations"}
+
+
+# Отбор позиций, у которых CODE на дату содержит подстроку
+_CODE_FILTER = """exists (
+            select null
+            from {data} dd
+            join dictionary_attribute da
+                on da.id = dd.id_attribute and da.alt_name = 'CODE'
+            where dd.id_dictionary = :id_dictionary
+            and dd.id_position = dp.id
+            and :dt between dd.start_date and dd.finish_date
+            and dd.value like '%' || :code || '%'
+        )"""
+
+# Отбор позиций, у которых любой атрибут на дату содержит подстроку
+_SEARCH_FILTER = """exists (
+            select null
+            from {data} dd
+            where dd.id_dictionary = :id_dictionary
+            and dd.id_position = dp.id
+            and :dt between dd.start_date and dd.finish_date
+            and dd.value like '%' || :search || '%'
+        )"""
+
+# Позиция действует на дату, если на дату есть хотя бы одно значение
+_ACTIVE_FILTER = """exists (
+            select null
+            from {data} dd
+            where dd.id_dictionary = :id_dictionary
+            and dd.id_position = dp.id
+            and :dt between dd.start_date and dd.finish_date
+        )"""
+
+
+@functools.lru_cache(maxsize=None)
+def _build_sql(query: PositionQuery) -> str:
+    tables = period_tables(query.history)
+    position_filters = ["dp.id_dictionary = :id_dictionary"]
+    if query.position_id:
+        position_filters.append("dp.id = :id_position")
+    if query.code:
+        position_filters.append(_CODE_FILTER.format(**tables))
+    if query.search:
+        position_filters.append(_SEARCH_FILTER.format(**tables))
+    if not (query.code or query.search):
+        position_filters.append(_ACTIVE_FILTER.format(**tables))
+
+    where = "\n        and ".join(position_filters)
+    positions = "dictionary_positions dp"
+    if query.paged:
+        # Страница отбирается до соединений: limit ограничивает число позиций
+        page_where = "\n            and ".join([*position_filters, "dp.id > :after"])
+        positions = f"""(
+            select dp.*
+            from dictionary_positions dp
+            where {page_where}
+            order by dp.id
+            limit :limit
+        ) dp"""
+        where = "true"
+    attribute_join = "da.id_dictionary = pd.id_dictionary"
+    if query.attrs:
+        attribute_join += " and da.alt_name = any(:attrs)"
+
+    return f"""
+    WITH position_data AS (
+        select
+            dp.id,
+            dp.id_dictionary,
+            dr.id_parent_positions AS parent_id,
+            pc.value AS parent_code
+        FROM {positions}
+        left join (
+            {tables["relations"]} dr
+            join {tables["data"]} pc
+                on pc.id_dictionary = :id_dictionary
+                and pc.id_position = dr.id_positions
+                and :dt between pc.start_date and pc.finish_date
+            join dictionary_attribute pca
+                on pca.id = pc.id_attribute and pca.alt_name = 'PARENT_CODE'
+        ) on dr.id_positions = dp.id
+            and :dt between dr.start_date and dr.finish_date
+        WHERE {where}
+    ),
+    attributes AS (
+        select
+            pd.id,
+            pd.parent_id,
+            pd.parent_code,
+            da.id AS attr_id,
+            da.name AS attr_name,
+            dd.value AS attr_value
+        from position_data pd
+        left join dictionary_attribute da on {attribute_join}
+        left outer join {tables["data"]} dd
+            on dd.id_dictionary = :id_dictionary
+            and dd.id_position = pd.id
+            and dd.id_attribute = da.id
+            and :dt between dd.start_date and dd.finish_date
+    )
+    SELECT
+        id,
+        parent_id,
+        parent_code,
+        coalesce(
+            json_agg(
+                json_build_object('name', attr_name, 'value', attr_value)
+            ) filter (where attr_id is not null),
+            '[]'::json
+        ) AS attrs
+    FROM attributes
+    GROUP BY id, parent_id, parent_code
+    ORDER BY id
+    """
@@ -0,0 +1,162 @@
+"""
+Проверка действия кодов справочника на даты без обращения к базе данных
+
+Для каждой версии справочника один раз читаются все периоды атрибута CODE
+(index-only scan по индексу 005_code_map_index.sql, вместе с архивом) и
+сворачиваются в словарь код -> отсортированные непересекающиеся интервалы
+действия. Проверка пары (код, дата) - поиск в словаре и bisect по началам
+интервалов, поэтому миллионы проверок не доходят до Postgres. Структура
+хранится в кэше справочника и сбрасывается при его изменении.
+"""
+
+# pylint: disable=import-error
+import base64
+import bisect
+import datetime
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import queries
+from cache import generation, register_cache
+from models.model_metadata import MetadataCache
+from models.model_query import period_tables
+from replicas import read_primary
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CodeIntervals:
+    """
+    Интервалы действия кодов справочника
+    - **intervals**: код -> (начала, окончания) в порядковых номерах дней,
+      интервалы отсортированы и не пересекаются
+    """
+
+    intervals: Dict[str, Tuple[List[int], List[int]]]
+
+    @classmethod
+    def build(
+        cls, periods: Iterable[Tuple[str, datetime.date, datetime.date]]
+    ) -> "CodeIntervals":
+        """
+        Построение по периодам, упорядоченным по коду и дате начала;
+        пересекающиеся и соседние периоды одного кода объединяются
+        :param periods: (код, начало, окончание)
+        :return:
+        """
+        intervals: Dict[str, Tuple[List[int], List[int]]] = {}
+        for code, start_date, finish_date in periods:
+            starts, finishes = intervals.setdefault(code, ([], []))
+            start, finish = start_date.toordinal(), finish_date.toordinal()
+            if finishes and start <= finishes[-1] + 1:
+                finishes[-1] = max(finishes[-1], finish)
+            else:
+                starts.append(start)
+                finishes.append(finish)
+        return cls(intervals)
+
+    def is_valid(self, code: str, date: datetime.date) -> bool:
+        """Действует ли код на дату"""
+        found = self.intervals.get(code)
+        if found is None:
+            return False
+        starts, finishes = found
+        day = date.toordinal()
+        index = bisect.bisect_right(starts, day) - 1
+        return index >= 0 and day <= finishes[index]
+
+    def check(self, codes: Sequence[str], dates: Sequence[datetime.date]) -> List[bool]:
+        """
+        Проверка пар (код, дата)
+        :param codes: коды
+        :param dates: даты той же длины
+        :return: признаки действия по порядку пар
+        """
+        return [
+            self.is_valid(code, date) for code, date in zip(codes, dates, strict=True)
+        ]
+
+
+def pack_bitmap(flags: Sequence[bool]) -> str:
+    """
+    Упаковка признаков в битовую маску base64 (бит i - байт i // 8,
+    разряд i % 8 от младшего)
+    :param flags: признаки
+    :return:
+    """
+    bits = np.packbits(np.asarray(flags, dtype=bool), bitorder="little")
+    return base64.b64encode(bits.tobytes()).decode()
+
+
+class CodeValidity:
+    """
+    Доступ к интервалам действия кодов через кэш
+    """
+
+    _cache = register_cache("code_intervals")
+
+    @staticmethod
+    async def get(dictionary_id: int) -> CodeIntervals:
+        """
+        Интервалы действия кодов справочника
+        :param dictionary_id: идентификатор справочника
+        :return:
+        :raises LookupError: справочник не найден
+        """
+        intervals = CodeValidity._cache.get(dictionary_id)
+        if intervals is None:
+            since = generation(dictionary_id)
+            intervals = await CodeValidity._load(dictionary_id)
+            CodeValidity._cache.set(dictionary_id, None, intervals, since)
+        return intervals
+
+    @staticmethod
+    async def check(
+        dictionary_id: int,
+        codes: List[str],
+        dates: Optional[List[datetime.date]] = None,
+    ) -> Tuple[List[bool], int]:
+        """
+        Проверка действия кодов на даты
+        :param dictionary_id: идентификатор справочника
+        :param codes: коды
+        :param dates: даты по кодам, по умолчанию - текущая
+        :return: признаки по порядку кодов и количество действующих
+        """
+        intervals = await CodeValidity.get(dictionary_id)
+        if dates is None:
+            dates = [datetime.date.today()] * len(codes)
+        flags = intervals.check(codes, dates)
+        return flags, sum(flags)
+
+    @staticmethod
+    async def _load(dictionary_id: int) -> CodeIntervals:
+        logger.debug("загрузка интервалов кодов справочника %d", dictionary_id)
+        metadata = await MetadataCache.get(dictionary_id)
+        history = metadata.archived_before is not None
+        sql = """
+            select value, start_date, finish_date
+            from {data} dd
+            where dd.id_dictionary = :id_dictionary
+            and dd.id_attribute = :code_attribute
+            and dd.value is not null
+            order by value, start_date
+        """
+        sql = sql.format(**period_tables(history))
+        name = "validity.code_periods" + (".history" if history else "")
+        # Интервалы кэшируются до изменения справочника: отстающая реплика
+        # вернула бы периоды до записи, поэтому чтение идет на основной сервер
+        with read_primary():
+            rows = await queries.statement(name, sql, readonly=True).fetch_all(
+                {
+                    "id_dictionary": dictionary_id,
+                    "code_attribute": metadata.attributes.get("CODE"),
+                }
+            )
+        return CodeIntervals.build(
+            (row["value"], row["start_date"], row["finish_date"]) for row in rows
+        )
@@ -0,0 +1,105 @@
+"""
+Постраничное чтение позиций по курсору
+
+Курсор - непрозрачная для клиента строка (base64 от JSON) с идентификатором
+последней отданной позиции, датой среза, версией и идентификатором справочника
+и коротким хешем условий отбора (строка поиска, перечень атрибутов). Курсор
+можно предъявить только тому же справочнику с теми же условиями. Следующая
+страница читается поиском по ключу (dp.id > after), а не через OFFSET,
+поэтому ее стоимость не зависит от номера. Если справочник изменился после
+выдачи курсора, продолжать чтение нельзя: страницы разных версий могут
+пропустить или повторить позиции.
+"""
+
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class StaleCursorError(Exception):
+    """Курсор выдан для другой версии справочника"""
+
+
+class ForeignCursorError(ValueError):
+    """Курсор выдан для другого справочника или других условий отбора"""
+
+
+def filter_hash(*filters: Any) -> str:
+    """
+    Короткий хеш условий отбора страницы
+    :param filters: условия (строка поиска, перечень атрибутов и т. п.)
+    :return: 12 шестнадцатеричных символов
+    """
+    raw = json.dumps(filters, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """
+    Позиция чтения справочника
+    """
+
+    after: int
+    date: datetime.date
+    version: int
+    dictionary: int
+    filters: str
+
+    def encode(self) -> str:
+        payload = {
+            "a": self.after,
+            "d": self.date.isoformat(),
+            "v": self.version,
+            "i": self.dictionary,
+            "f": self.filters,
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+    @classmethod
+    def decode(cls, value: str) -> "Cursor":
+        """
+        Разбор курсора
+        :param value: строка курсора
+        :return:
+        :raises ValueError: курсор поврежден
+        """
+        try:
+            raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+            payload = json.loads(raw)
+            return cls(
+                int(payload["a"]),
+                datetime.date.fromisoformat(payload["d"]),
+                int(payload["v"]),
+                int(payload["i"]),
+                str(payload["f"]),
+            )
+        except (binascii.Error, UnicodeDecodeError, TypeError, KeyError) as e:
+            raise ValueError(f"Malformed cursor: {value!r}") from e
+
+    def check(self, dictionary: int, filters: str, version: int) -> None:
+        """
+        Проверка, что курсор выдан для этого справочника и этих условий отбора
+        и справочник не изменился после его выдачи
+        :param dictionary: идентификатор справочника
+        :param filters: хеш условий отбора (filter_hash)
+        :param version: текущая версия справочника
+        :raises ForeignCursorError: курсор от другого справочника или запроса
+        :raises StaleCursorError:
+        """
+        if dictionary != self.dictionary or filters != self.filters:
+            raise ForeignCursorError(
+                f"Cursor was issued for dictionary {self.dictionary} "
+                "with other filters"
+            )
+        if version != self.version:
+            raise StaleCursorError(
+                f"Cursor version {self.version} is stale, current is {version}"
+            )
@@ -0,0 +1,289 @@
+"""
+Реестр SQL-запросов с подготовкой на каждом соединении пула
+
+Запрос регистрируется один раз под уникальным именем: именованные параметры
+(:name) сразу переводятся в позиционные ($1, $2, ...) asyncpg. При выполнении
+запрос подготавливается (PREPARE) на соединении пула при первом обращении
+и дальше выполняется по готовому дескриптору. Postgres хранит план
+подготовленного запроса и сам переходит на общий (generic) план, если он
+не дороже частных.
+
+Запросы, зарегистрированные с readonly=True, выполняются на репликах
+(replicas.py), остальные - на основном сервере.
+
+Для каждого запроса собирается количество выполнений и время выполнения,
+они же передаются в метрики (metrics.py) и журнал медленных запросов
+(database.py).
+"""
+
+import logging
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from asyncpg import exceptions as pg_exceptions
+
+import metrics
+from database import database
+from replicas import replica_pool
+
+logger = logging.getLogger(__name__)
+
+_PARAM_RE = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+# Ошибки, после которых подготовленный запрос нужно подготовить заново
+_STALE_STATEMENT_ERRORS = (
+    pg_exceptions.InterfaceError,
+    pg_exceptions.InvalidSQLStatementNameError,
+    pg_exceptions.InvalidCachedStatementError,
+    pg_exceptions.OutdatedSchemaCacheError,
+)
+
+# Ошибки соединения с репликой, после которых чтение повторяется на основном
+_CONNECTION_ERRORS = (
+    OSError,
+    pg_exceptions.PostgresConnectionError,
+    pg_exceptions.CannotConnectNowError,
+)
+
+PRIMARY = "primary"
+
+
+def to_positional(sql: str) -> Tuple[str, List[str]]:
+    """
+    Перевод именованных параметров в позиционные
+    :param sql: текст запроса с параметрами вида :name
+    :return: текст запроса с $1..$n и порядок имен параметров
+    """
+    names: List[str] = []
+
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _PARAM_RE.sub(replace, sql), names
+
+
+class Statement:
+    """
+    Зарегистрированный запрос
+    """
+
+    def __init__(self, name: str, sql: str, readonly: bool = False):
+        self.name = name
+        self.sql = sql
+        self.readonly = readonly
+        self.text, self.params = to_positional(sql)
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+
+    def args(self, values: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Значения параметров в порядке $1..$n"""
+        values = values or {}
+        return [values[name] for name in self.params]
+
+    async def fetch_all(self, values: Optional[Dict[str, Any]] = None) -> List[Any]:
+        return await self._run("fetch", values)
+
+    async def fetch_one(self, values: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._run("fetchrow", values)
+
+    async def fetch_val(self, values: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._run("fetchval", values)
+
+    async def execute(self, values: Optional[Dict[str, Any]] = None) -> Any:
+        """Выполнение запроса, результат - первая колонка первой строки"""
+        return await self._run("fetchval", values)
+
+    async def execute_many(self, values: List[Dict[str, Any]]) -> None:
+        if not values:
+            return
+        await self._run("executemany", values)
+
+    async def _run(self, method: str, values: Any) -> Any:
+        if method == "executemany":
+            args = [self.args(item) for item in values]
+        else:
+            args = self.args(values)
+        started = time.perf_counter()
+        result = None
+        failed = False
+        try:
+            replica = replica_pool.choose() if self.readonly else None
+            if replica is not None:
+                try:
+                    result = await self._execute(
+                        replica.database, replica.name, method, args
+                    )
+                    return result
+                except _CONNECTION_ERRORS as e:
+                    replica.mark(False, str(e) or type(e).__name__)
+            result = await self._execute(database, PRIMARY, method, args)
+            return result
+        except Exception:
+            failed = True
+            self.errors += 1
+            raise
+        finally:
+            self._observe(
+                values,
+                time.perf_counter() - started,
+                self._count_rows(method, result),
+                failed,
+            )
+
+    async def iterate(
+        self, values: Optional[Dict[str, Any]] = None, prefetch: int = 1000
+    ) -> AsyncIterator[Any]:
+        """
+        Потоковое чтение результата курсором: строки выбираются с сервера
+        порциями по prefetch и не накапливаются в памяти
+
+        Курсор живет внутри транзакции на одном соединении, которое занято,
+        пока результат не дочитан. Повтор на другом сервере после ошибки
+        невозможен: часть строк уже могла быть отдана.
+        :param values: значения параметров
+        :param prefetch: размер порции строк
+        :return: асинхронный итератор строк
+        """
+        args = self.args(values)
+        replica = replica_pool.choose() if self.readonly else None
+        if replica is not None:
+            db, server = replica.database, replica.name
+        else:
+            db, server = database, PRIMARY
+        started = time.perf_counter()
+        rows = 0
+        failed = False
+        # Соединение может быть не получено: ошибка возникнет до присваивания
+        raw = None
+        try:
+            async with db.connection() as connection:
+                raw = connection.raw_connection
+                async with raw.transaction(readonly=self.readonly):
+                    prepared = await registry.prepared(raw, self, server)
+                    async for row in prepared.cursor(*args, prefetch=prefetch):
+                        rows += 1
+                        yield row
+        except Exception as e:
+            failed = True
+            self.errors += 1
+            if raw is not None and isinstance(e, _STALE_STATEMENT_ERRORS):
+                registry.forget(raw, self, server)
+            raise
+        finally:
+            self._observe(values, time.perf_counter() - started, rows, failed)
+
+    def _observe(self, values: Any, elapsed: float, rows: int, failed: bool) -> None:
+        self.calls += 1
+        self.rows += rows
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        metrics.observe_query(self.name, elapsed, rows, failed)
+        database.observe(self.sql, values, elapsed, self.readonly)
+
+    async def _execute(self, db, server: str, method: str, args: List[Any]) -> Any:
+        async with db.connection() as connection:
+            raw = connection.raw_connection
+            try:
+                prepared = await registry.prepared(raw, self, server)
+                return await self._call(prepared, method, args)
+            except _STALE_STATEMENT_ERRORS:
+                if raw.is_in_transaction():
+                    raise
+                registry.forget(raw, self, server)
+                prepared = await registry.prepared(raw, self, server)
+                return await self._call(prepared, method, args)
+
+    @staticmethod
+    def _count_rows(method: str, result: Any) -> int:
+        if method == "fetch":
+            return len(result or ())
+        if method == "fetchrow":
+            return int(result is not None)
+        return 0
+
+    @staticmethod
+    async def _call(prepared, method: str, args: List[Any]) -> Any:
+        if method == "executemany":
+            return await prepared.executemany(args)
+        return await getattr(prepared, method)(*args)
+
+
+class QueryRegistry:
+    """
+    Реестр запросов и подготовленных на соединениях дескрипторов
+    """
+
+    def __init__(self):
+        self._statements: Dict[str, Statement] = {}
+        # (сервер, pid серверного процесса) -> имя запроса -> PreparedStatement;
+        # запись удаляется при закрытии соединения (пересоздание пула, реплики)
+        self._prepared: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+    def statement(self, name: str, sql: str, readonly: bool = False) -> Statement:
+        """
+        Получение зарегистрированного запроса (с регистрацией при первом вызове)
+        :param name: уникальное имя запроса
+        :param sql: текст запроса
+        :param readonly: запрос только читает данные и может выполняться на реплике
+        :return: запрос
+        """
+        statement = self._statements.get(name)
+        if statement is None:
+            statement = Statement(name, sql, readonly)
+            self._statements[name] = statement
+        elif statement.sql != sql or statement.readonly != readonly:
+            raise ValueError(f"Statement {name} is already registered with other SQL")
+        return statement
+
+    def statements(self) -> List[Statement]:
+        """Все зарегистрированные запросы"""
+        return list(self._statements.values())
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Статистика выполнения запросов"""
+        return [
+            {
+                "name": statement.name,
+                "calls": statement.calls,
+                "errors": statement.errors,
+                "rows": statement.rows,
+                "total_time": statement.total_time,
+                "max_time": statement.max_time,
+            }
+            for statement in self._statements.values()
+        ]
+
+    async def prepared(self, raw, statement: Statement, server: str = PRIMARY):
+        """Подготовленный на соединении дескриптор запроса"""
+        key = (server, raw.get_server_pid())
+        prepared = self._prepared.get(key)
+        if prepared is None:
+            prepared = self._prepared[key] = {}
+
+            def closed(connection) -> None:
+                # pid мог уже достаться новому соединению со своими дескрипторами
+                if self._prepared.get(key) is prepared:
+                    del self._prepared[key]
+
+            raw.add_termination_listener(closed)
+        handle = prepared.get(statement.name)
+        if handle is None:
+            logger.debug("подготовка запроса %s", statement.name)
+            handle = await raw.prepare(statement.text)
+            prepared[statement.name] = handle
+        return handle
+
+    def forget(self, raw, statement: Statement, server: str = PRIMARY) -> None:
+        """Удаление устаревшего дескриптора запроса"""
+        self._prepared.get((server, raw.get_server_pid()), {}).pop(statement.name, None)
+
+
+registry = QueryRegistry()
+statement = registry.statement
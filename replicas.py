@@ -0,0 +1,165 @@
+"""
+Чтение с реплик Postgres
+
+Запросы, зарегистрированные как readonly (см. queries.py), выполняются на одной
+из реплик settings.read_replica_urls, выбираемой по кругу среди исправных.
+Исправность реплик проверяется в фоне каждые replica_check_interval секунд.
+Запросы на запись, а также чтение, когда исправных реплик нет, идут
+на основной сервер (database).
+
+Реплика может отставать от основного сервера. Клиент, которому нужно
+прочитать собственную запись, передает заголовок X-Read-Your-Writes:
+запросы такого HTTP-запроса читают с основного сервера. Внутри приложения
+то же самое делает контекст read_primary() - например, при формировании
+данных, которые затем кэшируются под версией с основного сервера.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+from typing import List, Optional
+
+from config import settings
+from database import InstrumentedDatabase
+
+logger = logging.getLogger(__name__)
+
+READ_YOUR_WRITES_HEADER = b"x-read-your-writes"
+
+_read_primary: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "read_primary", default=False
+)
+
+
+class Replica:
+    """
+    Реплика и ее состояние
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.database = InstrumentedDatabase(url)
+        self.healthy = False
+
+    @property
+    def name(self) -> str:
+        """Адрес реплики без учетных данных (для логов и метрик)"""
+        return self.url.rsplit("@", 1)[-1]
+
+    def mark(self, healthy: bool, reason: str = "") -> None:
+        if healthy != self.healthy:
+            if healthy:
+                logger.info("Replica %s is healthy", self.name)
+            else:
+                logger.warning("Replica %s is unhealthy: %s", self.name, reason)
+        self.healthy = healthy
+
+
+class ReplicaPool:
+    """
+    Набор реплик с проверкой исправности и выбором по кругу
+    """
+
+    def __init__(self, urls: List[str], interval: float, timeout: float):
+        self.replicas = [Replica(url) for url in urls]
+        self.interval = interval
+        self.timeout = timeout
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        """Подключение к репликам и запуск проверки исправности"""
+        if not self.replicas:
+            return
+        for replica in self.replicas:
+            try:
+                await replica.database.connect()
+            except Exception as e:  # pylint: disable=broad-except
+                replica.mark(False, str(e))
+        await self.check()
+        self._task = asyncio.get_running_loop().create_task(self._check_loop())
+
+    async def disconnect(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            if replica.database.is_connected:
+                await replica.database.disconnect()
+
+    def choose(self) -> Optional[Replica]:
+        """
+        Реплика для очередного чтения
+        :return: реплика или None, если читать нужно с основного сервера
+        """
+        if _read_primary.get():
+            return None
+        count = len(self.replicas)
+        for offset in range(count):
+            replica = self.replicas[(self._next + offset) % count]
+            if replica.healthy:
+                self._next = (self._next + offset + 1) % count
+                return replica
+        return None
+
+    async def check(self) -> None:
+        """Проверка исправности всех реплик"""
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            if not replica.database.is_connected:
+                await replica.database.connect()
+            await asyncio.wait_for(
+                replica.database.fetch_val("select 1"), timeout=self.timeout
+            )
+            replica.mark(True)
+        except Exception as e:  # pylint: disable=broad-except
+            replica.mark(False, str(e) or type(e).__name__)
+
+    async def _check_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+
+@contextlib.contextmanager
+def read_primary():
+    """Чтение внутри контекста выполняется на основном сервере"""
+    token = _read_primary.set(True)
+    try:
+        yield
+    finally:
+        _read_primary.reset(token)
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI-middleware: запросы с заголовком X-Read-Your-Writes читают
+    с основного сервера
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and any(
+            name == READ_YOUR_WRITES_HEADER and value.lower() not in (b"0", b"false")
+            for name, value in scope["headers"]
+        ):
+            with read_primary():
+                await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+replica_pool = ReplicaPool(
+    settings.read_replica_urls,
+    settings.replica_check_interval,
+    settings.replica_check_timeout,
+)
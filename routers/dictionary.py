@@ -5,26 +5,23 @@ Endpoint для системы справочников
 import io
 from datetime import date as datetime_date
 import logging
-from typing import Optional, List
+from typing import AsyncIterator, Awaitable, Callable, Literal, Optional, List
 import pandas as pd
-from fastapi.responses import JSONResponse
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Query
+
+from config import settings
 
 # pylint: disable=import-error
-from models.model_attribute import AttributeManager
+from models.model_attribute import ArchivedPeriodError, AttributeManager
 from models.model_dictionary import DictionaryService
+from models.model_validity import CodeValidity, pack_bitmap
+from pagination import NEXT_CURSOR_HEADER, Cursor, StaleCursorError, filter_hash
+from replicas import read_primary
+from snapshots import snapshot_publisher
 
 from schemas import DictionaryOut, DictionaryIn, AttributeIn, AttributeDict, AttrShown
-
-
-from config import settings
-
-logging.basicConfig(
-    level=settings.log_level,
-    format=settings.log_format,
-    datefmt=settings.log_date,
-    handlers=[logging.FileHandler(settings.log_file), logging.StreamHandler()],
-)
+from schemas import CodeCheck, CodeCheckResult, DictionaryPosition, PositionDiff
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +35,21 @@ def get_current_date():
     return datetime_date.today()
 
 
+def parse_attrs(attrs: Optional[str]) -> Optional[List[str]]:
+    """
+    Разбор перечня выводимых атрибутов вида CODE,NAME,Descr
+
+    alt_name сравниваются с учетом регистра (CODE, Descr_BEL)
+
+    :param attrs: alt_name атрибутов через запятую
+    :return: список alt_name или None, если выводить нужно все атрибуты
+    """
+    if not attrs:
+        return None
+    names = [name.strip() for name in attrs.split(",") if name.strip()]
+    return list(dict.fromkeys(names)) or None
+
+
 async def get_upload_file(file: UploadFile = File(...)) -> UploadFile:  # noqa: B008
     """
     Заглушка для загрузки файла
@@ -64,6 +76,88 @@ def try_decode(content, encodings=None):
     raise ValueError("Не удалось декодировать файл ни одной из кодировок")
 
 
+async def stream_json_array(
+    items: AsyncIterator[PositionDiff], chunk_size: int = 64 * 1024
+) -> AsyncIterator[bytes]:
+    """
+    Сериализация потока моделей в JSON-массив порциями около chunk_size байт
+
+    :param items: модели
+    :param chunk_size: размер порции
+    :return: части тела ответа
+    """
+    buffer = bytearray(b"[")
+    first = True
+    async for item in items:
+        if not first:
+            buffer += b","
+        first = False
+        buffer += item.model_dump_json().encode()
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b"]"
+    yield bytes(buffer)
+
+
+async def read_page(
+    response: Response,
+    dictionary: int,
+    date: datetime_date,
+    limit: Optional[int],
+    cursor: Optional[str],
+    filters: str,
+    fetch: Callable[
+        [datetime_date, int, Optional[int]], Awaitable[List[DictionaryPosition]]
+    ],
+) -> List[DictionaryPosition]:
+    """
+    Чтение всех позиций или одной страницы по курсору
+
+    Если страница заполнена целиком, курсор следующей страницы передается
+    в заголовке X-Next-Cursor. Постраничное чтение идет с основного сервера:
+    версия в курсоре и страница должны быть прочитаны из одного источника,
+    иначе отстающая реплика отдала бы старые строки под новой версией
+
+    :param response: ответ (для заголовка курсора)
+    :param dictionary: идентификатор справочника
+    :param date: дата среза (для первой страницы)
+    :param limit: размер страницы
+    :param cursor: курсор, полученный с предыдущей страницей
+    :param filters: хеш условий отбора (курсор принимается только с теми же)
+    :param fetch: чтение позиций (дата, after, limit)
+    :return: позиции
+    """
+    if limit is None and cursor is None:
+        return await fetch(date, 0, None)
+    limit = limit or settings.page_default_limit
+    with read_primary():
+        version = await DictionaryService.get_dictionary_version(dictionary)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Справочник не найден")
+        after = 0
+        if cursor is not None:
+            try:
+                position = Cursor.decode(cursor)
+                position.check(dictionary, filters, version)
+            except StaleCursorError:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Справочник изменился, начните чтение с первой страницы",
+                ) from None
+            except ValueError:
+                raise HTTPException(
+                    status_code=400, detail="Некорректный курсор"
+                ) from None
+            date, after = position.date, position.after
+        positions = await fetch(date, after, limit)
+        if len(positions) == limit:
+            response.headers[NEXT_CURSOR_HEADER] = Cursor(
+                positions[-1].id, date, version, dictionary, filters
+            ).encode()
+        return positions
+
+
 dict_router = APIRouter(prefix="/models", tags=["Dictionary"])
 
 
@@ -140,7 +234,12 @@ async def edit_position(position_id: int, attrs: List[AttrShown]):
 
     logger.debug("position: %d", position_id)
 
-    await AttributeManager.edit_position(position_id, attrs)
+    try:
+        await AttributeManager.edit_position(position_id, attrs)
+    except ArchivedPeriodError:
+        raise HTTPException(
+            status_code=409, detail="Периоды до границы архива не изменяются"
+        ) from None
     return JSONResponse(content={"message": " все ок"}, status_code=200)
 
 
@@ -186,12 +285,14 @@ async def get_dictionary_value_by_code(
     dictionary: int,
     code: str,
     date: Optional[datetime_date] = None,  # noqa: B008
+    attrs: Optional[str] = None,
 ):
     """
     Получение значений по коду
     :param dictionary:
     :param code:
     :param date:
+    :param attrs: выводимые атрибуты через запятую (CODE,NAME), по умолчанию - все
     :return:
     """
 
@@ -199,26 +300,30 @@ async def get_dictionary_value_by_code(
         "endpoint получение  значений по коду dictionary = %d, code=%s, date = %s",
         dictionary,
         code,
-        str(date),
+        date,
     )
     date = date if date is not None else datetime_date.today()
     if code is None:
         return JSONResponse(content="код не может быть пустым", status_code=404)
     return await DictionaryService.get_dictionary_position_by_code(
-        dictionary, code, date
+        dictionary, code, date, parse_attrs(attrs)
     )
 
 
 @dict_router.get(path="/dictionaryValueByID")
 @dict_router.post(path="/dictionaryValueByID")
 async def get_dictionary_value_by_id(
-    dictionary: int, position_id: int, date: Optional[datetime_date] = None
+    dictionary: int,
+    position_id: int,
+    date: Optional[datetime_date] = None,
+    attrs: Optional[str] = None,
 ):
     """
     Получение значений по идентификатору
     :param dictionary:
     :param position_id:
     :param date:
+    :param attrs: выводимые атрибуты через запятую (CODE,NAME), по умолчанию - все
     :return:
     """
 
@@ -226,13 +331,13 @@ async def get_dictionary_value_by_id(
         "endpoint получение значений по коду dictionary =%d, id=%d, date = %s",
         dictionary,
         position_id,
-        str(date),
+        date,
     )
     date = date if date is not None else datetime_date.today()
     if id is None:
         return JSONResponse(content="код не может быть пустым", status_code=404)
     return await DictionaryService.get_dictionary_position_by_id(
-        dictionary, position_id, date
+        dictionary, position_id, date, parse_attrs(attrs)
     )
 
 
@@ -251,13 +356,22 @@ async def find_dictionary_by_name(name: str):
 @dict_router.get(path="/findDictionaryValue")
 @dict_router.post(path="/findDictionaryValue")
 async def find_dictionary_value(
-    dictionary: int, findstr: str, date: Optional[datetime_date] = None
+    response: Response,
+    dictionary: int,
+    findstr: str,
+    date: Optional[datetime_date] = None,
+    attrs: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.page_max_limit),  # noqa: B008
+    cursor: Optional[str] = None,
 ):
     """
      Поиск значений справочника по имени
     :param dictionary:
     :param findstr:
     :param date:
+    :param attrs: выводимые атрибуты через запятую (CODE,NAME), по умолчанию - все
+    :param limit: размер страницы, по умолчанию - все найденные позиции
+    :param cursor: курсор следующей страницы из заголовка X-Next-Cursor
     :return:
     """
     logger.debug(
@@ -266,19 +380,36 @@ async def find_dictionary_value(
         dictionary,
     )
     date = date if date is not None else datetime_date.today()
-    return await DictionaryService.find_dictionary_position_by_expression(
-        dictionary, findstr, date
+
+    attr_names = parse_attrs(attrs)
+
+    async def fetch(page_date, after, page_limit):
+        return await DictionaryService.find_dictionary_position_by_expression(
+            dictionary, findstr, page_date, attr_names, after, page_limit
+        )
+
+    return await read_page(
+        response,
+        dictionary,
+        date,
+        limit,
+        cursor,
+        filter_hash("find", findstr, attr_names),
+        fetch,
     )
 
 
 @dict_router.post(path="/importCSV")
 async def import_csv(
-    dictionary: int, file: UploadFile = Depends(get_upload_file)  # noqa: B008
+    dictionary: int,
+    file: UploadFile = Depends(get_upload_file),  # noqa: B008
+    dry_run: bool = False,
 ):
     """
     Загрузка из CSV
     :param dictionary:
     :param file:
+    :param dry_run: только проверить файл и вернуть отчет, ничего не записывая
     :return:
     """
     if not file.filename.endswith(".csv"):
@@ -287,10 +418,21 @@ async def import_csv(
         contents = await file.read()
         decoded = try_decode(contents)
         df = pd.read_csv(io.StringIO(decoded), dtype=str)
+        if dry_run:
+            try:
+                return await DictionaryService.validate_dictionary_values(
+                    dictionary, df
+                )
+            except LookupError:
+                raise HTTPException(
+                    status_code=404, detail="Справочник не найден"
+                ) from None
         if await DictionaryService.insert_dictionary_values(dictionary, df):
             return JSONResponse(
                 status_code=200, content={"message": "Файл успешно обработан"}
             )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(str(e))
     raise HTTPException(status_code=400, detail="Ошибка обработки файла")
@@ -299,15 +441,186 @@ async def import_csv(
 @dict_router.get(path="/dictionary/")
 @dict_router.post(path="/dictionary/")
 async def get_dictionary(
-    dictionary: int, date: Optional[datetime_date] = None  # noqa: B008
+    response: Response,
+    dictionary: int,
+    date: Optional[datetime_date] = None,  # noqa: B008
+    attrs: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.page_max_limit),  # noqa: B008
+    cursor: Optional[str] = None,
 ):
     """
     Получение всех значений справочника
 
     :param date: дата на которую нужно получить справочник, если не заполнена - текущая
     :param dictionary: идентификатор справочника
+    :param attrs: выводимые атрибуты через запятую (CODE,NAME), по умолчанию - все
+    :param limit: размер страницы, по умолчанию - весь справочник
+    :param cursor: курсор следующей страницы из заголовка X-Next-Cursor
+        (дата берется из курсора)
     :return: справочник целиком по структуре
     """
     logger.debug("endpoint получения всех значений справочника")
     date = date if date is not None else datetime_date.today()
-    return await DictionaryService.get_dictionary_values(dictionary, date)
+
+    attr_names = parse_attrs(attrs)
+
+    async def fetch(page_date, after, page_limit):
+        return await DictionaryService.get_dictionary_values(
+            dictionary, page_date, attr_names, after, page_limit
+        )
+
+    return await read_page(
+        response,
+        dictionary,
+        date,
+        limit,
+        cursor,
+        filter_hash("dictionary", attr_names),
+        fetch,
+    )
+
+
+@dict_router.get(path="/dictionaries/")
+@dict_router.post(path="/dictionaries/")
+async def get_dictionaries(
+    dictionary: List[int] = Query(...),  # noqa: B008
+    date: Optional[datetime_date] = None,
+):
+    """
+    Получение нескольких справочников целиком одним запросом
+
+    Справочники, срезы которых уже опубликованы, отдаются без обращения
+    к базе данных, остальные загружаются параллельно
+
+    :param dictionary: идентификаторы справочников (параметр повторяется)
+    :param date: дата на которую нужно получить справочники, если не заполнена - текущая
+    :return: объект {идентификатор справочника: список позиций или null,
+        если справочник не найден}
+    """
+    logger.debug("endpoint получения справочников %s", dictionary)
+    if len(dictionary) > settings.batch_max_dictionaries:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Не более {settings.batch_max_dictionaries} справочников",
+        )
+    date = date if date is not None else datetime_date.today()
+    snapshots = await snapshot_publisher.get_many(
+        dictionary, date, settings.batch_concurrency
+    )
+    return Response(
+        await snapshot_publisher.batch_body(snapshots), media_type="application/json"
+    )
+
+
+@dict_router.get(path="/codeMap/")
+@dict_router.post(path="/codeMap/")
+async def get_code_map(
+    request: Request,
+    dictionary: int,
+    date: Optional[datetime_date] = None,
+    target: Literal["id", "name"] = "id",
+):
+    """
+    Соответствие кодов позиций идентификаторам или наименованиям
+
+    Компактный ответ для сопоставления на стороне клиента: два массива
+    одинаковой длины, упорядоченные по коду
+
+    :param dictionary: идентификатор справочника
+    :param date: дата, если не заполнена - текущая
+    :param target: id - идентификаторы позиций, name - наименования
+    :return: {"codes": [...], "ids": [...]} или {"codes": [...], "names": [...]}
+    """
+    logger.debug("endpoint соответствия кодов справочника %d", dictionary)
+    date = date if date is not None else datetime_date.today()
+    try:
+        body = await DictionaryService.get_code_map(dictionary, date, target)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Справочник не найден") from None
+    return await body.response(request.headers.get("accept-encoding", ""))
+
+
+@dict_router.post(path="/checkCodes/", response_model=CodeCheckResult)
+async def check_codes(dictionary: int, check: CodeCheck):
+    """
+    Проверка действия множества кодов на даты одним запросом
+
+    Отвечает из построенных в памяти интервалов действия кодов, без обращения
+    к базе данных (кроме первого запроса после изменения справочника)
+
+    :param dictionary: идентификатор справочника
+    :param check: коды и даты проверки
+    :return: количество проверенных и действующих кодов и битовая маска
+    """
+    logger.debug(
+        "endpoint проверки %d кодов справочника %d", len(check.codes), dictionary
+    )
+    if len(check.codes) > settings.code_check_max_items:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Не более {settings.code_check_max_items} кодов",
+        )
+    try:
+        flags, valid = await CodeValidity.check(dictionary, check.codes, check.dates)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Справочник не найден") from None
+    return CodeCheckResult(count=len(flags), valid=valid, bitmap=pack_bitmap(flags))
+
+
+@dict_router.get(path="/dictionarySnapshot/")
+async def get_dictionary_snapshot(
+    request: Request, dictionary: int, date: Optional[datetime_date] = None
+):
+    """
+    Получение всех значений справочника из заранее сжатого файла среза
+
+    Ответ отдается с диска (sendfile) в кодировке zstd, brotli или gzip,
+    в зависимости от заголовка Accept-Encoding
+
+    :param date: дата на которую нужно получить справочник, если не заполнена - текущая
+    :param dictionary: идентификатор справочника
+    :return: справочник целиком по структуре
+    """
+    logger.debug("endpoint получения среза справочника %d", dictionary)
+    date = date if date is not None else datetime_date.today()
+    accept_encoding = request.headers.get("accept-encoding", "")
+    try:
+        snapshot = await snapshot_publisher.get(dictionary, date)
+        try:
+            return snapshot_publisher.response(snapshot, accept_encoding)
+        except FileNotFoundError:
+            # Файл удален вместе с устаревшей версией: срез публикуется заново
+            snapshot = await snapshot_publisher.get(dictionary, date)
+            return snapshot_publisher.response(snapshot, accept_encoding)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Справочник не найден") from None
+
+
+@dict_router.get(path="/dictionaryDiff/", response_model=list[PositionDiff])
+@dict_router.post(path="/dictionaryDiff/", response_model=list[PositionDiff])
+async def get_dictionary_diff(
+    dictionary: int, date_from: datetime_date, date_to: Optional[datetime_date] = None
+):
+    """
+    Отличия справочника между двумя датами
+
+    Ответ формируется потоково: появившиеся (added), исчезнувшие (removed)
+    и изменившиеся (changed) позиции со старыми и новыми значениями атрибутов
+
+    :param dictionary: идентификатор справочника
+    :param date_from: первая дата
+    :param date_to: вторая дата, если не заполнена - текущая
+    :return: список отличий позиций
+    """
+    date_to = date_to if date_to is not None else datetime_date.today()
+    logger.debug(
+        "endpoint отличий справочника %d между %s и %s", dictionary, date_from, date_to
+    )
+    if await DictionaryService.get_dictionary_version(dictionary) is None:
+        raise HTTPException(status_code=404, detail="Справочник не найден")
+    return StreamingResponse(
+        stream_json_array(
+            DictionaryService.get_dictionary_diff(dictionary, date_from, date_to)
+        ),
+        media_type="application/json",
+    )
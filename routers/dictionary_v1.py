@@ -1,17 +1,9 @@
 import logging
 from fastapi import APIRouter, Security
-from config import settings
 from fastapi.responses import JSONResponse
 from fastapi.security import APIKeyHeader
 
 
-logging.basicConfig(
-    level=settings.log_level,
-    format=settings.log_format,
-    datefmt=settings.log_date,
-    handlers=[logging.FileHandler(settings.log_file), logging.StreamHandler()],
-)
-
 logger = logging.getLogger(__name__)
 
 dict_router = APIRouter(prefix="/dict", tags=["dict"])
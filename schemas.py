@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator, field_validator
 from datetime import date  # , datetime
-from typing import Optional, List
+from typing import Literal, Optional, List
 import json
 
 
@@ -149,3 +149,101 @@ class DictionaryPosition(BaseModel):
     # class Config:
     #     allow_population_by_field_name = True
     #     json_encoders = {datetime.date: lambda v: v.isoformat()}
+
+
+class AttrChange(BaseModel):
+    """
+    Изменение значения атрибута между двумя датами
+    """
+
+    name: str = Field(..., description="наименование атрибута")
+    old_value: Optional[str] = Field(None, description="Значение на первую дату")
+    new_value: Optional[str] = Field(None, description="Значение на вторую дату")
+
+
+class PositionDiff(BaseModel):
+    """
+    Отличие позиции справочника между двумя датами
+
+    - **status**: added - позиция появилась, removed - перестала действовать,
+      changed - изменились значения атрибутов или родитель
+    """
+
+    id: int = Field(..., description="Идентификатор позиции")
+    status: Literal["added", "removed", "changed"] = Field(
+        ..., description="Вид изменения"
+    )
+    old_parent_id: Optional[int] = Field(
+        None, description="Родительская позиция на первую дату"
+    )
+    new_parent_id: Optional[int] = Field(
+        None, description="Родительская позиция на вторую дату"
+    )
+    changes: List[AttrChange] = Field(..., description="Изменившиеся атрибуты")
+
+    @validator("changes", pre=True)
+    @classmethod
+    def parse_changes(cls, v):
+        if isinstance(v, str):
+            return json.loads(v)
+        return v or []
+
+
+class ImportIssue(BaseModel):
+    """
+    Найденная при проверке файла импорта ошибка
+
+    - **check**: вид проверки: missing_column, missing_value, duplicate_code,
+      unknown_parent, bad_date, bad_period, over_capacity, unknown_column
+    - **rows**: номера строк файла (заголовок - строка 1), не более ограничения
+    """
+
+    check: str = Field(..., description="Вид проверки")
+    column: Optional[str] = Field(None, description="Столбец файла")
+    count: int = Field(..., description="Количество ошибочных строк")
+    rows: List[int] = Field(default_factory=list, description="Номера строк файла")
+    values: List[str] = Field(default_factory=list, description="Примеры значений")
+
+
+class ImportReport(BaseModel):
+    """
+    Результат проверки файла импорта без записи
+    """
+
+    valid: bool = Field(..., description="Ошибок не найдено")
+    rows: int = Field(..., description="Количество строк данных в файле")
+    issues: List[ImportIssue] = Field(
+        default_factory=list, description="Найденные ошибки"
+    )
+
+
+class CodeCheck(BaseModel):
+    """
+    Коды для проверки действия на даты (массивы одинаковой длины)
+    """
+
+    codes: List[str] = Field(..., description="Коды позиций")
+    dates: Optional[List[date]] = Field(
+        None, description="Даты проверки по кодам, по умолчанию - текущая"
+    )
+
+    @field_validator("dates")
+    @classmethod
+    def validate_dates(cls, v, info):
+        if v is not None and len(v) != len(info.data.get("codes", [])):
+            raise ValueError("codes and dates must have the same length")
+        return v
+
+
+class CodeCheckResult(BaseModel):
+    """
+    Результат проверки кодов
+    """
+
+    count: int = Field(..., description="Количество проверенных кодов")
+    valid: int = Field(..., description="Количество действующих кодов")
+    bitmap: str = Field(
+        ...,
+        description="Битовая маска в base64: бит i (байт i // 8, разряд i % 8 "
+        "от младшего) установлен, если i-й код действует на свою дату",
+    )
@@ -0,0 +1,334 @@
+"""
+Публикация срезов справочников в виде заранее сжатых файлов
+
+Срез справочника на дату не меняется внутри интервала, на котором не начинается
+и не заканчивается ни один период значений или связей. Для каждой пары
+(справочник, интервал) один раз формируется JSON и сохраняется на диск вместе
+со сжатыми вариантами (gzip, zstd, brotli), которые затем отдаются через
+FileResponse (sendfile), не проходя через Python и не сжимаясь повторно.
+
+Структура каталога: <snapshot_dir>/<id справочника>/<версия>/<начало>_<конец>.json
+
+Каталоги версий старше предыдущей удаляются; предыдущая сохраняется, потому что
+ее файлы еще могут отдавать другие воркеры. Если файл среза все же пропал,
+это считается промахом: срез публикуется заново.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import shutil
+import weakref
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from fastapi.responses import FileResponse
+from pydantic import TypeAdapter
+
+from cache import generation, register_cache
+from compression import (  # noqa: F401 - parse_accept_encoding, zstandard
+    available_encodings,
+    choose_encoding,
+    compress,
+    parse_accept_encoding,
+    zstandard,
+)
+from config import settings
+from models.model_dictionary import DictionaryService
+from replicas import read_primary
+from schemas import DictionaryPosition
+
+logger = logging.getLogger(__name__)
+
+_positions_adapter = TypeAdapter(List[DictionaryPosition])
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    Опубликованный срез справочника
+    """
+
+    dictionary_id: int
+    version: int
+    start_date: datetime.date
+    finish_date: datetime.date
+    path: str
+
+    def covers(self, date: datetime.date) -> bool:
+        return self.start_date <= date <= self.finish_date
+
+
+class SnapshotPublisher:
+    """
+    Запись срезов на диск и их отдача с согласованием сжатия
+    """
+
+    # Кодировка -> расширение файла
+    ENCODINGS = {"zstd": ".zst", "br": ".br", "gzip": ".gz"}
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._index = register_cache("snapshot_files")
+        # Блокировка существует, пока ее держит или ждет хотя бы одна публикация
+        self._locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+
+    def available_encodings(self) -> List[str]:
+        """Кодировки, которые могут быть сформированы в текущем окружении"""
+        return available_encodings()
+
+    async def get(self, dictionary_id: int, date: datetime.date) -> Snapshot:
+        """
+        Получение опубликованного среза на дату (с публикацией при отсутствии)
+        :param dictionary_id: идентификатор справочника
+        :param date: дата среза
+        :return: срез
+        """
+        snapshot = self._lookup(dictionary_id, date)
+        if snapshot is not None:
+            return snapshot
+
+        lock = self._locks.get(dictionary_id)
+        if lock is None:
+            lock = self._locks[dictionary_id] = asyncio.Lock()
+        async with lock:
+            snapshot = self._lookup(dictionary_id, date)
+            if snapshot is not None:
+                return snapshot
+
+            # Поколение берется до чтения версии: если изменение придет во время
+            # чтения или просмотра каталога, старый список срезов не сохранится
+            since = generation(dictionary_id)
+            version = await DictionaryService.get_dictionary_version(dictionary_id)
+            if version is None:
+                raise LookupError(f"Dictionary {dictionary_id} not found")
+            snapshots = self._index.get(dictionary_id)
+            if snapshots is None or snapshots[0] != version:
+                snapshots = (
+                    version,
+                    await asyncio.to_thread(self._scan, dictionary_id, version),
+                )
+                self._index.set(dictionary_id, None, snapshots, since)
+
+            # Файлы, удаленные с устаревшей версией, публикуются заново
+            snapshots[1][:] = [
+                snapshot for snapshot in snapshots[1] if os.path.exists(snapshot.path)
+            ]
+            for snapshot in snapshots[1]:
+                if snapshot.covers(date):
+                    return snapshot
+
+            snapshot = await self.publish(dictionary_id, version, date)
+            snapshots[1].append(snapshot)
+            return snapshot
+
+    async def get_many(
+        self, dictionary_ids: List[int], date: datetime.date, concurrency: int
+    ) -> Dict[int, Optional[Snapshot]]:
+        """
+        Получение срезов нескольких справочников на дату
+
+        Срезы, уже известные процессу, берутся без обращения к базе данных,
+        остальные публикуются параллельно, не более concurrency одновременно
+        :param dictionary_ids: идентификаторы справочников
+        :param date: дата среза
+        :param concurrency: число одновременных публикаций
+        :return: идентификатор справочника -> срез (None, если справочника нет)
+        """
+        result: Dict[int, Optional[Snapshot]] = {}
+        missing = []
+        for dictionary_id in dict.fromkeys(dictionary_ids):
+            snapshot = self._lookup(dictionary_id, date)
+            result[dictionary_id] = snapshot
+            if snapshot is None:
+                missing.append(dictionary_id)
+
+        slots = asyncio.Semaphore(max(1, concurrency))
+
+        async def load(dictionary_id: int) -> None:
+            async with slots:
+                try:
+                    result[dictionary_id] = await self.get(dictionary_id, date)
+                except LookupError:
+                    pass
+
+        await asyncio.gather(*(load(dictionary_id) for dictionary_id in missing))
+        return result
+
+    async def batch_body(self, snapshots: Dict[int, Optional[Snapshot]]) -> bytes:
+        """
+        Тело ответа с несколькими срезами: JSON-объект
+        {"<id справочника>": [позиции] или null}
+
+        Файлы срезов вставляются в ответ как есть, без повторной сериализации
+        :param snapshots: результат get_many
+        :return:
+        """
+        try:
+            return await asyncio.to_thread(self._read_batch, snapshots)
+        except FileNotFoundError as e:
+            logger.info("Snapshot file disappeared, republishing: %s", e.filename)
+        refreshed: Dict[int, Optional[Snapshot]] = {}
+        for dictionary_id, snapshot in snapshots.items():
+            refreshed[dictionary_id] = None
+            if snapshot is not None:
+                try:
+                    refreshed[dictionary_id] = await self.get(
+                        dictionary_id, snapshot.start_date
+                    )
+                except LookupError:
+                    pass
+        return await asyncio.to_thread(self._read_batch, refreshed)
+
+    async def publish(
+        self, dictionary_id: int, version: int, date: datetime.date
+    ) -> Snapshot:
+        """
+        Формирование и запись среза, действующего на дату
+        :param dictionary_id: идентификатор справочника
+        :param version: версия справочника
+        :param date: дата среза
+        :return: срез
+        """
+        # Срез сохраняется под версией с основного сервера, поэтому и данные
+        # читаются с него, а не с возможно отстающей реплики
+        with read_primary():
+            start_date, finish_date = await DictionaryService.get_snapshot_interval(
+                dictionary_id, date
+            )
+            positions = await DictionaryService.get_dictionary_values(
+                dictionary_id, date
+            )
+        body = _positions_adapter.dump_json(positions)
+        path = os.path.join(
+            self._version_dir(dictionary_id, version),
+            f"{start_date.isoformat()}_{finish_date.isoformat()}.json",
+        )
+        await asyncio.to_thread(self._write, path, body)
+        logger.info(
+            "Published snapshot of dictionary %d v%d for %s..%s (%d bytes)",
+            dictionary_id,
+            version,
+            start_date,
+            finish_date,
+            len(body),
+        )
+        return Snapshot(dictionary_id, version, start_date, finish_date, path)
+
+    def response(self, snapshot: Snapshot, accept_encoding: str) -> FileResponse:
+        """
+        Ответ с файлом среза в подходящей клиенту кодировке
+        :param snapshot: срез
+        :param accept_encoding: заголовок Accept-Encoding запроса
+        :return:
+        :raises FileNotFoundError: файл среза удален (срез нужно получить заново)
+        """
+        headers = {"Vary": "Accept-Encoding"}
+        path = snapshot.path
+        encoding = choose_encoding(accept_encoding, self.available_encodings())
+        # Срез мог быть опубликован процессом без brotli/zstd, gzip есть всегда
+        if encoding is not None and not os.path.exists(
+            snapshot.path + self.ENCODINGS[encoding]
+        ):
+            encoding = choose_encoding(accept_encoding, ["gzip"])
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            path = snapshot.path + self.ENCODINGS[encoding]
+        return FileResponse(
+            path,
+            media_type="application/json",
+            headers=headers,
+            stat_result=os.stat(path),
+        )
+
+    def _lookup(self, dictionary_id: int, date: datetime.date) -> Optional[Snapshot]:
+        snapshots = self._index.get(dictionary_id)
+        if snapshots is None:
+            return None
+        for snapshot in snapshots[1]:
+            if snapshot.covers(date) and os.path.exists(snapshot.path):
+                return snapshot
+        return None
+
+    def _version_dir(self, dictionary_id: int, version: int) -> str:
+        return os.path.join(self.directory, str(dictionary_id), str(version))
+
+    def _scan(self, dictionary_id: int, version: int) -> List[Snapshot]:
+        """
+        Поиск уже опубликованных срезов текущей версии, удаление устаревших
+
+        Предыдущая версия не удаляется: ее файлы могут еще отдаваться воркерами,
+        не получившими уведомление об изменении
+        """
+        dictionary_dir = os.path.join(self.directory, str(dictionary_id))
+        if not os.path.isdir(dictionary_dir):
+            return []
+        older = sorted(
+            int(name)
+            for name in os.listdir(dictionary_dir)
+            if name.isdigit() and int(name) < version
+        )
+        for old_version in older[:-1]:
+            shutil.rmtree(
+                self._version_dir(dictionary_id, old_version), ignore_errors=True
+            )
+
+        version_dir = self._version_dir(dictionary_id, version)
+        if not os.path.isdir(version_dir):
+            return []
+        snapshots = []
+        for name in os.listdir(version_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                start, finish = name[: -len(".json")].split("_")
+                snapshots.append(
+                    Snapshot(
+                        dictionary_id,
+                        version,
+                        datetime.date.fromisoformat(start),
+                        datetime.date.fromisoformat(finish),
+                        os.path.join(version_dir, name),
+                    )
+                )
+            except ValueError:
+                logger.warning("Unexpected file in snapshot directory: %s", name)
+        return snapshots
+
+    @staticmethod
+    def _read_batch(snapshots: Dict[int, Optional[Snapshot]]) -> bytes:
+        parts = []
+        for dictionary_id, snapshot in snapshots.items():
+            if snapshot is None:
+                body = b"null"
+            else:
+                with open(snapshot.path, "rb") as file:
+                    body = file.read()
+            parts.append(b'"%d":%s' % (dictionary_id, body))
+        return b"{" + b",".join(parts) + b"}"
+
+    def _write(self, path: str, body: bytes) -> None:
+        """Атомарная запись исходного и сжатых файлов"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        levels = {
+            "zstd": settings.snapshot_zstd_level,
+            "br": settings.snapshot_brotli_level,
+            "gzip": 9,
+        }
+        variants = {
+            path + self.ENCODINGS[encoding]: compress(body, encoding, levels[encoding])
+            for encoding in self.available_encodings()
+        }
+        # Несжатый файл пишется последним: по нему определяется наличие среза
+        variants[path] = body
+        for target, content in variants.items():
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as file:
+                file.write(content)
+            os.replace(tmp, target)
+
+
+snapshot_publisher = SnapshotPublisher(settings.snapshot_dir)
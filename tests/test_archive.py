@@ -0,0 +1,250 @@
+"""
+Тесты архивации закрытых периодов
+
+Проверка запросов переноса выполняется только при наличии локального
+Postgres (переменная окружения TEST_DATABASE_URL)
+"""
+
+import datetime
+import os
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from archive import Archiver
+from models.model_attribute import ArchivedPeriodError, AttributeManager
+from models.model_dictionary import DictionaryService
+from queries import to_positional
+from routers.dictionary import dict_router
+from schemas import AttrShown
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+BEFORE = datetime.date(2021, 1, 1)
+
+SCHEMA = """
+drop schema if exists archive_test cascade;
+create schema archive_test;
+set search_path = archive_test;
+create table dictionary (id serial primary key, archived_before date);
+create table dictionary_positions (
+    id integer generated always as identity primary key, id_dictionary integer
+);
+create table dictionary_data (
+    id integer generated always as identity primary key,
+    id_dictionary integer, id_position integer, id_attribute integer,
+    value varchar, start_date date, finish_date date
+);
+create table dictionary_relations (
+    id integer generated always as identity primary key,
+    id_positions integer, id_parent_positions integer,
+    start_date date, finish_date date
+);
+create table dictionary_data_history (like dictionary_data);
+create table dictionary_relations_history (like dictionary_relations);
+insert into dictionary default values;
+insert into dictionary default values;
+insert into dictionary_positions (id_dictionary) values (1), (1), (2);
+insert into dictionary_data (id_dictionary, id_position, id_attribute, value,
+    start_date, finish_date)
+values (1, 1, 1, 'old', '2000-01-01', '2019-12-31'),
+       (1, 1, 1, 'new', '2020-01-01', '9999-12-31'),
+       (1, 2, 1, 'old', '2000-01-01', '2020-12-31'),
+       (2, 3, 1, 'other', '2000-01-01', '2019-12-31');
+insert into dictionary_relations (id_positions, id_parent_positions, start_date,
+    finish_date)
+values (2, 1, '2000-01-01', '2019-12-31'), (2, 1, '2020-01-01', '9999-12-31');
+"""
+
+
+@pytest.fixture
+def statements():
+    boundary = MagicMock(fetch_one=AsyncMock(return_value={"archived_before": BEFORE}))
+    move_data = MagicMock(fetch_val=AsyncMock(side_effect=[2, 2, 1]))
+    move_relations = MagicMock(fetch_val=AsyncMock(side_effect=[0]))
+    by_name = {
+        "archive.boundary": boundary,
+        "archive.move_data": move_data,
+        "archive.move_relations": move_relations,
+    }
+    with patch("archive.queries") as mock_queries, patch("archive.change_feed") as feed:
+        mock_queries.statement.side_effect = lambda name, sql: by_name[name]
+        feed.publish = AsyncMock()
+        yield by_name, feed
+
+
+class TestArchiver:
+    """Тесты переноса пачками"""
+
+    def test_boundary(self):
+        archiver = Archiver(horizon_days=365, batch_size=10, pause=0)
+
+        assert archiver.boundary(datetime.date(2024, 6, 1)) == datetime.date(2023, 6, 2)
+
+    @pytest.mark.asyncio
+    async def test_boundary_published_before_move(self, statements):
+        # Arrange
+        by_name, feed = statements
+        events = []
+        feed.publish.side_effect = lambda *args: events.append("publish")
+        by_name["archive.move_data"].fetch_val.side_effect = lambda values: (
+            events.append("move") or 0
+        )
+
+        # Act
+        await Archiver(365, 2, 0).archive_dictionary(3, BEFORE)
+
+        # Assert
+        assert events == ["publish", "move"]
+
+    @pytest.mark.asyncio
+    async def test_moves_until_batch_not_full(self, statements):
+        # Arrange
+        by_name, _ = statements
+
+        # Act
+        report = await Archiver(365, 2, 0).archive_dictionary(3, BEFORE)
+
+        # Assert
+        assert (report.data_rows, report.relation_rows) == (5, 0)
+        assert report.archived_before == BEFORE
+        expected = {"id_dictionary": 3, "before": BEFORE, "limit": 2}
+        assert (
+            by_name["archive.move_data"].fetch_val.await_args_list
+            == [call(expected)] * 3
+        )
+
+    @pytest.mark.asyncio
+    async def test_unknown_dictionary(self, statements):
+        by_name, feed = statements
+        by_name["archive.boundary"].fetch_one.return_value = None
+
+        with pytest.raises(LookupError):
+            await Archiver(365, 2, 0).archive_dictionary(3, BEFORE)
+
+        feed.publish.assert_not_awaited()
+
+
+class TestSnapshotInterval:
+    """Тесты интервала среза при наличии архива"""
+
+    @pytest.mark.asyncio
+    async def test_hot_interval_starts_at_boundary(self):
+        # Arrange
+        row = {
+            "start_date": datetime.date(2020, 1, 1),
+            "finish_date": datetime.date(9999, 12, 31),
+        }
+        with patch.object(
+            DictionaryService, "_archived_before", AsyncMock(return_value=BEFORE)
+        ), patch("models.model_dictionary.queries") as mock_queries:
+            mock_queries.statement.return_value.fetch_one = AsyncMock(return_value=row)
+
+            # Act
+            hot = await DictionaryService.get_snapshot_interval(
+                1, datetime.date(2024, 1, 1)
+            )
+            old = await DictionaryService.get_snapshot_interval(
+                1, datetime.date(2020, 6, 1)
+            )
+
+        # Assert
+        assert hot == (BEFORE, datetime.date(9999, 12, 31))
+        assert old == (datetime.date(2020, 1, 1), datetime.date(9999, 12, 31))
+        names = [args.args[0] for args in mock_queries.statement.call_args_list]
+        assert names == [
+            "dictionary.snapshot_interval",
+            "dictionary.snapshot_interval.history",
+        ]
+        assert "dictionary_data_history" in mock_queries.statement.call_args.args[1]
+
+
+class TestEditBeforeBoundary:
+    """Тесты запрета изменений в архивной части справочника"""
+
+    @pytest.fixture
+    def manager(self):
+        with patch.object(
+            AttributeManager, "_get_dictionary_by_position", AsyncMock(return_value=1)
+        ), patch("models.model_attribute.MetadataCache") as cache, patch.object(
+            AttributeManager, "_delete_nested_period", AsyncMock()
+        ) as delete_nested:
+            cache.get = AsyncMock(return_value=MagicMock(archived_before=BEFORE))
+            yield delete_nested
+
+    @staticmethod
+    def _attrs(start_date):
+        return [
+            AttrShown(name="START_DATE", value=start_date),
+            AttrShown(name="FINISH_DATE", value="9999-12-31"),
+            AttrShown(name="NAME", value="new"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_rejected_before_boundary(self, manager):
+        with pytest.raises(ArchivedPeriodError):
+            await AttributeManager.edit_position(5, self._attrs("2020-06-01"))
+
+        manager.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_endpoint_conflict(self, manager):
+        # Arrange
+        app = FastAPI()
+        app.include_router(dict_router)
+        body = [attr.model_dump() for attr in self._attrs("2020-06-01")]
+
+        # Act
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            response = await client.post(
+                "/models/EditPosition", params={"position_id": 5}, json=body
+            )
+
+        # Assert
+        assert response.status_code == 409
+        manager.assert_not_awaited()
+
+
+@pytest_asyncio.fixture
+async def connection():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    asyncpg = pytest.importorskip("asyncpg")
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    await conn.execute(SCHEMA)
+    yield conn
+    await conn.execute("drop schema archive_test cascade")
+    await conn.close()
+
+
+async def _run(connection, sql, values):
+    text, params = to_positional(sql)
+    return await connection.fetchval(text, *[values[name] for name in params])
+
+
+@pytest.mark.asyncio
+async def test_move_sql(connection):
+    # Arrange
+    values = {"id_dictionary": 1, "before": BEFORE, "limit": 10}
+
+    # Act
+    boundary = await connection.fetchrow(
+        to_positional(Archiver.BOUNDARY_SQL)[0], BEFORE, 1
+    )
+    data = await _run(connection, Archiver.MOVE_DATA_SQL, values)
+    relations = await _run(connection, Archiver.MOVE_RELATIONS_SQL, values)
+
+    # Assert
+    assert boundary["archived_before"] == BEFORE
+    assert (data, relations) == (2, 1)
+    hot = await connection.fetch("select value from dictionary_data order by id")
+    assert [row["value"] for row in hot] == ["new", "other"]
+    history = await connection.fetch(
+        "select id, value from dictionary_data_history order by id"
+    )
+    assert [tuple(row) for row in history] == [(1, "old"), (3, "old")]
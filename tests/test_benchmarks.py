@@ -0,0 +1,84 @@
+"""
+Тесты для вспомогательных функций benchmarks/
+"""
+
+import pytest
+
+from benchmarks.run import measure, summarize
+from benchmarks.seed import SeedParams, import_frame, parent_index
+
+
+class TestSeedParams:
+    """Тесты для параметров синтетического справочника"""
+
+    def test_attribute_names(self):
+        params = SeedParams(attributes=5)
+
+        assert params.attribute_names == [
+            "CODE",
+            "NAME",
+            "PARENT_CODE",
+            "ATTR_4",
+            "ATTR_5",
+        ]
+
+    @pytest.mark.parametrize(
+        "positions, depth, expected_depth",
+        [(1000, 1, 1), (1000, 2, 2), (1000, 3, 3), (1000, 4, 4)],
+    )
+    def test_hierarchy_depth(self, positions, depth, expected_depth):
+        # Arrange
+        params = SeedParams(positions=positions, depth=depth)
+
+        # Act
+        levels = {0: 1}
+        for index in range(1, positions):
+            parent = parent_index(index, params.fanout)
+            levels[index] = 1 if parent is None else levels[parent] + 1
+
+        # Assert
+        assert max(levels.values()) == expected_depth
+
+    def test_import_frame_matches_hierarchy(self):
+        # Arrange
+        params = SeedParams(positions=10, attributes=4, depth=2)
+
+        # Act
+        frame = import_frame(params)
+
+        # Assert
+        assert list(frame.columns) == ["CODE", "NAME", "PARENT_CODE", "ATTR_4"]
+        assert frame["PARENT_CODE"].iloc[0] is None
+        assert set(frame["PARENT_CODE"].iloc[1:]) == {"00000000"}
+
+
+class TestMeasure:
+    """Тесты для замера операций"""
+
+    def test_summarize(self):
+        summary = summarize([3.0, 1.0, 2.0])
+
+        assert summary == {
+            "runs": 3,
+            "min": 1.0,
+            "median": 2.0,
+            "mean": 2.0,
+            "max": 3.0,
+        }
+
+    @pytest.mark.asyncio
+    async def test_measure_skips_warmup(self):
+        # Arrange
+        calls = []
+
+        async def operation(run):
+            calls.append(run)
+            return [1, 2]
+
+        # Act
+        summary = await measure(operation, repeat=3, warmup=2)
+
+        # Assert
+        assert calls == [0, 1, 2, 3, 4]
+        assert summary["runs"] == 3
+        assert summary["rows"] == 2
@@ -0,0 +1,195 @@
+"""
+Тесты для модулей cache.py и change_feed.py
+"""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from cache import (
+    DictionaryCache,
+    generation,
+    invalidate_all,
+    invalidate_dictionary,
+    register_cache,
+)
+from change_feed import ChangeFeed
+
+
+class TestDictionaryCache:
+    """Тесты для кэша справочников"""
+
+    def test_get_miss_and_hit(self):
+        # Arrange
+        cache = DictionaryCache("test", maxsize=10)
+
+        # Act
+        missed = cache.get(1, "a")
+        cache.set(1, "a", 42)
+        hit = cache.get(1, "a")
+
+        # Assert
+        assert missed is None
+        assert hit == 42
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_invalidate_only_one_dictionary(self):
+        # Arrange
+        cache = DictionaryCache("test", maxsize=10)
+        cache.set(1, "a", 1)
+        cache.set(1, "b", 2)
+        cache.set(2, "a", 3)
+
+        # Act
+        cache.invalidate(1)
+
+        # Assert
+        assert cache.get(1, "a") is None
+        assert cache.get(1, "b") is None
+        assert cache.get(2, "a") == 3
+
+    def test_lru_eviction(self):
+        # Arrange
+        cache = DictionaryCache("test", maxsize=2)
+        cache.set(1, "a", 1)
+        cache.set(1, "b", 2)
+        cache.get(1, "a")
+
+        # Act
+        cache.set(1, "c", 3)
+
+        # Assert
+        assert len(cache) == 2
+        assert cache.get(1, "b") is None
+        assert cache.get(1, "a") == 1
+
+    def test_invalidate_dictionary_in_registered_caches(self):
+        # Arrange
+        first = register_cache("first")
+        second = register_cache("second")
+        first.set(7, None, "x")
+        second.set(7, "k", "y")
+
+        # Act
+        invalidate_dictionary(7)
+
+        # Assert
+        assert first.get(7) is None
+        assert second.get(7, "k") is None
+
+    def test_fill_started_before_invalidation_not_saved(self):
+        # Arrange: чтение из базы началось до сброса
+        cache = register_cache("stale_fill")
+        since = generation(4)
+        invalidate_dictionary(4)
+
+        # Act
+        cache.set(4, None, "old", since)
+
+        # Assert
+        assert cache.get(4) is None
+        cache.set(4, None, "new", generation(4))
+        assert cache.get(4) == "new"
+
+    def test_fill_started_before_clear_not_saved(self):
+        cache = register_cache("stale_clear")
+        since = generation(4)
+        invalidate_all()
+
+        cache.set(4, None, "old", since)
+
+        assert cache.get(4) is None
+
+
+class TestChangeFeed:
+    """Тесты для рассылки изменений справочников"""
+
+    def test_parse_payload(self):
+        assert ChangeFeed.parse_payload("12:5") == (12, 5)
+        assert ChangeFeed.parse_payload("12") == (12, None)
+
+    def test_on_notify_invalidates_cache(self):
+        # Arrange
+        cache = register_cache("notify")
+        cache.set(3, None, "value")
+        feed = ChangeFeed("postgresql://localhost/test", "channel")
+
+        # Act
+        feed._on_notify(None, 1, "channel", "3:8")
+
+        # Assert
+        assert cache.get(3) is None
+
+    def test_on_notify_ignores_invalid_payload(self):
+        feed = ChangeFeed("postgresql://localhost/test", "channel")
+        feed._on_notify(None, 1, "channel", "garbage")
+
+    @pytest.mark.asyncio
+    async def test_publish_returns_version(self):
+        # Arrange
+        cache = register_cache("publish")
+        cache.set(5, None, "value")
+        feed = ChangeFeed("postgresql://localhost/test", "channel")
+
+        with patch("change_feed.database") as mock_db:
+            mock_db.fetch_one = AsyncMock(return_value={"version": 3})
+
+            # Act
+            version = await feed.publish(5)
+
+        # Assert
+        assert version == 3
+        assert cache.get(5) is None
+        assert mock_db.fetch_one.call_args[0][1] == {"id": 5, "channel": "channel"}
+
+    @pytest.mark.asyncio
+    async def test_publish_database_error(self):
+        feed = ChangeFeed("postgresql://localhost/test", "channel")
+
+        with patch("change_feed.database") as mock_db:
+            mock_db.fetch_one = AsyncMock(side_effect=Exception("db down"))
+
+            # Act
+            version = await feed.publish(5)
+
+        # Assert
+        assert version is None
+
+    @staticmethod
+    async def _listen(feed, connect, sleeps):
+        with patch("change_feed.asyncpg.connect", connect), patch(
+            "change_feed.asyncio.sleep", AsyncMock(side_effect=sleeps)
+        ), patch("change_feed.invalidate_all") as invalidate_all:
+            with pytest.raises(asyncio.CancelledError):
+                await feed._listen()
+        return invalidate_all
+
+    @pytest.mark.asyncio
+    async def test_first_connect_keeps_caches(self):
+        # Arrange
+        feed = ChangeFeed("postgresql://localhost/test", "channel")
+        connect = AsyncMock(return_value=MagicMock(close=AsyncMock()))
+        connect.return_value.add_listener = AsyncMock()
+
+        # Act
+        invalidate_all = await self._listen(feed, connect, [asyncio.CancelledError])
+
+        # Assert: прогретые кэши не сбрасываются
+        invalidate_all.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_reconnect_clears_caches(self):
+        # Arrange
+        feed = ChangeFeed("postgresql://localhost/test", "channel")
+        connection = MagicMock(close=AsyncMock(), add_listener=AsyncMock())
+        connect = AsyncMock(side_effect=[OSError("db down"), connection])
+
+        # Act
+        invalidate_all = await self._listen(
+            feed, connect, [None, asyncio.CancelledError]
+        )
+
+        # Assert
+        invalidate_all.assert_called_once()
@@ -0,0 +1,152 @@
+"""
+Тесты соответствия кодов позиций идентификаторам и наименованиям
+"""
+
+import json
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from cache import invalidate_dictionary
+from compression import EncodedBody
+from models.model_dictionary import DictionaryService
+from models.model_metadata import DictionaryMetadata
+from replicas import ReplicaPool
+from routers.dictionary import dict_router
+
+METADATA = DictionaryMetadata(
+    dictionary_id=4,
+    start_date=date(2000, 1, 1),
+    finish_date=date(9999, 12, 31),
+    attributes={"CODE": 10, "NAME": 11},
+    required_fields=["CODE", "NAME"],
+    structure=[],
+    archived_before=date(2020, 1, 1),
+)
+
+ROWS = [
+    {"code": "01", "value": 101},
+    {"code": "02", "value": 102},
+]
+
+
+@pytest.fixture
+def mock_queries():
+    invalidate_dictionary(4)
+    with patch("models.model_dictionary.MetadataCache") as cache, patch(
+        "models.model_dictionary.queries"
+    ) as mock_queries:
+        cache.get = AsyncMock(return_value=METADATA)
+        mock_queries.statement.return_value.fetch_all = AsyncMock(return_value=ROWS)
+        yield mock_queries
+    invalidate_dictionary(4)
+
+
+class TestGetCodeMap:
+    """Тесты построения соответствия в сервисе"""
+
+    @pytest.mark.asyncio
+    async def test_parallel_arrays_cached(self, mock_queries):
+        # Act
+        first = await DictionaryService.get_code_map(4, date(2024, 1, 1))
+        second = await DictionaryService.get_code_map(4, date(2024, 1, 1))
+
+        # Assert
+        assert json.loads(first.body) == {"codes": ["01", "02"], "ids": [101, 102]}
+        assert second is first
+        mock_queries.statement.assert_called_once()
+        name, sql = mock_queries.statement.call_args.args
+        assert name == "dictionary.code_map.id"
+        assert "dictionary_data_history" not in sql
+        assert mock_queries.statement.return_value.fetch_all.await_args.args[0] == {
+            "id_dictionary": 4,
+            "code_attribute": 10,
+            "dt": date(2024, 1, 1),
+        }
+
+    @pytest.mark.asyncio
+    async def test_names_before_archive_boundary(self, mock_queries):
+        # Act
+        body = await DictionaryService.get_code_map(4, date(2019, 1, 1), "name")
+
+        # Assert
+        assert json.loads(body.body)["names"] == [101, 102]
+        name, sql = mock_queries.statement.call_args.args
+        assert name == "dictionary.code_map.name.history"
+        assert "dictionary_data_history" in sql
+        values = mock_queries.statement.return_value.fetch_all.await_args.args[0]
+        assert values["name_attribute"] == 11
+
+    @pytest.mark.asyncio
+    async def test_read_on_primary(self, mock_queries):
+        # Arrange: кэшируемое соответствие не должно читаться с реплики
+        pool = ReplicaPool(["postgresql://user@replica/db"], 1, 1)
+        pool.replicas[0].healthy = True
+        chosen = []
+
+        async def fetch_all(values):
+            chosen.append(pool.choose())
+            return ROWS
+
+        mock_queries.statement.return_value.fetch_all = AsyncMock(side_effect=fetch_all)
+
+        # Act
+        await DictionaryService.get_code_map(4, date(2024, 1, 1))
+
+        # Assert
+        assert chosen == [None]
+
+    @pytest.mark.asyncio
+    async def test_invalidated_on_change(self, mock_queries):
+        await DictionaryService.get_code_map(4, date(2024, 1, 1))
+        invalidate_dictionary(4)
+        await DictionaryService.get_code_map(4, date(2024, 1, 1))
+
+        assert mock_queries.statement.return_value.fetch_all.await_count == 2
+
+
+class TestCodeMapEndpoint:
+    """Тесты эндпоинта соответствия кодов"""
+
+    @pytest.fixture
+    def app(self):
+        app = FastAPI()
+        app.include_router(dict_router)
+        return app
+
+    @pytest.mark.asyncio
+    async def test_body_passed_through(self, app):
+        # Arrange
+        body = b'{"codes":["01"],"names":["A"]}'
+        with patch("routers.dictionary.DictionaryService") as service:
+            service.get_code_map = AsyncMock(return_value=EncodedBody(body))
+
+            # Act
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                response = await client.get(
+                    "/models/codeMap/",
+                    params={"dictionary": 4, "date": "2024-01-01", "target": "name"},
+                )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.content == body
+        service.get_code_map.assert_awaited_once_with(4, date(2024, 1, 1), "name")
+
+    @pytest.mark.asyncio
+    async def test_unknown_dictionary(self, app):
+        with patch("routers.dictionary.DictionaryService") as service:
+            service.get_code_map = AsyncMock(side_effect=LookupError)
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                response = await client.get(
+                    "/models/codeMap/", params={"dictionary": 4}
+                )
+
+        assert response.status_code == 404
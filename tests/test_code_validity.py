@@ -0,0 +1,207 @@
+"""
+Тесты проверки действия кодов на даты
+"""
+
+import base64
+import time
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from cache import invalidate_dictionary
+from models.model_metadata import DictionaryMetadata
+from models.model_validity import CodeIntervals, CodeValidity, pack_bitmap
+from replicas import ReplicaPool
+from routers.dictionary import dict_router
+
+PERIODS = [
+    ("01", date(2020, 1, 1), date(2020, 12, 31)),
+    ("01", date(2021, 1, 1), date(2021, 6, 30)),
+    ("01", date(2021, 3, 1), date(2021, 12, 31)),
+    ("01", date(2023, 1, 1), date(9999, 12, 31)),
+    ("02", date(2022, 1, 1), date(2022, 1, 1)),
+]
+
+METADATA = DictionaryMetadata(
+    dictionary_id=6,
+    start_date=date(2000, 1, 1),
+    finish_date=date(9999, 12, 31),
+    attributes={"CODE": 10},
+    required_fields=["CODE"],
+    structure=[],
+)
+
+
+class TestCodeIntervals:
+    """Тесты структуры интервалов"""
+
+    def test_merged_intervals(self):
+        intervals = CodeIntervals.build(PERIODS)
+
+        starts, finishes = intervals.intervals["01"]
+        assert len(starts) == 2
+        assert date.fromordinal(finishes[0]) == date(2021, 12, 31)
+
+    @pytest.mark.parametrize(
+        "code, day, expected",
+        [
+            ("01", date(2019, 12, 31), False),
+            ("01", date(2020, 1, 1), True),
+            ("01", date(2021, 7, 1), True),
+            ("01", date(2022, 6, 1), False),
+            ("01", date(2023, 1, 1), True),
+            ("02", date(2022, 1, 1), True),
+            ("02", date(2022, 1, 2), False),
+            ("03", date(2022, 1, 1), False),
+        ],
+    )
+    def test_is_valid(self, code, day, expected):
+        assert CodeIntervals.build(PERIODS).is_valid(code, day) is expected
+
+    def test_many_checks_are_fast(self):
+        # Arrange
+        periods = [
+            (f"{n:06d}", date(2000, 1, 1), date(2030, 1, 1)) for n in range(200_000)
+        ]
+        intervals = CodeIntervals.build(periods)
+        codes = [f"{n % 300_000:06d}" for n in range(1_000_000)]
+        dates = [date(2024, 1, 1)] * len(codes)
+
+        # Act
+        started = time.perf_counter()
+        flags = intervals.check(codes, dates)
+
+        # Assert
+        assert sum(flags) == 700_000
+        assert time.perf_counter() - started < 5
+
+
+def test_pack_bitmap():
+    bitmap = base64.b64decode(pack_bitmap([True, False, True] + [False] * 6 + [True]))
+
+    assert bitmap == bytes([0b00000101, 0b00000010])
+
+
+class TestCodeValidity:
+    """Тесты загрузки интервалов через кэш"""
+
+    @pytest.mark.asyncio
+    async def test_loaded_once_per_version(self):
+        # Arrange
+        invalidate_dictionary(6)
+        rows = [
+            {"value": code, "start_date": start, "finish_date": finish}
+            for code, start, finish in PERIODS
+        ]
+        with patch("models.model_validity.MetadataCache") as cache, patch(
+            "models.model_validity.queries"
+        ) as mock_queries:
+            cache.get = AsyncMock(return_value=METADATA)
+            fetch_all = mock_queries.statement.return_value.fetch_all = AsyncMock(
+                return_value=rows
+            )
+
+            # Act
+            first = await CodeValidity.check(6, ["01", "02"], [date(2020, 5, 1)] * 2)
+            second = await CodeValidity.check(6, ["02"], [date(2022, 1, 1)])
+            invalidate_dictionary(6)
+            await CodeValidity.check(6, ["01"])
+
+        # Assert
+        assert first == ([True, False], 1)
+        assert second == ([True], 1)
+        assert fetch_all.await_count == 2
+        name, sql = mock_queries.statement.call_args.args
+        assert name == "validity.code_periods"
+        assert fetch_all.await_args.args[0] == {
+            "id_dictionary": 6,
+            "code_attribute": 10,
+        }
+
+    @pytest.mark.asyncio
+    async def test_loaded_on_primary(self):
+        # Arrange: кэшируемые интервалы не должны читаться с реплики
+        invalidate_dictionary(6)
+        pool = ReplicaPool(["postgresql://user@replica/db"], 1, 1)
+        pool.replicas[0].healthy = True
+        chosen = []
+
+        async def fetch_all(values):
+            chosen.append(pool.choose())
+            return []
+
+        with patch("models.model_validity.MetadataCache") as cache, patch(
+            "models.model_validity.queries"
+        ) as mock_queries:
+            cache.get = AsyncMock(return_value=METADATA)
+            mock_queries.statement.return_value.fetch_all = fetch_all
+
+            # Act
+            await CodeValidity.get(6)
+
+        # Assert
+        assert chosen == [None]
+        invalidate_dictionary(6)
+
+
+class TestCheckCodesEndpoint:
+    """Тесты эндпоинта проверки кодов"""
+
+    @pytest.fixture
+    def app(self):
+        app = FastAPI()
+        app.include_router(dict_router)
+        return app
+
+    async def _post(self, app, body):
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            return await client.post(
+                "/models/checkCodes/", params={"dictionary": 6}, json=body
+            )
+
+    @pytest.mark.asyncio
+    async def test_bitmap(self, app):
+        # Arrange
+        check = AsyncMock(return_value=([True, False, True], 2))
+        with patch.object(CodeValidity, "check", check):
+            # Act
+            response = await self._post(
+                app,
+                {
+                    "codes": ["01", "02", "03"],
+                    "dates": ["2024-01-01", "2024-01-02", "2024-01-03"],
+                },
+            )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == {
+            "count": 3,
+            "valid": 2,
+            "bitmap": base64.b64encode(b"\x05").decode(),
+        }
+        check.assert_awaited_once_with(
+            6,
+            ["01", "02", "03"],
+            [date(2024, 1, 1) + timedelta(days=n) for n in range(3)],
+        )
+
+    @pytest.mark.asyncio
+    async def test_length_mismatch(self, app):
+        response = await self._post(
+            app, {"codes": ["01", "02"], "dates": ["2024-01-01"]}
+        )
+
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_unknown_dictionary(self, app):
+        with patch.object(CodeValidity, "check", AsyncMock(side_effect=LookupError)):
+            response = await self._post(app, {"codes": ["01"]})
+
+        assert response.status_code == 404
@@ -0,0 +1,144 @@
+"""
+Тесты уплотнения периодов значений
+
+Проверка самого запроса выполняется только при наличии локального Postgres
+(переменная окружения TEST_DATABASE_URL)
+"""
+
+import datetime
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import pytest_asyncio
+
+from compaction import Compactor
+from queries import to_positional
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+SCHEMA = """
+drop schema if exists compaction_test cascade;
+create schema compaction_test;
+set search_path = compaction_test;
+create table dictionary_positions (
+    id integer generated always as identity primary key,
+    id_dictionary integer
+);
+create table dictionary_data (
+    id integer generated always as identity primary key,
+    id_dictionary integer, id_position integer, id_attribute integer,
+    value varchar, start_date date, finish_date date
+);
+insert into dictionary_positions (id_dictionary) values (1), (1);
+"""
+
+
+@pytest.fixture
+def statements():
+    fetch_all = AsyncMock(side_effect=[[{"id": 1}, {"id": 2}], [{"id": 3}], []])
+    fetch_one = AsyncMock(
+        side_effect=[{"reclaimed": 5, "extended": 2}, {"reclaimed": 0, "extended": 0}]
+    )
+    statement = MagicMock(fetch_all=fetch_all, fetch_one=fetch_one)
+    with patch("compaction.queries") as mock_queries, patch(
+        "compaction.change_feed"
+    ) as feed:
+        mock_queries.statement.return_value = statement
+        feed.publish = AsyncMock()
+        yield statement, feed
+
+
+class TestCompactor:
+    """Тесты прохода по справочнику пачками"""
+
+    @pytest.mark.asyncio
+    async def test_batches_and_report(self, statements):
+        # Arrange
+        statement, feed = statements
+
+        # Act
+        report = await Compactor(batch_size=2, pause=0).compact_dictionary(7)
+
+        # Assert
+        assert (report.positions, report.rows_reclaimed, report.rows_extended) == (
+            3,
+            5,
+            2,
+        )
+        afters = [call.args[0]["after"] for call in statement.fetch_all.await_args_list]
+        assert afters == [0, 2, 3]
+        assert statement.fetch_one.await_args_list[1].args[0] == {
+            "id_dictionary": 7,
+            "positions": [3],
+        }
+        feed.publish.assert_awaited_once_with(7)
+
+    @pytest.mark.asyncio
+    async def test_nothing_reclaimed_keeps_version(self, statements):
+        statement, feed = statements
+        statement.fetch_all.side_effect = [[{"id": 1}], []]
+        statement.fetch_one.side_effect = [{"reclaimed": 0, "extended": 0}]
+
+        report = await Compactor(batch_size=10, pause=0).compact_dictionary(7)
+
+        assert report.rows_reclaimed == 0
+        feed.publish.assert_not_awaited()
+
+
+@pytest_asyncio.fixture
+async def connection():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    asyncpg = pytest.importorskip("asyncpg")
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    await conn.execute(SCHEMA)
+    yield conn
+    await conn.execute("drop schema compaction_test cascade")
+    await conn.close()
+
+
+@pytest.mark.asyncio
+async def test_compact_sql(connection):
+    # Arrange
+    day = datetime.date
+    rows = [
+        # соседние и перекрывающиеся периоды одного значения
+        (1, 10, "A", day(2020, 1, 1), day(2020, 12, 31)),
+        (1, 10, "A", day(2021, 1, 1), day(2021, 6, 30)),
+        (1, 10, "A", day(2021, 3, 1), day(2022, 12, 31)),
+        # другое значение и повтор после него - не сливаются
+        (1, 10, "B", day(2023, 1, 1), day(2023, 12, 31)),
+        (1, 10, "A", day(2024, 1, 1), day(9999, 12, 31)),
+        # разрыв в один день
+        (2, 10, None, day(2020, 1, 1), day(2020, 12, 31)),
+        (2, 10, None, day(2021, 1, 2), day(2021, 12, 31)),
+        (2, 11, None, day(2020, 1, 1), day(2020, 12, 31)),
+        (2, 11, None, day(2021, 1, 1), day(2021, 12, 31)),
+    ]
+    await connection.executemany(
+        """insert into dictionary_data
+        (id_dictionary, id_position, id_attribute, value, start_date, finish_date)
+        values (1, $1, $2, $3, $4, $5)""",
+        rows,
+    )
+    text, params = to_positional(Compactor.COMPACT_SQL)
+
+    # Act
+    result = await connection.fetchrow(text, 1, [1, 2])
+    remaining = await connection.fetch(
+        """select id_position, id_attribute, value, start_date, finish_date
+        from dictionary_data order by id"""
+    )
+
+    # Assert
+    assert params == ["id_dictionary", "positions"]
+    assert (result["reclaimed"], result["extended"]) == (3, 2)
+    assert [tuple(row) for row in remaining] == [
+        (1, 10, "A", day(2020, 1, 1), day(2022, 12, 31)),
+        (1, 10, "B", day(2023, 1, 1), day(2023, 12, 31)),
+        (1, 10, "A", day(2024, 1, 1), day(9999, 12, 31)),
+        (2, 10, None, day(2020, 1, 1), day(2020, 12, 31)),
+        (2, 10, None, day(2021, 1, 2), day(2021, 12, 31)),
+        (2, 11, None, day(2020, 1, 1), day(2021, 12, 31)),
+    ]
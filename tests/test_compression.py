@@ -0,0 +1,206 @@
+"""
+Тесты для модуля compression.py
+"""
+
+import asyncio
+import gzip
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from compression import (
+    CompressionMiddleware,
+    EncodedBody,
+    available_encodings,
+    choose_encoding,
+    compress,
+    zstandard,
+)
+
+BIG = [{"name": "CODE", "value": str(n)} for n in range(200)]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    async def big():
+        return BIG
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse("x" * 1000, headers={"Vary": "Origin"})
+
+    @app.get("/encoded")
+    async def encoded():
+        return JSONResponse(BIG, headers={"Content-Encoding": "identity"})
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for item in BIG:
+                yield json.dumps(item).encode()
+
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    return TestClient(app)
+
+
+class TestChooseEncoding:
+    """Тесты выбора кодировки"""
+
+    def test_highest_weight_wins(self):
+        assert choose_encoding("gzip;q=1, zstd;q=0.5", ["zstd", "gzip"]) == "gzip"
+
+    def test_server_preference_on_tie(self):
+        assert choose_encoding("gzip, zstd", ["zstd", "gzip"]) == "zstd"
+        assert choose_encoding("*", ["zstd", "gzip"]) == "zstd"
+
+    def test_nothing_accepted(self):
+        assert choose_encoding("identity", ["zstd", "gzip"]) is None
+        assert choose_encoding("gzip;q=0", ["gzip"]) is None
+        assert choose_encoding("", ["gzip"]) is None
+
+
+class TestCompress:
+    """Тесты сжатия тела целиком"""
+
+    @pytest.mark.parametrize("encoding", available_encodings())
+    def test_round_trip(self, encoding):
+        body = json.dumps(BIG).encode()
+
+        compressed = compress(body, encoding)
+
+        assert len(compressed) < len(body)
+        if encoding == "gzip":
+            assert gzip.decompress(compressed) == body
+        elif encoding == "zstd":
+            assert (
+                zstandard.ZstdDecompressor().decompressobj().decompress(compressed)
+                == body
+            )
+
+
+class TestCompressionMiddleware:
+    """Тесты сжатия ответов"""
+
+    def test_large_response_compressed(self, client):
+        # Act
+        response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+        # Assert
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(json.dumps(BIG))
+        assert response.json() == BIG
+
+    def test_small_response_not_compressed(self, client):
+        response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.json() == {"ok": True}
+
+    def test_identity_requested(self, client):
+        response = client.get("/big", headers={"Accept-Encoding": "identity"})
+
+        assert "content-encoding" not in response.headers
+        assert response.json() == BIG
+
+    def test_already_encoded_untouched(self, client):
+        response = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "identity"
+
+    def test_vary_merged(self, client):
+        response = client.get("/text", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Origin, Accept-Encoding"
+        assert response.text == "x" * 1000
+
+    def test_streaming_response(self, client):
+        # Act
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+        # Assert
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.content == b"".join(json.dumps(i).encode() for i in BIG)
+
+    @pytest.mark.skipif(zstandard is None, reason="zstandard не установлен")
+    def test_zstd(self, client):
+        # Act
+        response = client.get("/big", headers={"Accept-Encoding": "zstd"})
+
+        # Assert
+        assert response.headers["content-encoding"] == "zstd"
+
+    def test_large_body_compressed_off_event_loop(self):
+        # Arrange
+        app = FastAPI()
+        app.add_middleware(
+            CompressionMiddleware, minimum_size=500, thread_min_size=4096
+        )
+
+        @app.get("/big")
+        async def big():
+            return BIG
+
+        @app.get("/medium")
+        async def medium():
+            return BIG[:50]
+
+        # Act
+        headers = {"Accept-Encoding": "gzip"}
+        to_thread = patch("compression.asyncio.to_thread", wraps=asyncio.to_thread)
+        with to_thread as thread:
+            client = TestClient(app)
+            big_response = client.get("/big", headers=headers)
+            medium_response = client.get("/medium", headers=headers)
+
+        # Assert: в пул уходит только тело больше thread_min_size
+        assert thread.call_count == 1
+        assert big_response.json() == BIG
+        assert medium_response.headers["content-encoding"] == "gzip"
+        assert medium_response.json() == BIG[:50]
+
+
+class TestEncodedBody:
+    """Тесты тела со сжатыми вариантами"""
+
+    @pytest.mark.asyncio
+    async def test_variant_compressed_once(self):
+        # Arrange
+        body = EncodedBody(json.dumps(BIG).encode())
+
+        # Act
+        with patch("compression.compress", wraps=compress) as mock_compress:
+            first = await body.response("gzip, br;q=0")
+            second = await body.response("gzip")
+            plain = await body.response("identity")
+
+        # Assert
+        assert mock_compress.call_count == 1
+        assert first.headers["content-encoding"] == "gzip"
+        assert second.body == first.body
+        assert json.loads(gzip.decompress(first.body)) == BIG
+        assert "content-encoding" not in plain.headers
+        assert plain.headers["vary"] == "Accept-Encoding"
+
+    @pytest.mark.asyncio
+    async def test_small_body_not_compressed(self):
+        response = await EncodedBody(b'{"ok":true}').response("gzip")
+
+        assert "content-encoding" not in response.headers
+        assert response.body == b'{"ok":true}'
@@ -0,0 +1,129 @@
+"""
+Тесты для модуля database.py (журнал медленных запросов)
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import databases
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from database import InstrumentedDatabase, slow_logger
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(slow_logger, "handlers", [])
+    database = InstrumentedDatabase("postgresql://localhost/test")
+    database.threshold = 0.5
+    database.explain = False
+    return database
+
+
+class TestInstrumentedDatabase:
+    """Тесты для замера времени запросов"""
+
+    def test_fast_query_not_logged(self, db, caplog):
+        with caplog.at_level(logging.WARNING, logger="slow_query"):
+            db.observe("select 1", None, 0.1)
+
+        assert not caplog.records
+
+    def test_slow_query_logged_with_params(self, db, caplog):
+        with caplog.at_level(logging.WARNING, logger="slow_query"):
+            db.observe("select *\n  from dictionary where id = :id", {"id": 5}, 1.2)
+
+        # Assert
+        assert len(caplog.records) == 1
+        message = caplog.records[0].getMessage()
+        assert "1.200s select * from dictionary where id = :id" in message
+        assert "{'id': 5}" in message
+
+    def test_slow_batch_logs_first_row(self, db, caplog):
+        values = [{"id": 1}, {"id": 2}, {"id": 3}]
+
+        with caplog.at_level(logging.WARNING, logger="slow_query"):
+            db.observe("insert into t values (:id)", values, 2.0)
+
+        message = caplog.records[0].getMessage()
+        assert "3 rows, first: [{'id': 1}]" in message
+
+    @pytest.mark.asyncio
+    async def test_slow_query_explained_once(self, db):
+        # Arrange
+        db.explain = True
+
+        with patch.object(db, "_explain", new_callable=AsyncMock) as mock_explain:
+            # Act
+            db.observe("select 1", {}, 1.0, readonly=True)
+            db.observe("select 1", {}, 1.0, readonly=True)
+            db.observe("insert into t values (:id)", [{"id": 1}], 1.0)
+            tracked = len(db._explain_tasks)
+            await asyncio.gather(*db._explain_tasks)
+
+        # Assert: задача удерживается до завершения
+        mock_explain.assert_called_once_with("select 1", {}, True)
+        assert tracked == 1
+        assert not db._explain_tasks
+
+    @staticmethod
+    def _explaining_connection():
+        connection = MagicMock()
+        connection.fetch_all = AsyncMock(return_value=[("Seq Scan on t",)])
+        connection.transaction = AsyncMock()
+
+        @asynccontextmanager
+        async def connect():
+            yield connection
+
+        return connection, connect
+
+    @pytest.mark.asyncio
+    async def test_write_not_executed_for_explain(self, db):
+        # Arrange
+        connection, connect = self._explaining_connection()
+
+        with patch.object(db, "connection", connect):
+            # Act
+            await db._explain("delete from t where id = :id", {"id": 1})
+
+        # Assert
+        connection.fetch_all.assert_awaited_once_with(
+            "EXPLAIN delete from t where id = :id", {"id": 1}
+        )
+        connection.transaction.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_readonly_analyzed_in_readonly_transaction(self, db):
+        # Arrange
+        connection, connect = self._explaining_connection()
+
+        with patch.object(db, "connection", connect):
+            # Act
+            await db._explain("select * from t where id = :id", {"id": 1}, True)
+
+        # Assert
+        connection.fetch_all.assert_awaited_once_with(
+            "EXPLAIN (ANALYZE, BUFFERS) select * from t where id = :id", {"id": 1}
+        )
+        connection.transaction.assert_awaited_once_with(readonly=True)
+        connection.transaction.return_value.rollback.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_fetch_all_is_timed(self, db):
+        # Arrange
+        db.threshold = 0.0
+
+        with patch.object(
+            databases.Database, "fetch_all", new_callable=AsyncMock
+        ) as mock_fetch, patch.object(db, "observe") as mock_observe:
+            mock_fetch.return_value = [{"id": 1}]
+
+            # Act
+            rows = await db.fetch_all("select :id", {"id": 1})
+
+        # Assert
+        assert rows == [{"id": 1}]
+        assert mock_observe.call_args[0][:2] == ("select :id", {"id": 1})
@@ -0,0 +1,154 @@
+"""
+Тесты для отличий справочника между двумя датами
+"""
+
+import json
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from models.model_dictionary import DictionaryService
+from routers.dictionary import dict_router, stream_json_array
+from schemas import PositionDiff
+
+ROWS = [
+    {
+        "id": 1,
+        "status": "changed",
+        "old_parent_id": 5,
+        "new_parent_id": 6,
+        "changes": '[{"name": "NAME", "old_value": "a", "new_value": "b"}]',
+    },
+    {
+        "id": 2,
+        "status": "added",
+        "old_parent_id": None,
+        "new_parent_id": None,
+        "changes": '[{"name": "CODE", "old_value": null, "new_value": "002"}]',
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def no_archive():
+    with patch.object(
+        DictionaryService, "_archived_before", AsyncMock(return_value=None)
+    ):
+        yield
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class TestGetDictionaryDiff:
+    """Тесты получения отличий в сервисе"""
+
+    @pytest.mark.asyncio
+    async def test_rows_parsed(self):
+        # Arrange
+        with patch("models.model_dictionary.queries") as mock_queries:
+            statement = mock_queries.statement.return_value
+            statement.iterate = MagicMock(return_value=_aiter(ROWS))
+
+            # Act
+            result = [
+                diff
+                async for diff in DictionaryService.get_dictionary_diff(
+                    3, date(2024, 1, 1), date(2024, 6, 1)
+                )
+            ]
+
+        # Assert
+        assert [diff.status for diff in result] == ["changed", "added"]
+        assert result[0].changes[0].old_value == "a"
+        assert result[0].new_parent_id == 6
+        assert mock_queries.statement.call_args.kwargs == {"readonly": True}
+        statement.iterate.assert_called_once_with(
+            {
+                "id_dictionary": 3,
+                "date_from": date(2024, 1, 1),
+                "date_to": date(2024, 6, 1),
+            }
+        )
+
+
+class TestStreamJsonArray:
+    """Тесты потоковой сериализации"""
+
+    @pytest.mark.asyncio
+    async def test_chunks_form_array(self):
+        # Arrange
+        items = [PositionDiff(**row) for row in ROWS * 3]
+
+        # Act
+        chunks = [chunk async for chunk in stream_json_array(_aiter(items), 100)]
+
+        # Assert
+        assert len(chunks) > 1
+        assert json.loads(b"".join(chunks)) == [
+            json.loads(item.model_dump_json()) for item in items
+        ]
+
+    @pytest.mark.asyncio
+    async def test_empty(self):
+        chunks = [chunk async for chunk in stream_json_array(_aiter([]))]
+
+        assert b"".join(chunks) == b"[]"
+
+
+class TestDiffEndpoint:
+    """Тесты эндпоинта отличий"""
+
+    @pytest.fixture
+    def app(self):
+        app = FastAPI()
+        app.include_router(dict_router)
+        return app
+
+    @pytest.mark.asyncio
+    async def test_streamed_response(self, app):
+        # Arrange
+        with patch("routers.dictionary.DictionaryService") as service:
+            service.get_dictionary_version = AsyncMock(return_value=1)
+            service.get_dictionary_diff = MagicMock(
+                return_value=_aiter([PositionDiff(**row) for row in ROWS])
+            )
+
+            # Act
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                response = await client.get(
+                    "/models/dictionaryDiff/",
+                    params={
+                        "dictionary": 3,
+                        "date_from": "2024-01-01",
+                        "date_to": "2024-06-01",
+                    },
+                )
+
+        # Assert
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()] == [1, 2]
+        service.get_dictionary_diff.assert_called_once_with(
+            3, date(2024, 1, 1), date(2024, 6, 1)
+        )
+
+    @pytest.mark.asyncio
+    async def test_unknown_dictionary(self, app):
+        with patch("routers.dictionary.DictionaryService") as service:
+            service.get_dictionary_version = AsyncMock(return_value=None)
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                response = await client.get(
+                    "/models/dictionaryDiff/",
+                    params={"dictionary": 3, "date_from": "2024-01-01"},
+                )
+
+        assert response.status_code == 404
@@ -0,0 +1,76 @@
+"""
+Тесты для вывода только выбранных атрибутов (attrs=CODE,NAME)
+"""
+
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from models.model_dictionary import DictionaryService
+from models.model_query import PositionQuery
+from routers.dictionary import parse_attrs
+
+
+@pytest.fixture(autouse=True)
+def no_archive():
+    with patch.object(
+        DictionaryService, "_archived_before", AsyncMock(return_value=None)
+    ):
+        yield
+
+
+class TestParseAttrs:
+    """Тесты разбора параметра attrs"""
+
+    def test_split_and_deduplicate(self):
+        assert parse_attrs("CODE, Descr,,NAME,CODE") == ["CODE", "Descr", "NAME"]
+
+    def test_case_preserved(self):
+        assert parse_attrs("Descr_BEL,descr_bel") == ["Descr_BEL", "descr_bel"]
+
+    @pytest.mark.parametrize("value", [None, "", " , "])
+    def test_all_attributes(self, value):
+        assert parse_attrs(value) is None
+
+
+class TestFetchPositions:
+    """Тесты передачи проекции в запрос"""
+
+    @pytest.mark.asyncio
+    async def test_projection_pushed_into_query(self):
+        # Arrange
+        with patch.object(PositionQuery, "fetch", autospec=True) as fetch:
+            # Act
+            await DictionaryService.get_dictionary_position_by_code(
+                1, "01", date(2024, 1, 1), ["CODE", "NAME"]
+            )
+
+        # Assert
+        query, values = fetch.await_args.args
+        assert query == PositionQuery(code=True, attrs=True)
+        assert values["attrs"] == ["CODE", "NAME"]
+
+    @pytest.mark.asyncio
+    async def test_without_projection(self):
+        with patch.object(PositionQuery, "fetch", autospec=True) as fetch:
+            await DictionaryService.get_dictionary_values(1, date(2024, 1, 1))
+
+        query, values = fetch.await_args.args
+        assert query == PositionQuery()
+        assert "attrs" not in values
+
+    @pytest.mark.asyncio
+    async def test_archived_date_reads_history(self):
+        # Arrange
+        archived_before = AsyncMock(return_value=date(2020, 1, 1))
+        with patch.object(PositionQuery, "fetch", autospec=True) as fetch, patch.object(
+            DictionaryService, "_archived_before", archived_before
+        ):
+            # Act
+            await DictionaryService.get_dictionary_values(1, date(2019, 6, 1))
+            await DictionaryService.get_dictionary_values(1, date(2020, 1, 1))
+
+        # Assert
+        queries = [call.args[0] for call in fetch.await_args_list]
+        assert queries == [PositionQuery(history=True), PositionQuery()]
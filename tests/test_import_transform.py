@@ -0,0 +1,228 @@
+"""
+Тесты векторного преобразования файла импорта
+"""
+
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.import_transform import iterrows_transform
+from models.model_attribute import AttributeManager
+
+ATTRIBUTES = {"CODE": {"id": 10}, "NAME": {"id": 11}, "COMMENT": {"id": 12}}
+
+
+@pytest.fixture
+def rows():
+    return pd.DataFrame(
+        {
+            "CODE": ["01", "02", "03"],
+            "NAME": ["Один", " NULL ", "Три"],
+            "COMMENT": [np.nan, "None", "есть"],
+            "UNKNOWN": ["x", "y", "z"],
+        },
+        index=[4, 7, 9],
+    )
+
+
+class TestToLongFormat:
+    """Тесты перевода в длинный формат"""
+
+    def test_values_and_nulls(self, rows):
+        # Act
+        data = AttributeManager._to_long_format(rows, [101, 102, 103], ATTRIBUTES)
+
+        # Assert
+        assert list(data.columns) == ["id_position", "id_attribute", "value"]
+        records = set(data.itertuples(index=False, name=None))
+        assert records == {
+            (101, 10, "01"),
+            (102, 10, "02"),
+            (103, 10, "03"),
+            (101, 11, "Один"),
+            (102, 11, None),
+            (103, 11, "Три"),
+            (101, 12, None),
+            (102, 12, None),
+            (103, 12, "есть"),
+        }
+
+    def test_same_as_iterrows(self, rows):
+        # Arrange
+        position_ids = [101, 102, 103]
+
+        # Act
+        data = AttributeManager._to_long_format(rows, position_ids, ATTRIBUTES)
+        expected = iterrows_transform(rows, position_ids, ATTRIBUTES)
+
+        # Assert
+        assert sorted(data.to_dict("records"), key=repr) == sorted(expected, key=repr)
+
+    def test_empty(self):
+        data = AttributeManager._to_long_format(
+            pd.DataFrame(columns=["CODE", "NAME"], dtype=str), [], ATTRIBUTES
+        )
+
+        assert data.empty
+
+
+class TestBulkInsertData:
+    """Тесты массовой вставки"""
+
+    @pytest.mark.asyncio
+    async def test_chunks_passed_as_arrays(self):
+        # Arrange
+        data = pd.DataFrame(
+            {
+                "id_position": [1, 2, 3],
+                "id_attribute": [10, 10, 10],
+                "value": ["a", None, "c"],
+            }
+        )
+        with patch("models.model_attribute.queries") as mock_queries, patch.object(
+            AttributeManager, "BULK_SIZE", 2
+        ):
+            execute = mock_queries.statement.return_value.execute = AsyncMock()
+
+            # Act
+            await AttributeManager._bulk_insert_data(
+                5, data, date(2024, 1, 1), date(9999, 12, 31)
+            )
+
+        # Assert
+        chunks = [call.args[0] for call in execute.await_args_list]
+        assert [chunk["id_positions"] for chunk in chunks] == [[1, 2], [3]]
+        assert chunks[0]["values"] == ["a", None]
+        assert chunks[1]["start_date"] == date(2024, 1, 1)
+        assert chunks[1]["id_dictionary"] == 5
+        assert "unnest" in mock_queries.statement.call_args.args[1]
+
+
+def _periods(rows):
+    return pd.DataFrame(
+        rows, columns=["code", "id_position", "start_date", "finish_date", "new"]
+    )
+
+
+class TestResolveRelations:
+    """Тесты построения связей соединением по коду"""
+
+    def test_new_and_existing_parents(self):
+        # Arrange
+        start, finish = date(2024, 1, 1), date(9999, 12, 31)
+        parents = _periods(
+            [
+                ("01", 1, date(2020, 1, 1), date(2024, 6, 1), False),
+                ("01", 2, date(2024, 6, 1), finish, False),
+                ("02", 11, start, finish, True),
+                ("03", 3, date(2000, 1, 1), date(2010, 1, 1), False),
+            ]
+        )
+        children = _periods(
+            [
+                ("01", 12, start, finish, True),
+                ("03", 13, start, finish, True),
+                ("02", 4, date(2023, 1, 1), date(2025, 1, 1), False),
+                ("01", 5, date(2023, 1, 1), finish, False),
+            ]
+        )
+
+        # Act
+        relations = AttributeManager._resolve_relations(children, parents)
+
+        # Assert
+        assert set(relations.itertuples(index=False, name=None)) == {
+            (12, 1, start, date(2024, 6, 1)),
+            (12, 2, date(2024, 6, 1), finish),
+            (4, 11, start, date(2025, 1, 1)),
+        }
+
+    def test_code_periods_skip_empty_parent(self):
+        # Arrange
+        existing = _periods([]).drop(columns="new")
+        imported = pd.DataFrame(
+            {"id_position": [1, 2], "id_attribute": [3, 3], "value": [None, "01"]}
+        )
+        dates = {"start_date": date(2024, 1, 1), "finish_date": date(9999, 12, 31)}
+
+        # Act
+        periods = AttributeManager._code_periods(existing, imported, dates)
+
+        # Assert
+        assert periods.to_dict("records") == [
+            {
+                "code": "01",
+                "id_position": 2,
+                "start_date": date(2024, 1, 1),
+                "finish_date": date(9999, 12, 31),
+                "new": True,
+            }
+        ]
+
+
+class TestImportRelations:
+    """Тесты связей при импорте"""
+
+    @pytest.mark.asyncio
+    async def test_relations_without_per_position_queries(self):
+        # Arrange
+        df = pd.DataFrame(
+            {"CODE": ["01", "02"], "NAME": ["a", "b"], "PARENT_CODE": ["E1", "01"]}
+        )
+        dates = {"start_date": date(2024, 1, 1), "finish_date": date(9999, 12, 31)}
+        existing = _periods(
+            [("E1", 7, date(2000, 1, 1), date(9999, 12, 31), False)]
+        ).drop(columns="new")
+        empty = existing.iloc[:0]
+        attributes = {"CODE": {"id": 1}, "NAME": {"id": 2}, "PARENT_CODE": {"id": 3}}
+        with patch.multiple(
+            AttributeManager,
+            _fetch_dates=AsyncMock(return_value=dates),
+            _get_attributes_info=AsyncMock(return_value=attributes),
+            _batch_create_positions=AsyncMock(return_value=[101, 102]),
+            _fetch_codes=AsyncMock(side_effect=[existing, empty]),
+            _bulk_insert_data=AsyncMock(),
+            _bulk_insert_relations=AsyncMock(),
+            _update_position_relations=AsyncMock(),
+        ), patch("models.model_attribute.change_feed") as feed:
+            feed.publish = AsyncMock()
+
+            # Act
+            await AttributeManager.import_data(1, df)
+
+            # Assert
+            relations = AttributeManager._bulk_insert_relations.await_args.args[0]
+            assert set(relations.itertuples(index=False, name=None)) == {
+                (101, 7, date(2024, 1, 1), date(9999, 12, 31)),
+                (102, 101, date(2024, 1, 1), date(9999, 12, 31)),
+            }
+            AttributeManager._update_position_relations.assert_not_awaited()
+
+
+class TestBulkInsertRelations:
+    """Тесты массовой вставки связей"""
+
+    @pytest.mark.asyncio
+    async def test_arrays(self):
+        relations = pd.DataFrame(
+            {
+                "id_positions": [1],
+                "id_parent_positions": [2],
+                "start_date": [date(2024, 1, 1)],
+                "finish_date": [date(9999, 12, 31)],
+            }
+        )
+        with patch("models.model_attribute.queries") as mock_queries:
+            execute = mock_queries.statement.return_value.execute = AsyncMock()
+
+            await AttributeManager._bulk_insert_relations(relations)
+
+        assert execute.await_args.args[0] == {
+            "id_positions": [1],
+            "id_parent_positions": [2],
+            "start_dates": [date(2024, 1, 1)],
+            "finish_dates": [date(9999, 12, 31)],
+        }
@@ -0,0 +1,157 @@
+"""
+Тесты проверки файла импорта без записи (dry-run)
+"""
+
+import time
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.model_attribute import AttributeManager
+from models.model_metadata import DictionaryMetadata
+
+METADATA = DictionaryMetadata(
+    dictionary_id=1,
+    start_date=date(2000, 1, 1),
+    finish_date=date(9999, 12, 31),
+    attributes={
+        "CODE": 1,
+        "NAME": 2,
+        "PARENT_CODE": 3,
+        "START_DATE": 4,
+        "FINISH_DATE": 5,
+    },
+    required_fields=["CODE", "NAME", "START_DATE"],
+    structure=[],
+    capacities={
+        "CODE": 4,
+        "NAME": 250,
+        "PARENT_CODE": 4,
+        "START_DATE": 10,
+        "FINISH_DATE": 10,
+    },
+)
+
+
+@pytest.fixture
+def metadata():
+    existing = pd.DataFrame(
+        {
+            "code": ["E1"],
+            "id_position": [7],
+            "start_date": [None],
+            "finish_date": [None],
+        }
+    )
+    with patch("models.model_attribute.MetadataCache") as cache, patch.object(
+        AttributeManager, "_fetch_codes", AsyncMock(return_value=existing)
+    ):
+        cache.get = AsyncMock(return_value=METADATA)
+        yield cache
+
+
+def _by_check(report):
+    return {(issue.check, issue.column): issue for issue in report.issues}
+
+
+class TestValidateImport:
+    """Тесты отчета о проверке"""
+
+    @pytest.mark.asyncio
+    async def test_valid_file(self, metadata):
+        # Arrange
+        df = pd.DataFrame(
+            {
+                "CODE": ["01", "02"],
+                "NAME": ["Один", "Два"],
+                "PARENT_CODE": [np.nan, "01"],
+                "START_DATE": ["2024-01-01", "2024-01-01"],
+                "FINISH_DATE": ["9999-12-31", np.nan],
+            }
+        )
+
+        # Act
+        report = await AttributeManager.validate_import(1, df)
+
+        # Assert
+        assert report.valid
+        assert report.rows == 2
+
+    @pytest.mark.asyncio
+    async def test_all_checks(self, metadata):
+        # Arrange
+        df = pd.DataFrame(
+            {
+                "CODE": ["01", "01", "02", "TOOLONG", "null"],
+                "NAME": ["a", "b", " ", "d", "e"],
+                "PARENT_CODE": ["E1", "XX", "01", np.nan, "02"],
+                "START_DATE": [
+                    "2024-01-01",
+                    "2024-13-01",
+                    "01.01.2024",
+                    "2024-05-01",
+                    "2024-01-01",
+                ],
+                "FINISH_DATE": [
+                    "2023-01-01",
+                    np.nan,
+                    np.nan,
+                    "2024-06-01",
+                    "2024-02-01",
+                ],
+                "EXTRA": ["x"] * 5,
+            }
+        )
+
+        # Act
+        report = await AttributeManager.validate_import(1, df)
+
+        # Assert
+        issues = _by_check(report)
+        assert not report.valid
+        assert issues[("unknown_column", "EXTRA")].count == 5
+        assert issues[("duplicate_code", "CODE")].rows == [2, 3]
+        assert issues[("missing_value", "CODE")].rows == [6]
+        assert issues[("missing_value", "NAME")].rows == [4]
+        assert issues[("unknown_parent", "PARENT_CODE")].values == ["XX"]
+        assert issues[("bad_date", "START_DATE")].values == [
+            "2024-13-01",
+            "01.01.2024",
+        ]
+        assert issues[("bad_period", "FINISH_DATE")].rows == [2]
+        assert issues[("over_capacity", "CODE")].values == ["TOOLONG"]
+
+    @pytest.mark.asyncio
+    async def test_missing_required_column(self, metadata):
+        df = pd.DataFrame({"CODE": ["01"], "NAME": ["a"]})
+
+        report = await AttributeManager.validate_import(1, df)
+
+        assert _by_check(report)[("missing_column", "START_DATE")].count == 1
+
+    @pytest.mark.asyncio
+    async def test_large_file_is_fast(self, metadata):
+        # Arrange
+        size = 200_000
+        codes = [f"{n:06d}" for n in range(size)]
+        df = pd.DataFrame(
+            {
+                "CODE": codes,
+                "NAME": [f"NAME {n}" for n in range(size)],
+                "PARENT_CODE": ["E1"] * size,
+                "START_DATE": ["2024-01-01"] * size,
+                "FINISH_DATE": ["9999-12-31"] * size,
+            }
+        )
+        with patch.dict(METADATA.capacities, {"CODE": 6, "PARENT_CODE": 6}):
+            started = time.perf_counter()
+
+            # Act
+            report = await AttributeManager.validate_import(1, df)
+
+        # Assert
+        assert report.valid, report.issues
+        assert time.perf_counter() - started < 10
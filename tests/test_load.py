@@ -0,0 +1,72 @@
+"""
+Тесты для генератора нагрузки benchmarks/load.py
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.load import Target, parse_mix, percentile, run_load
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v2/models/dictionary/")
+    async def dictionary():
+        return [{"id": 1, "attrs": [{"name": "CODE", "value": "001"}]}]
+
+    @app.get("/api/v2/models/dictionaryValueByCode/")
+    async def by_code(code: str):
+        if code == "bad":
+            return JSONResponse(content="error", status_code=500)
+        return []
+
+    return app
+
+
+class TestLoad:
+    """Тесты для генератора нагрузки"""
+
+    def test_percentile(self):
+        values = [float(value) for value in range(1, 101)]
+
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 50) is None
+
+    def test_parse_mix(self):
+        assert parse_mix("dictionary=2,EditPosition") == {
+            "dictionary": 2.0,
+            "EditPosition": 1.0,
+        }
+        with pytest.raises(ValueError):
+            parse_mix("unknown=1")
+        with pytest.raises(ValueError):
+            parse_mix("dictionary=0")
+
+    @pytest.mark.asyncio
+    async def test_run_load_reports_per_endpoint(self):
+        # Arrange
+        transport = ASGITransport(app=_app())
+        target = Target(
+            dictionary=1, date="2024-01-01", codes=["bad"], position_ids=[1]
+        )
+        mix = {"dictionary": 1, "dictionaryValueByCode": 1}
+
+        # Act
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            report = await run_load(
+                client, target, mix, rps=200, duration=0.2, concurrency=10
+            )
+
+        # Assert
+        endpoints = report["endpoints"]
+        assert report["total"]["requests"] == 40
+        assert endpoints["dictionary"]["error_rate"] == 0.0
+        assert endpoints["dictionaryValueByCode"]["error_rate"] == 1.0
+        assert endpoints["dictionaryValueByCode"]["statuses"] == {
+            "500": endpoints["dictionaryValueByCode"]["requests"]
+        }
+        assert endpoints["dictionary"]["p50"] is not None
@@ -0,0 +1,150 @@
+"""
+Тесты для модуля logging_config.py
+"""
+
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+import logging_config
+from logging_config import DebugSampler, JsonFormatter, LazyQueueHandler
+
+
+def _record(msg, *args, level=logging.DEBUG, name="test", **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def restore_root():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    logging_config.shutdown_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+class TestJsonFormatter:
+    """Тесты для форматирования записей в JSON"""
+
+    def test_format_with_extra(self):
+        # Arrange
+        record = _record("position %d", 5, level=logging.INFO, dictionary=7)
+
+        # Act
+        entry = json.loads(JsonFormatter().format(record))
+
+        # Assert
+        assert entry["message"] == "position 5"
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "test"
+        assert entry["dictionary"] == 7
+        assert "time" in entry
+
+    def test_format_exception(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord(
+                "test", logging.ERROR, __file__, 1, "failed", None, True
+            )
+            record.exc_info = sys.exc_info()
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert "ValueError: boom" in entry["exception"]
+
+
+class TestDebugSampler:
+    """Тесты для прореживания отладочных сообщений"""
+
+    def test_sample_every_nth_per_template(self):
+        # Arrange
+        sampler = DebugSampler(0.25)
+
+        # Act
+        passed = [sampler.filter(_record("a %d", n)) for n in range(8)]
+        other = sampler.filter(_record("b"))
+
+        # Assert
+        assert passed == [True, False, False, False, True, False, False, False]
+        assert other is True
+
+    def test_info_is_never_sampled(self):
+        sampler = DebugSampler(0.0)
+
+        assert sampler.filter(_record("x", level=logging.INFO))
+        assert not sampler.filter(_record("x"))
+
+
+class TestLazyQueueHandler:
+    """Тесты для передачи записей в поток записи"""
+
+    def test_prepare_merges_args_only(self):
+        # Arrange
+        handler = LazyQueueHandler(queue.SimpleQueue())
+        args = {"id": 1}
+        record = _record("values %s", args)
+
+        # Act
+        prepared = handler.prepare(record)
+        args["id"] = 2
+
+        # Assert
+        assert prepared.msg == "values {'id': 1}"
+        assert prepared.args is None
+
+
+class TestSetupLogging:
+    """Тесты для настройки журналирования"""
+
+    def test_setup_writes_json_off_loop(self, tmp_path, monkeypatch, restore_root):
+        # Arrange
+        settings = logging_config.settings
+        monkeypatch.setattr(settings, "log_file", str(tmp_path / "app.log"))
+        monkeypatch.setattr(settings, "slow_query_log_file", str(tmp_path / "s.log"))
+        monkeypatch.setattr(
+            settings, "slow_query_explain_file", str(tmp_path / "p.log")
+        )
+        monkeypatch.setattr(settings, "log_json", True)
+        monkeypatch.setattr(settings, "log_level", "INFO")
+
+        # Act
+        logging_config.setup_logging()
+        logging_config.setup_logging()
+        logging.getLogger("some.module").info("hello %s", "world")
+        logging.getLogger("some.module").debug("hidden")
+        logging.getLogger("slow_query").warning("slow")
+        logging.getLogger("slow_query.plan").info("plan")
+        logging_config.shutdown_logging()
+
+        # Assert
+        app_lines = (tmp_path / "app.log").read_text().splitlines()
+        messages = [json.loads(line)["message"] for line in app_lines]
+        assert messages == ["hello world", "slow"]
+        assert "slow" in (tmp_path / "s.log").read_text()
+        assert "plan" not in (tmp_path / "s.log").read_text()
+        assert "plan" in (tmp_path / "p.log").read_text()
+
+    def test_setup_creates_log_directory(self, tmp_path, monkeypatch, restore_root):
+        # Arrange
+        settings = logging_config.settings
+        log_file = tmp_path / "logs" / "app.log"
+        monkeypatch.setattr(settings, "log_file", str(log_file))
+        monkeypatch.setattr(settings, "slow_query_log_file", str(tmp_path / "s.log"))
+        monkeypatch.setattr(
+            settings, "slow_query_explain_file", str(tmp_path / "p.log")
+        )
+
+        # Act
+        logging_config.setup_logging()
+        logging.getLogger("some.module").warning("hello")
+        logging_config.shutdown_logging()
+
+        # Assert
+        assert "hello" in log_file.read_text()
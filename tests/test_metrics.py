@@ -0,0 +1,103 @@
+"""
+Тесты для модуля metrics.py
+"""
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+import metrics
+from cache import register_cache
+from metrics import Counter, Histogram, MetricsMiddleware, MetricsRegistry
+
+
+class TestMetrics:
+    """Тесты для метрик и их выгрузки"""
+
+    def test_counter_render(self):
+        # Arrange
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests", ("route",))
+
+        # Act
+        counter.inc("/a")
+        counter.inc("/a")
+        counter.inc('/b"x')
+        text = registry.render()
+
+        # Assert
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{route="/a"} 2' in text
+        assert 'requests_total{route="/b\\"x"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        # Arrange
+        histogram = Histogram("latency", "Latency", ("query",), buckets=(0.1, 1.0))
+
+        # Act
+        histogram.observe(0.05, "q")
+        histogram.observe(0.5, "q")
+        histogram.observe(5.0, "q")
+        samples = {
+            (name, labels.get("le")): value
+            for name, labels, value in histogram.samples()
+        }
+
+        # Assert
+        assert samples[("latency_bucket", "0.1")] == 1
+        assert samples[("latency_bucket", "1")] == 2
+        assert samples[("latency_bucket", "+Inf")] == 3
+        assert samples[("latency_count", None)] == 3
+        assert samples[("latency_sum", None)] == pytest.approx(5.55)
+
+    def test_wrong_labels(self):
+        counter = Counter("c", "C", ("a", "b"))
+
+        with pytest.raises(ValueError):
+            counter.inc("only_one")
+
+    def test_cache_hit_ratio(self):
+        # Arrange
+        cache = register_cache("metrics_test")
+        cache.set(1, None, "value")
+        cache.get(1)
+        cache.get(2)
+
+        # Act
+        text = metrics.registry.render()
+
+        # Assert
+        assert 'cache_hit_ratio{cache="metrics_test"} 0.5' in text
+        assert 'cache_entries{cache="metrics_test"} 1' in text
+
+
+class TestMetricsMiddleware:
+    """Тесты для учета HTTP-запросов"""
+
+    @pytest.mark.asyncio
+    async def test_route_template_and_rows(self):
+        # Arrange
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            metrics.observe_query("test.items", 0.01, 3, False)
+            return {"id": item_id}
+
+        transport = ASGITransport(app=app)
+        before = metrics.HTTP_REQUESTS.value("GET", "/items/{item_id}", "200")
+
+        # Act
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            await ac.get("/items/1")
+            await ac.get("/items/2")
+            await ac.get("/missing")
+
+        # Assert
+        assert metrics.HTTP_REQUESTS.value("GET", "/items/{item_id}", "200") == (
+            before + 2
+        )
+        assert metrics.HTTP_REQUESTS.value("GET", "unmatched", "404") >= 1
+        assert metrics.DB_QUERIES.value("test.items", "ok") >= 2
+        assert metrics.HTTP_REQUEST_ROWS.count("GET", "/items/{item_id}") >= 2
@@ -300,7 +300,7 @@ class TestAttributeManager:
 
             # Act
             await AttributeManager._delete_nested_period(
-                position_id, attribute_id, start_date, finish_date
+                1, position_id, attribute_id, start_date, finish_date
             )
 
             # Assert
@@ -314,7 +314,7 @@ class TestAttributeManager:
 
             # Act & Assert
             with pytest.raises(ValueError, match="Start date cannot be after finish date"):
-                await AttributeManager._delete_nested_period(1, 1, start_date, finish_date)
+                await AttributeManager._delete_nested_period(1, 1, 1, start_date, finish_date)
 
     class TestShiftPeriods:
         """Тесты для сдвига периодов"""
@@ -336,7 +336,7 @@ class TestAttributeManager:
 
             # Act
             result = await AttributeManager._shift_next_period(
-                position_id, attribute_id, finish_date, value
+                1, position_id, attribute_id, finish_date, value
             )
 
             # Assert
@@ -360,7 +360,7 @@ class TestAttributeManager:
 
             # Act
             result = await AttributeManager._shift_next_period(
-                position_id, attribute_id, finish_date, value
+                1, position_id, attribute_id, finish_date, value
             )
 
             # Assert
@@ -374,7 +374,7 @@ class TestAttributeManager:
             finish_date = date(2024, 6, 30)
 
             # Act
-            result = await AttributeManager._shift_next_period(1, 1, finish_date, "value")
+            result = await AttributeManager._shift_next_period(1, 1, 1, finish_date, "value")
 
             # Assert
             assert result == finish_date
@@ -397,7 +397,7 @@ class TestAttributeManager:
 
             # Act
             result = await AttributeManager._shift_previous_period(
-                position_id, attribute_id, start_date, value
+                1, position_id, attribute_id, start_date, value
             )
 
             # Assert
@@ -422,7 +422,7 @@ class TestAttributeManager:
 
             # Act
             result = await AttributeManager._shift_previous_period(
-                position_id, attribute_id, start_date, value
+                1, position_id, attribute_id, start_date, value
             )
 
             # Assert
@@ -606,7 +606,7 @@ class TestAttributeManager:
             # Act & Assert
             with pytest.raises(Exception):
                 await AttributeManager._delete_nested_period(
-                    1, 1, date(2024, 1, 1), date(2024, 12, 31)
+                    1, 1, 1, date(2024, 1, 1), date(2024, 12, 31)
                 )
 
 
@@ -0,0 +1,129 @@
+"""
+Тесты для модуля models/model_metadata.py
+"""
+
+import datetime
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from models.model_metadata import MetadataCache
+
+
+def _row(**values):
+    row = {
+        "dictionary_start_date": datetime.date(2024, 1, 1),
+        "dictionary_finish_date": datetime.date(9999, 12, 31),
+        "id": None,
+        "name": None,
+        "id_attribute_type": None,
+        "start_date": None,
+        "finish_date": None,
+        "required": None,
+        "capacity": None,
+        "alt_name": None,
+        "archived_before": None,
+    }
+    row.update(values)
+    return row
+
+
+def _attribute(attribute_id, alt_name, required=False):
+    return _row(
+        id=attribute_id,
+        name=alt_name.lower(),
+        id_attribute_type=1,
+        start_date=datetime.date(2024, 1, 1),
+        finish_date=datetime.date(9999, 12, 31),
+        required=required,
+        capacity=100,
+        alt_name=alt_name,
+    )
+
+
+@pytest.fixture
+def mock_queries():
+    MetadataCache._cache.clear()
+    MetadataCache._position_dictionary.clear()
+    statement = MagicMock()
+    statement.fetch_all = AsyncMock()
+    statement.fetch_one = AsyncMock()
+    with patch("models.model_metadata.queries") as mock:
+        mock.statement.return_value = statement
+        yield statement
+    MetadataCache._cache.clear()
+    MetadataCache._position_dictionary.clear()
+
+
+class TestMetadataCache:
+    """Тесты для кэша метаданных справочников"""
+
+    @pytest.mark.asyncio
+    async def test_get_loads_once(self, mock_queries):
+        # Arrange
+        mock_queries.fetch_all.return_value = [
+            _attribute(1, "CODE", required=True),
+            _attribute(2, "NAME", required=True),
+            _attribute(3, "Descr"),
+        ]
+
+        # Act
+        first = await MetadataCache.get(5)
+        second = await MetadataCache.get(5)
+
+        # Assert
+        assert first is second
+        assert mock_queries.fetch_all.await_count == 1
+        assert first.start_date == datetime.date(2024, 1, 1)
+        assert first.attributes == {"CODE": 1, "NAME": 2, "Descr": 3}
+        assert first.required_fields == ["CODE", "NAME"]
+        assert [attribute.alt_name for attribute in first.structure] == [
+            "CODE",
+            "NAME",
+            "DESCR",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_dictionary_without_attributes(self, mock_queries):
+        # Arrange
+        mock_queries.fetch_all.return_value = [_row()]
+
+        # Act
+        metadata = await MetadataCache.get(5)
+
+        # Assert
+        assert metadata.attributes == {}
+        assert metadata.structure == []
+
+    @pytest.mark.asyncio
+    async def test_get_not_found(self, mock_queries):
+        mock_queries.fetch_all.return_value = []
+
+        with pytest.raises(LookupError):
+            await MetadataCache.get(999)
+
+    @pytest.mark.asyncio
+    async def test_invalidate_reloads(self, mock_queries):
+        # Arrange
+        mock_queries.fetch_all.return_value = [_attribute(1, "CODE")]
+        await MetadataCache.get(5)
+
+        # Act
+        MetadataCache.invalidate(5)
+        await MetadataCache.get(5)
+
+        # Assert
+        assert mock_queries.fetch_all.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_dictionary_by_position_cached(self, mock_queries):
+        # Arrange
+        mock_queries.fetch_one.return_value = {"id_dictionary": 7}
+
+        # Act
+        first = await MetadataCache.dictionary_by_position(100)
+        second = await MetadataCache.dictionary_by_position(100)
+
+        # Assert
+        assert first == second == 7
+        assert mock_queries.fetch_one.await_count == 1
@@ -0,0 +1,84 @@
+"""
+Тесты для построителя запросов models/model_query.py
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from models.model_query import PositionQuery
+from queries import to_positional
+
+
+class TestPositionQuery:
+    """Тесты построения запроса позиций"""
+
+    def test_names_are_unique(self):
+        variants = [
+            PositionQuery(),
+            PositionQuery(position_id=True),
+            PositionQuery(code=True),
+            PositionQuery(search=True),
+            PositionQuery(code=True, attrs=True),
+        ]
+        assert len({query.name for query in variants}) == len(variants)
+        assert PositionQuery(code=True, attrs=True).name == "positions.code.attrs"
+
+    def test_parameters(self):
+        _, params = to_positional(PositionQuery().sql)
+        assert params == ["id_dictionary", "dt"]
+
+        _, params = to_positional(PositionQuery(position_id=True, attrs=True).sql)
+        assert set(params) == {"dt", "id_dictionary", "id_position", "attrs"}
+
+    def test_date_filter_keeps_outer_join(self):
+        sql = PositionQuery().sql
+        attributes = sql[sql.index("attributes AS") :]
+        join = attributes[attributes.index("left outer join") :]
+        assert ":dt between dd.start_date and dd.finish_date" in join.split(")")[0]
+        assert "where" not in attributes.split("SELECT")[0].lower()
+
+    def test_projection_in_attribute_join(self):
+        sql = PositionQuery(attrs=True).sql
+        assert (
+            "left join dictionary_attribute da on da.id_dictionary = pd.id_dictionary"
+            in sql
+        )
+        assert "and da.alt_name = any(:attrs)" in sql
+        # позиция без запрошенных атрибутов не теряется, attrs пустой
+        assert "filter (where attr_id is not null)" in sql
+        assert "'[]'::json" in sql
+
+    def test_data_filtered_by_dictionary(self):
+        sql = PositionQuery(code=True, search=True, paged=True).sql
+        joins = sql.split("dictionary_data ")[1:]
+        assert len(joins) == 4
+        for join in joins:
+            assert ".id_dictionary = :id_dictionary" in join[: join.index(":dt")]
+
+    def test_sql_built_once(self):
+        assert PositionQuery(search=True).sql is PositionQuery(search=True).sql
+
+    @pytest.mark.asyncio
+    async def test_fetch_parses_positions(self):
+        # Arrange
+        rows = [
+            {
+                "id": 1,
+                "parent_id": None,
+                "parent_code": None,
+                "attrs": '[{"name": "Код", "value": "001"}]',
+            }
+        ]
+        with patch("models.model_query.queries") as mock_queries:
+            mock_queries.statement.return_value.fetch_all = AsyncMock(return_value=rows)
+
+            # Act
+            result = await PositionQuery(code=True).fetch({"code": "001"})
+
+        # Assert
+        assert result[0].id == 1
+        assert result[0].attrs[0].value == "001"
+        mock_queries.statement.assert_called_once_with(
+            "positions.code", PositionQuery(code=True).sql, readonly=True
+        )
@@ -0,0 +1,186 @@
+"""
+Тесты для постраничного чтения pagination.py
+"""
+
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from models.model_query import PositionQuery
+from pagination import Cursor, ForeignCursorError, StaleCursorError, filter_hash
+from replicas import ReplicaPool
+from routers.dictionary import dict_router
+from schemas import AttrShown, DictionaryPosition
+
+
+def _positions(*ids):
+    return [
+        DictionaryPosition(id=i, attrs=[AttrShown(name="CODE", value=str(i))])
+        for i in ids
+    ]
+
+
+class TestCursor:
+    """Тесты кодирования курсора"""
+
+    def test_round_trip(self):
+        cursor = Cursor(
+            after=120, date=date(2024, 3, 1), version=7, dictionary=5, filters="f"
+        )
+
+        assert Cursor.decode(cursor.encode()) == cursor
+        assert "=" not in cursor.encode()
+
+    @pytest.mark.parametrize("value", ["", "%%%", "bm90IGpzb24", "e30"])
+    def test_malformed(self, value):
+        with pytest.raises(ValueError):
+            Cursor.decode(value)
+
+    def test_stale_version(self):
+        cursor = Cursor(
+            after=1, date=date(2024, 3, 1), version=7, dictionary=5, filters="f"
+        )
+
+        cursor.check(5, "f", 7)
+        with pytest.raises(StaleCursorError):
+            cursor.check(5, "f", 8)
+
+    @pytest.mark.parametrize("dictionary, filters", [(6, "f"), (5, "g")])
+    def test_foreign_cursor(self, dictionary, filters):
+        cursor = Cursor(
+            after=1, date=date(2024, 3, 1), version=7, dictionary=5, filters="f"
+        )
+
+        with pytest.raises(ForeignCursorError):
+            cursor.check(dictionary, filters, 7)
+
+    def test_filter_hash(self):
+        code = filter_hash("find", "ab", ["CODE"])
+
+        assert code == filter_hash("find", "ab", ["CODE"])
+        assert code != filter_hash("find", "ab", None)
+        assert len(filter_hash("dictionary", None)) == 12
+
+
+class TestPagedQuery:
+    """Тесты запроса страницы"""
+
+    def test_keyset_seek_inside_position_filter(self):
+        sql = PositionQuery(paged=True).sql
+
+        assert "dp.id > :after" in sql
+        assert "limit :limit" in sql
+        assert "offset" not in sql.lower()
+        assert sql.index("limit :limit") < sql.index("left join")
+
+
+class TestPagedEndpoint:
+    """Тесты чтения справочника страницами"""
+
+    @pytest.fixture
+    def service(self):
+        with patch("routers.dictionary.DictionaryService") as service:
+            service.get_dictionary_version = AsyncMock(return_value=3)
+            service.get_dictionary_values = AsyncMock()
+            yield service
+
+    @staticmethod
+    async def _get(params):
+        app = FastAPI()
+        app.include_router(dict_router)
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            return await client.get("/models/dictionary/", params=params)
+
+    @pytest.mark.asyncio
+    async def test_pages_follow_cursor(self, service):
+        # Arrange
+        service.get_dictionary_values.side_effect = [_positions(1, 2), _positions(3)]
+
+        # Act
+        first = await self._get({"dictionary": 5, "date": "2024-03-01", "limit": 2})
+        second = await self._get(
+            {"dictionary": 5, "limit": 2, "cursor": first.headers["x-next-cursor"]}
+        )
+
+        # Assert
+        assert [p["id"] for p in first.json()] == [1, 2]
+        assert [p["id"] for p in second.json()] == [3]
+        assert "x-next-cursor" not in second.headers
+        last_call = service.get_dictionary_values.await_args_list[1]
+        assert last_call.args == (5, date(2024, 3, 1), None, 2, 2)
+
+    @pytest.mark.asyncio
+    async def test_pages_read_on_primary(self, service):
+        # Arrange: версия и страница читаются из одного источника
+        pool = ReplicaPool(["postgresql://user@replica/db"], 1, 1)
+        pool.replicas[0].healthy = True
+        chosen = []
+
+        async def version(dictionary_id):
+            chosen.append(pool.choose())
+            return 3
+
+        async def values(*args):
+            chosen.append(pool.choose())
+            return _positions(1, 2)
+
+        service.get_dictionary_version.side_effect = version
+        service.get_dictionary_values.side_effect = values
+
+        # Act
+        await self._get({"dictionary": 5, "date": "2024-03-01", "limit": 2})
+
+        # Assert
+        assert chosen == [None, None]
+
+    @pytest.mark.asyncio
+    async def test_stale_cursor_rejected(self, service):
+        cursor = Cursor(
+            after=2,
+            date=date(2024, 3, 1),
+            version=2,
+            dictionary=5,
+            filters=filter_hash("dictionary", None),
+        ).encode()
+
+        response = await self._get({"dictionary": 5, "limit": 2, "cursor": cursor})
+
+        assert response.status_code == 409
+        service.get_dictionary_values.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"dictionary": 6, "limit": 2},
+            {"dictionary": 5, "limit": 2, "attrs": "CODE"},
+        ],
+        ids=["other dictionary", "other attrs"],
+    )
+    async def test_foreign_cursor_rejected(self, service, params):
+        # Arrange: курсор первой страницы справочника 5 без attrs
+        service.get_dictionary_values.return_value = _positions(1, 2)
+        first = await self._get({"dictionary": 5, "date": "2024-03-01", "limit": 2})
+        service.get_dictionary_values.reset_mock()
+
+        # Act
+        response = await self._get({**params, "cursor": first.headers["x-next-cursor"]})
+
+        # Assert
+        assert response.status_code == 400
+        service.get_dictionary_values.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_without_limit_reads_everything(self, service):
+        service.get_dictionary_values.return_value = _positions(1)
+
+        response = await self._get({"dictionary": 5, "date": "2024-03-01"})
+
+        assert response.status_code == 200
+        service.get_dictionary_version.assert_not_awaited()
+        assert service.get_dictionary_values.await_args.args[3:] == (0, None)
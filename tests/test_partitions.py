@@ -0,0 +1,178 @@
+"""
+Тесты секционирования данных по справочнику
+
+Запускаются только при наличии локального Postgres (TEST_DATABASE_URL):
+миграция 003 применяется к схеме partition_test, после чего проверяется,
+что запросы позиций справочника читают только его секции.
+"""
+
+import datetime
+import json
+import os
+import pathlib
+
+import pytest
+import pytest_asyncio
+
+from models.model_query import PositionQuery
+from queries import to_positional
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+MIGRATION = (
+    pathlib.Path(__file__).parent.parent
+    / "database"
+    / "migrations"
+    / "003_partition_by_dictionary.sql"
+)
+
+SCHEMA = """
+drop schema if exists partition_test cascade;
+create schema partition_test;
+set search_path = partition_test;
+create table dictionary (id serial primary key, name varchar);
+create table dictionary_attribute (
+    id integer generated always as identity primary key,
+    id_dictionary integer references dictionary, name varchar, alt_name varchar
+);
+create table dictionary_positions (
+    id integer generated always as identity
+        constraint dictionary_positions_pk primary key,
+    id_dictionary integer references dictionary
+);
+create table dictionary_data (
+    id integer generated always as identity primary key,
+    id_position integer references dictionary_positions,
+    id_attribute integer references dictionary_attribute,
+    value varchar, start_date date, finish_date date
+);
+create table dictionary_relations (
+    id integer generated always as identity primary key,
+    id_positions integer references dictionary_positions,
+    id_parent_positions integer references dictionary_positions,
+    start_date date, finish_date date
+);
+insert into dictionary (name) select 'dict ' || g from generate_series(1, 3) g;
+insert into dictionary_attribute (id_dictionary, name, alt_name)
+select d.id, a, a from dictionary d cross join unnest(array['CODE', 'NAME']) a;
+insert into dictionary_positions (id_dictionary)
+select d.id from dictionary d cross join generate_series(1, 100);
+insert into dictionary_data (id_position, id_attribute, value, start_date,
+    finish_date)
+select dp.id, da.id, da.alt_name || dp.id, date '2020-01-01', date '9999-12-31'
+from dictionary_positions dp
+join dictionary_attribute da on da.id_dictionary = dp.id_dictionary;
+"""
+
+
+def _scanned_relations(plan: dict) -> set:
+    found = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= _scanned_relations(child)
+    return found
+
+
+@pytest_asyncio.fixture
+async def connection():
+    asyncpg = pytest.importorskip("asyncpg")
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    await conn.execute(SCHEMA)
+    await conn.execute(MIGRATION.read_text())
+    yield conn
+    await conn.execute("drop schema partition_test cascade")
+    await conn.close()
+
+
+@pytest.mark.asyncio
+async def test_data_moved_to_partitions(connection):
+    counts = await connection.fetch(
+        "select tableoid::regclass::text as part, count(*) from dictionary_data "
+        "group by 1 order by 1"
+    )
+
+    assert [(row["part"], row["count"]) for row in counts] == [
+        ("dictionary_data_1", 200),
+        ("dictionary_data_2", 200),
+        ("dictionary_data_3", 200),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_query_reads_one_partition(connection):
+    # Arrange
+    values = {"id_dictionary": 2, "dt": datetime.date(2024, 1, 1)}
+    text, params = to_positional(PositionQuery().sql)
+
+    # Act
+    result = await connection.fetchval(
+        "EXPLAIN (FORMAT JSON) " + text, *[values[name] for name in params]
+    )
+
+    # Assert
+    scanned = _scanned_relations(json.loads(result)[0]["Plan"])
+    partitions = {name for name in scanned if name.startswith("dictionary_")}
+    assert partitions <= {
+        "dictionary_positions_2",
+        "dictionary_data_2",
+        "dictionary_attribute",
+        "dictionary_relations",
+    }, scanned
+
+
+@pytest.mark.asyncio
+async def test_new_dictionary_gets_partitions(connection):
+    # Arrange
+    dictionary_id = await connection.fetchval(
+        "insert into dictionary (name) values ('new') returning id"
+    )
+
+    # Act
+    await connection.execute("select create_dictionary_partitions($1)", dictionary_id)
+    position_id = await connection.fetchval(
+        "insert into dictionary_positions (id_dictionary) values ($1) returning id",
+        dictionary_id,
+    )
+
+    # Assert
+    part = await connection.fetchval(
+        "select tableoid::regclass::text from dictionary_positions where id = $1",
+        position_id,
+    )
+    assert part == f"dictionary_positions_{dictionary_id}"
+    assert position_id > 300
+
+
+@pytest.mark.asyncio
+async def test_relation_to_missing_position_rejected(connection):
+    asyncpg = pytest.importorskip("asyncpg")
+
+    # Act & Assert: внешний ключ заменен триггером
+    with pytest.raises(asyncpg.ForeignKeyViolationError):
+        await connection.execute(
+            "insert into dictionary_relations (id_positions, id_parent_positions, "
+            "start_date, finish_date) values (1, 100000, date '2020-01-01', "
+            "date '9999-12-31')"
+        )
+
+
+@pytest.mark.asyncio
+async def test_referenced_position_not_deleted(connection):
+    asyncpg = pytest.importorskip("asyncpg")
+
+    # Arrange
+    await connection.execute(
+        "insert into dictionary_relations (id_positions, id_parent_positions, "
+        "start_date, finish_date) values (2, 1, date '2020-01-01', "
+        "date '9999-12-31')"
+    )
+
+    # Act & Assert
+    with pytest.raises(asyncpg.ForeignKeyViolationError):
+        await connection.execute(
+            "delete from dictionary_data where id_position = 1;"
+            "delete from dictionary_positions where id = 1"
+        )
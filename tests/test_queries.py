@@ -0,0 +1,205 @@
+"""
+Тесты для реестра запросов queries.py
+"""
+
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from asyncpg import exceptions as pg_exceptions
+
+from queries import QueryRegistry, Statement, registry, to_positional
+
+
+@pytest.fixture
+def raw_connection():
+    """Мок соединения asyncpg"""
+    prepared = MagicMock()
+    prepared.fetch = AsyncMock(return_value=[{"id": 1}, {"id": 2}])
+    prepared.fetchrow = AsyncMock(return_value={"id": 1})
+    prepared.fetchval = AsyncMock(return_value=7)
+    prepared.executemany = AsyncMock()
+    raw = MagicMock()
+    raw.get_server_pid.return_value = 100
+    raw.prepare = AsyncMock(return_value=prepared)
+    raw.is_in_transaction.return_value = False
+    raw.transaction = MagicMock(return_value=AsyncMock())
+    return raw
+
+
+@pytest.fixture
+def mock_database(raw_connection):
+    """Мок базы данных, выдающий соединение raw_connection"""
+
+    @asynccontextmanager
+    async def connection():
+        yield MagicMock(raw_connection=raw_connection)
+
+    with patch("queries.database") as mock_db:
+        mock_db.connection = connection
+        yield mock_db
+
+
+class TestToPositional:
+    """Тесты перевода параметров"""
+
+    def test_repeated_parameters(self):
+        text, params = to_positional(
+            "select :a, :b where x between :a and :b and y = :c"
+        )
+        assert text == "select $1, $2 where x between $1 and $2 and y = $3"
+        assert params == ["a", "b", "c"]
+
+    def test_casts_are_not_parameters(self):
+        text, params = to_positional("select id::text || ':' || :v::int")
+        assert text == "select id::text || ':' || $1::int"
+        assert params == ["v"]
+
+
+class TestQueryRegistry:
+    """Тесты реестра запросов"""
+
+    def test_statement_registered_once(self):
+        reg = QueryRegistry()
+        first = reg.statement("q", "select :id")
+        second = reg.statement("q", "select :id")
+        assert first is second
+
+    def test_statement_name_conflict(self):
+        reg = QueryRegistry()
+        reg.statement("q", "select :id")
+        with pytest.raises(ValueError):
+            reg.statement("q", "select 1")
+
+
+class TestStatement:
+    """Тесты выполнения запросов"""
+
+    @pytest.mark.asyncio
+    async def test_prepared_once_per_connection(self, mock_database, raw_connection):
+        # Arrange
+        statement = Statement("test.prepared_once", "select id from t where a = :a")
+
+        # Act
+        await statement.fetch_all({"a": 1})
+        rows = await statement.fetch_all({"a": 2})
+
+        # Assert
+        assert rows == [{"id": 1}, {"id": 2}]
+        raw_connection.prepare.assert_awaited_once_with("select id from t where a = $1")
+        prepared = raw_connection.prepare.return_value
+        prepared.fetch.assert_awaited_with(2)
+        assert statement.calls == 2
+        assert statement.rows == 4
+
+    @pytest.mark.asyncio
+    async def test_execute_many(self, mock_database, raw_connection):
+        # Arrange
+        statement = Statement("test.many", "insert into t values (:a, :b)")
+
+        # Act
+        await statement.execute_many([{"a": 1, "b": 2}, {"b": 4, "a": 3}])
+
+        # Assert
+        prepared = raw_connection.prepare.return_value
+        prepared.executemany.assert_awaited_once_with([[1, 2], [3, 4]])
+
+    @pytest.mark.asyncio
+    async def test_closed_connection_forgotten(self, raw_connection):
+        # Arrange
+        queries = QueryRegistry()
+        statement = Statement("test.closed", "select 1")
+        await queries.prepared(raw_connection, statement)
+        (closed,) = raw_connection.add_termination_listener.call_args.args
+
+        # Act: соединение закрыто, его pid получило новое соединение
+        closed(raw_connection)
+        await queries.prepared(raw_connection, statement)
+
+        # Assert
+        assert len(queries._prepared) == 1
+        assert raw_connection.prepare.await_count == 2
+        assert raw_connection.add_termination_listener.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stale_statement_reprepared(self, mock_database, raw_connection):
+        # Arrange
+        statement = Statement("test.stale", "select :a")
+        prepared = raw_connection.prepare.return_value
+        prepared.fetchval.side_effect = [
+            pg_exceptions.InvalidSQLStatementNameError("gone"),
+            5,
+        ]
+
+        # Act
+        result = await statement.execute({"a": 1})
+
+        # Assert
+        assert result == 5
+        assert raw_connection.prepare.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_counted(self, mock_database, raw_connection):
+        # Arrange
+        statement = Statement("test.error", "select :a")
+        raw_connection.prepare.return_value.fetchrow.side_effect = Exception("boom")
+
+        # Act & Assert
+        with pytest.raises(Exception, match="boom"):
+            await statement.fetch_one({"a": 1})
+        assert statement.errors == 1
+        assert statement.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_iterate_streams_cursor(self, mock_database, raw_connection):
+        # Arrange
+        statement = Statement("test.iterate", "select id from t where a = :a")
+
+        async def cursor(*args, prefetch):
+            for row in ({"id": 1}, {"id": 2}, {"id": 3}):
+                yield row
+
+        raw_connection.prepare.return_value.cursor = MagicMock(side_effect=cursor)
+
+        # Act
+        rows = [row async for row in statement.iterate({"a": 5}, prefetch=2)]
+
+        # Assert
+        assert rows == [{"id": 1}, {"id": 2}, {"id": 3}]
+        raw_connection.prepare.return_value.cursor.assert_called_once_with(
+            5, prefetch=2
+        )
+        raw_connection.transaction.assert_called_once_with(readonly=False)
+        assert statement.calls == 1
+        assert statement.rows == 3
+
+    @pytest.mark.asyncio
+    async def test_iterate_connection_failure(self, mock_database):
+        # Arrange: ошибка возникает до получения соединения
+        statement = Statement("test.iterate_failure", "select 1")
+        error = pg_exceptions.InvalidSQLStatementNameError("gone")
+
+        @asynccontextmanager
+        async def connection():
+            raise error
+            yield  # pragma: no cover
+
+        mock_database.connection = connection
+
+        # Act
+        with pytest.raises(pg_exceptions.InvalidSQLStatementNameError) as raised:
+            [row async for row in statement.iterate()]
+
+        # Assert
+        assert raised.value is error
+        assert statement.errors == 1
+
+    def test_missing_parameter(self):
+        statement = Statement("test.missing", "select :a")
+        with pytest.raises(KeyError):
+            statement.args({})
+
+    def test_registry_stats(self):
+        registry.statement("test.stats", "select 1")
+        names = [item["name"] for item in registry.stats()]
+        assert "test.stats" in names
@@ -0,0 +1,319 @@
+"""
+Тесты планов запросов чтения позиций
+
+Запускаются только при наличии локального Postgres, адрес которого задается
+переменной окружения TEST_DATABASE_URL. Тест создает схему plan_test
+в исходном виде, применяет к ней все миграции (в том числе секционирование
+по справочнику), заполняет синтетическими справочниками и проверяет, что
+горячие запросы не переходят на последовательное чтение больших таблиц и
+секций других справочников.
+"""
+
+import datetime
+import json
+import os
+import pathlib
+import re
+from typing import Optional
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+
+from cache import invalidate_dictionary
+from models.model_dictionary import DictionaryService
+from models.model_metadata import DictionaryMetadata
+from models.model_query import PositionQuery
+from models.model_validity import CodeValidity
+from queries import to_positional
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+MIGRATIONS = pathlib.Path(__file__).parent.parent / "database" / "migrations"
+
+LARGE_TABLES = {"dictionary_positions", "dictionary_data", "dictionary_relations"}
+
+DICTIONARIES = 50
+POSITIONS = 200
+ATTRIBUTES = ["CODE", "NAME", "PARENT_CODE", "NAME_BEL", "NAME_ENG", "COMMENT"]
+
+SCHEMA = """
+drop schema if exists plan_test cascade;
+create schema plan_test;
+set search_path = plan_test;
+create table dictionary (
+    id serial primary key, name varchar, start_date date, finish_date date
+);
+create table dictionary_attribute (
+    id integer generated always as identity primary key,
+    id_dictionary integer references dictionary, name varchar, required boolean,
+    start_date date, finish_date date, capacity integer, alt_name varchar,
+    id_attribute_type integer
+);
+create unique index dictionary_attribute_id_dictionary_alt_name_uindex
+    on dictionary_attribute (id_dictionary, alt_name);
+create table dictionary_positions (
+    id integer generated always as identity primary key,
+    id_dictionary integer references dictionary
+);
+create table dictionary_data (
+    id integer generated always as identity primary key,
+    id_position integer references dictionary_positions,
+    id_attribute integer references dictionary_attribute,
+    value varchar, start_date date, finish_date date
+);
+create table dictionary_relations (
+    id integer generated always as identity primary key,
+    id_positions integer references dictionary_positions,
+    id_parent_positions integer references dictionary_positions,
+    start_date date, finish_date date
+);
+"""
+
+SEED = f"""
+insert into dictionary (name, start_date, finish_date)
+select 'dict ' || g, date '2000-01-01', date '9999-12-31'
+from generate_series(1, {DICTIONARIES}) g;
+
+select create_dictionary_partitions(id) from dictionary;
+
+insert into dictionary_attribute (id_dictionary, name, required, start_date,
+    finish_date, capacity, alt_name, id_attribute_type)
+select d.id, a.alt_name, true, d.start_date, d.finish_date, 250, a.alt_name, 0
+from dictionary d cross join unnest(array{ATTRIBUTES!r}) as a(alt_name);
+
+insert into dictionary_positions (id_dictionary)
+select d.id from dictionary d cross join generate_series(1, {POSITIONS});
+
+insert into dictionary_data (id_dictionary, id_position, id_attribute, value,
+    start_date, finish_date)
+select dp.id_dictionary, dp.id, da.id,
+    case da.alt_name
+        when 'CODE' then lpad(dp.id::text, 8, '0')
+        when 'PARENT_CODE' then lpad(((dp.id - 1) / 10 * 10 + 1)::text, 8, '0')
+        else da.alt_name || ' ' || dp.id
+    end,
+    p.start_date, p.start_date + 364
+from dictionary_positions dp
+join dictionary_attribute da on da.id_dictionary = dp.id_dictionary
+cross join (
+    select date '2020-01-01' + 365 * g as start_date from generate_series(0, 3) g
+) p;
+
+insert into dictionary_relations (id_positions, id_parent_positions,
+    start_date, finish_date)
+select dp.id, (dp.id - 1) / 10 * 10 + 1, date '2020-01-01', date '2023-12-31'
+from dictionary_positions dp;
+
+analyze;
+"""
+
+HOT_QUERIES = {
+    PositionQuery(): {},
+    PositionQuery(position_id=True): {"id_position": 1250},
+    PositionQuery(code=True): {"code": "0000002"},
+    PositionQuery(search=True): {"search": "NAME 2"},
+    PositionQuery(attrs=True): {"attrs": ["CODE", "NAME"]},
+    PositionQuery(paged=True): {"after": 1300, "limit": 50},
+}
+
+
+def _table(relation: str) -> str:
+    """Таблица, к которой относится секция (dictionary_data_7 -> dictionary_data)"""
+    return re.sub(r"_(\d+|default)$", "", relation)
+
+
+def _scanned_tables(plan: dict, node_type: Optional[str]) -> set:
+    found = set()
+    if node_type is None or plan.get("Node Type") == node_type:
+        found.add(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found |= _scanned_tables(child, node_type)
+    return found
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def connection():
+    asyncpg = pytest.importorskip("asyncpg")
+    conn = await asyncpg.connect(TEST_DATABASE_URL)
+    await conn.execute(SCHEMA)
+    for migration in sorted(MIGRATIONS.glob("*.sql")):
+        await conn.execute(migration.read_text())
+    await conn.execute(SEED)
+    yield conn
+    await conn.execute("drop schema plan_test cascade")
+    await conn.close()
+
+
+@pytest.mark.asyncio(loop_scope="module")
+@pytest.mark.parametrize("query", list(HOT_QUERIES), ids=lambda q: q.name)
+async def test_hot_query_does_not_seq_scan(connection, query):
+    # Arrange
+    values = {
+        "id_dictionary": 7,
+        "dt": datetime.date(2021, 6, 1),
+        **HOT_QUERIES[query],
+    }
+    text, params = to_positional(query.sql)
+
+    # Act
+    result = await connection.fetchval(
+        "EXPLAIN (FORMAT JSON) " + text, *[values[name] for name in params]
+    )
+    plan = json.loads(result)[0]["Plan"]
+
+    # Assert
+    # Последовательно можно читать только небольшие секции самого справочника
+    own = {f"{table}_{values['id_dictionary']}" for table in LARGE_TABLES}
+    seq_scans = {
+        relation
+        for relation in _scanned_tables(plan, "Seq Scan")
+        if _table(relation) in LARGE_TABLES and relation not in own
+    }
+    assert not seq_scans, json.dumps(plan, indent=2)
+
+
+@pytest.mark.asyncio(loop_scope="module")
+@pytest.mark.parametrize("query", list(HOT_QUERIES), ids=lambda q: q.name)
+async def test_hot_query_reads_own_partitions(connection, query):
+    # Arrange
+    values = {
+        "id_dictionary": 7,
+        "dt": datetime.date(2021, 6, 1),
+        **HOT_QUERIES[query],
+    }
+    text, params = to_positional(query.sql)
+
+    # Act
+    result = await connection.fetchval(
+        "EXPLAIN (FORMAT JSON) " + text, *[values[name] for name in params]
+    )
+    plan = json.loads(result)[0]["Plan"]
+
+    # Assert
+    partitions = {
+        relation
+        for relation in _scanned_tables(plan, None)
+        if relation and _table(relation) != relation
+    }
+    assert partitions <= {"dictionary_positions_7", "dictionary_data_7"}, partitions
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_missing_values_keep_attributes(connection):
+    # Arrange: у позиции нет значения COMMENT на дату
+    await connection.execute(
+        """delete from dictionary_data dd using dictionary_attribute da
+        where da.id = dd.id_attribute and da.alt_name = 'COMMENT'
+        and dd.id_position = 1401"""
+    )
+    text, params = to_positional(PositionQuery(position_id=True).sql)
+    values = {"id_dictionary": 8, "dt": datetime.date(2021, 6, 1), "id_position": 1401}
+
+    # Act
+    rows = await connection.fetch(text, *[values[name] for name in params])
+
+    # Assert
+    attrs = json.loads(rows[0]["attrs"])
+    assert len(attrs) == len(ATTRIBUTES)
+    assert {"name": "COMMENT", "value": None} in attrs
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_unknown_attrs_keep_positions(connection):
+    # Arrange: ни один alt_name не совпадает (регистр учитывается)
+    text, params = to_positional(PositionQuery(position_id=True, attrs=True).sql)
+    values = {
+        "id_dictionary": 8,
+        "dt": datetime.date(2021, 6, 1),
+        "id_position": 1402,
+        "attrs": ["code"],
+    }
+
+    # Act
+    rows = await connection.fetch(text, *[values[name] for name in params])
+
+    # Assert
+    assert [row["id"] for row in rows] == [1402]
+    assert json.loads(rows[0]["attrs"]) == []
+
+
+async def _code_metadata(connection, dictionary_id: int) -> DictionaryMetadata:
+    rows = await connection.fetch(
+        "select alt_name, id from dictionary_attribute where id_dictionary = $1",
+        dictionary_id,
+    )
+    return DictionaryMetadata(
+        dictionary_id=dictionary_id,
+        start_date=datetime.date(2000, 1, 1),
+        finish_date=datetime.date(9999, 12, 31),
+        attributes={row["alt_name"]: row["id"] for row in rows},
+        required_fields=[],
+        structure=[],
+    )
+
+
+async def _index_only_plan(connection, sql: str, values: dict) -> dict:
+    """План запроса, в котором последовательное чтение и bitmap запрещены"""
+    text, params = to_positional(sql)
+    await connection.execute("vacuum analyze dictionary_data")
+    async with connection.transaction():
+        await connection.execute("set local enable_seqscan = off")
+        await connection.execute("set local enable_bitmapscan = off")
+        result = await connection.fetchval(
+            "EXPLAIN (FORMAT JSON) " + text, *[values[name] for name in params]
+        )
+    return json.loads(result)[0]["Plan"]
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_code_map_index_only_scan(connection):
+    # Arrange: текст запроса get_code_map
+    invalidate_dictionary(7)
+    metadata = await _code_metadata(connection, 7)
+    with patch("models.model_dictionary.MetadataCache") as cache, patch(
+        "models.model_dictionary.queries"
+    ) as mock_queries:
+        cache.get = AsyncMock(return_value=metadata)
+        mock_queries.statement.return_value.fetch_all = AsyncMock(return_value=[])
+        await DictionaryService.get_code_map(7, datetime.date(2021, 6, 1))
+    _, sql = mock_queries.statement.call_args.args
+    values = {
+        "id_dictionary": 7,
+        "code_attribute": metadata.attributes["CODE"],
+        "dt": datetime.date(2021, 6, 1),
+    }
+
+    # Act
+    plan = await _index_only_plan(connection, sql, values)
+
+    # Assert
+    assert "dictionary_data_7" in _scanned_tables(plan, "Index Only Scan"), json.dumps(
+        plan, indent=2
+    )
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_code_intervals_index_only_scan(connection):
+    # Arrange: текст запроса CodeValidity._load
+    metadata = await _code_metadata(connection, 7)
+    with patch("models.model_validity.MetadataCache") as cache, patch(
+        "models.model_validity.queries"
+    ) as mock_queries:
+        cache.get = AsyncMock(return_value=metadata)
+        mock_queries.statement.return_value.fetch_all = AsyncMock(return_value=[])
+        await CodeValidity._load(7)
+    _, sql = mock_queries.statement.call_args.args
+    values = {"id_dictionary": 7, "code_attribute": metadata.attributes["CODE"]}
+
+    # Act
+    plan = await _index_only_plan(connection, sql, values)
+
+    # Assert
+    assert "dictionary_data_7" in _scanned_tables(plan, "Index Only Scan"), json.dumps(
+        plan, indent=2
+    )
@@ -0,0 +1,148 @@
+"""
+Тесты для чтения с реплик replicas.py
+"""
+
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from queries import Statement
+from replicas import ReadYourWritesMiddleware, ReplicaPool, read_primary
+
+
+def _pool(*healthy):
+    pool = ReplicaPool(
+        [f"postgresql://u:p@replica{n}/db" for n in range(len(healthy))], 5, 1
+    )
+    for replica, state in zip(pool.replicas, healthy, strict=True):
+        replica.healthy = state
+    return pool
+
+
+def _database(value):
+    prepared = MagicMock()
+    prepared.fetchval = AsyncMock(return_value=value)
+    raw = MagicMock()
+    raw.get_server_pid.return_value = 100
+    raw.prepare = AsyncMock(return_value=prepared)
+    raw.is_in_transaction.return_value = False
+
+    @asynccontextmanager
+    async def connection():
+        yield MagicMock(raw_connection=raw)
+
+    db = MagicMock()
+    db.connection = connection
+    return db
+
+
+class TestReplicaPool:
+    """Тесты выбора реплики"""
+
+    def test_round_robin_skips_unhealthy(self):
+        # Arrange
+        pool = _pool(True, False, True)
+
+        # Act
+        chosen = [pool.choose().name for _ in range(4)]
+
+        # Assert
+        assert chosen == ["replica0/db", "replica2/db", "replica0/db", "replica2/db"]
+
+    def test_no_healthy_replicas(self):
+        assert _pool(False, False).choose() is None
+        assert _pool().choose() is None
+
+    def test_read_primary(self):
+        pool = _pool(True)
+
+        with read_primary():
+            assert pool.choose() is None
+        assert pool.choose() is pool.replicas[0]
+
+    @pytest.mark.asyncio
+    async def test_check_marks_replicas(self):
+        # Arrange
+        pool = _pool(False, True)
+        for replica, result in zip(pool.replicas, [1, OSError("refused")], strict=True):
+            replica.database = MagicMock(is_connected=True)
+            replica.database.fetch_val = AsyncMock(side_effect=[result])
+
+        # Act
+        await pool.check()
+
+        # Assert
+        assert [replica.healthy for replica in pool.replicas] == [True, False]
+
+
+class TestReadYourWritesMiddleware:
+    """Тесты заголовка X-Read-Your-Writes"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "headers, expected",
+        [
+            ([(b"x-read-your-writes", b"1")], None),
+            ([(b"x-read-your-writes", b"false")], "replica"),
+            ([], "replica"),
+        ],
+    )
+    async def test_header(self, headers, expected):
+        # Arrange
+        pool = _pool(True)
+        chosen = []
+
+        async def app(scope, receive, send):
+            replica = pool.choose()
+            chosen.append(replica and "replica")
+
+        middleware = ReadYourWritesMiddleware(app)
+
+        # Act
+        await middleware({"type": "http", "headers": headers}, None, None)
+
+        # Assert
+        assert chosen == [expected]
+
+
+class TestReadonlyStatement:
+    """Тесты выполнения запросов только на чтение"""
+
+    @pytest.mark.asyncio
+    async def test_readonly_uses_replica(self):
+        # Arrange
+        pool = _pool(True)
+        pool.replicas[0].database = _database("replica")
+        statement = Statement("test.replica", "select :a", readonly=True)
+        writer = Statement("test.primary", "select :a")
+
+        # Act
+        with patch("queries.replica_pool", pool), patch(
+            "queries.database", _database("primary")
+        ):
+            read = await statement.execute({"a": 1})
+            written = await writer.execute({"a": 1})
+
+        # Assert
+        assert read == "replica"
+        assert written == "primary"
+
+    @pytest.mark.asyncio
+    async def test_connection_error_falls_back_to_primary(self):
+        # Arrange
+        pool = _pool(True)
+        broken = _database(None)
+        broken.connection = MagicMock(side_effect=OSError("refused"))
+        pool.replicas[0].database = broken
+        statement = Statement("test.fallback", "select :a", readonly=True)
+
+        # Act
+        with patch("queries.replica_pool", pool), patch(
+            "queries.database", _database("primary")
+        ):
+            result = await statement.execute({"a": 1})
+
+        # Assert
+        assert result == "primary"
+        assert pool.replicas[0].healthy is False
@@ -0,0 +1,249 @@
+"""
+Тесты для модуля snapshots.py
+"""
+
+import gzip
+import json
+import os
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from cache import invalidate_dictionary
+from schemas import AttrShown, DictionaryPosition
+from snapshots import SnapshotPublisher, parse_accept_encoding, zstandard
+
+
+@pytest.fixture
+def positions():
+    return [DictionaryPosition(id=1, attrs=[AttrShown(name="CODE", value="001")])]
+
+
+@pytest.fixture
+def mock_service(positions):
+    with patch("snapshots.DictionaryService") as service:
+        service.get_dictionary_version = AsyncMock(return_value=4)
+        service.get_snapshot_interval = AsyncMock(
+            return_value=(date(2024, 1, 1), date(2024, 6, 30))
+        )
+        service.get_dictionary_values = AsyncMock(return_value=positions)
+        yield service
+
+
+class TestParseAcceptEncoding:
+    """Тесты разбора Accept-Encoding"""
+
+    def test_weights(self):
+        result = parse_accept_encoding("gzip;q=0.5, zstd, br;q=0")
+        assert result == {"gzip": 0.5, "zstd": 1.0, "br": 0.0}
+
+    def test_empty(self):
+        assert parse_accept_encoding("") == {}
+
+
+class TestSnapshotPublisher:
+    """Тесты публикации срезов"""
+
+    @pytest.mark.asyncio
+    async def test_publish_writes_compressed_files(self, tmp_path, mock_service):
+        # Arrange
+        publisher = SnapshotPublisher(str(tmp_path))
+
+        # Act
+        snapshot = await publisher.get(1, date(2024, 3, 1))
+
+        # Assert
+        assert snapshot.path == os.path.join(
+            str(tmp_path), "1", "4", "2024-01-01_2024-06-30.json"
+        )
+        with open(snapshot.path, "rb") as file:
+            body = file.read()
+        with open(snapshot.path + ".gz", "rb") as file:
+            assert gzip.decompress(file.read()) == body
+        assert b'"CODE"' in body
+
+    @pytest.mark.asyncio
+    async def test_snapshot_reused_inside_interval(self, tmp_path, mock_service):
+        # Arrange
+        publisher = SnapshotPublisher(str(tmp_path))
+        await publisher.get(1, date(2024, 3, 1))
+
+        # Act
+        await publisher.get(1, date(2024, 5, 1))
+
+        # Assert
+        mock_service.get_dictionary_values.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_snapshot_found_on_disk(self, tmp_path, mock_service):
+        # Arrange
+        await SnapshotPublisher(str(tmp_path)).get(1, date(2024, 3, 1))
+        publisher = SnapshotPublisher(str(tmp_path))
+
+        # Act
+        snapshot = await publisher.get(1, date(2024, 2, 1))
+
+        # Assert
+        assert snapshot.finish_date == date(2024, 6, 30)
+        mock_service.get_dictionary_values.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_unknown_dictionary(self, tmp_path, mock_service):
+        mock_service.get_dictionary_version.return_value = None
+        with pytest.raises(LookupError):
+            await SnapshotPublisher(str(tmp_path)).get(99, date(2024, 3, 1))
+
+    @pytest.mark.asyncio
+    async def test_response_negotiation(self, tmp_path, mock_service):
+        # Arrange
+        publisher = SnapshotPublisher(str(tmp_path))
+        snapshot = await publisher.get(1, date(2024, 3, 1))
+
+        # Act
+        gzip_response = publisher.response(snapshot, "gzip")
+        plain_response = publisher.response(snapshot, "identity")
+
+        # Assert
+        assert gzip_response.headers["content-encoding"] == "gzip"
+        assert gzip_response.path == snapshot.path + ".gz"
+        assert "content-encoding" not in plain_response.headers
+        assert plain_response.path == snapshot.path
+        if zstandard is not None:
+            zstd_response = publisher.response(snapshot, "gzip, zstd")
+            assert zstd_response.headers["content-encoding"] == "zstd"
+
+    @pytest.mark.asyncio
+    async def test_response_missing_variant_falls_back_to_gzip(
+        self, tmp_path, mock_service
+    ):
+        # Arrange
+        publisher = SnapshotPublisher(str(tmp_path))
+        snapshot = await publisher.get(1, date(2024, 3, 1))
+        for extension in (".zst", ".br"):
+            if os.path.exists(snapshot.path + extension):
+                os.remove(snapshot.path + extension)
+
+        # Act
+        response = publisher.response(snapshot, "zstd, br, gzip")
+
+        # Assert
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.path == snapshot.path + ".gz"
+
+    @pytest.mark.asyncio
+    async def test_previous_version_kept(self, tmp_path, mock_service):
+        # Arrange: срезы версий 2, 3 и 4
+        for version in (2, 3, 4):
+            mock_service.get_dictionary_version.return_value = version
+            await SnapshotPublisher(str(tmp_path)).get(1, date(2024, 3, 1))
+
+        # Act: новая версия
+        mock_service.get_dictionary_version.return_value = 5
+        await SnapshotPublisher(str(tmp_path)).get(1, date(2024, 3, 1))
+
+        # Assert: удалены только версии старше предыдущей
+        assert sorted(os.listdir(tmp_path / "1")) == ["4", "5"]
+
+    @pytest.mark.asyncio
+    async def test_deleted_file_republished(self, tmp_path, mock_service):
+        # Arrange
+        publisher = SnapshotPublisher(str(tmp_path))
+        snapshot = await publisher.get(1, date(2024, 3, 1))
+        os.remove(snapshot.path)
+
+        # Act
+        with pytest.raises(FileNotFoundError):
+            publisher.response(snapshot, "identity")
+        republished = await publisher.get(1, date(2024, 3, 1))
+
+        # Assert
+        assert os.path.exists(republished.path)
+        assert mock_service.get_dictionary_values.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidation_during_scan(self, tmp_path, mock_service):
+        # Arrange: срез версии 4 уже на диске
+        await SnapshotPublisher(str(tmp_path)).get(1, date(2024, 3, 1))
+        publisher = SnapshotPublisher(str(tmp_path))
+        scan = publisher._scan
+
+        def scan_and_change(dictionary_id, version):
+            found = scan(dictionary_id, version)
+            mock_service.get_dictionary_version.return_value = 5
+            invalidate_dictionary(dictionary_id)
+            return found
+
+        # Act: справочник изменился, пока просматривался каталог
+        with patch.object(publisher, "_scan", scan_and_change):
+            stale = await publisher.get(1, date(2024, 3, 1))
+        fresh = await publisher.get(1, date(2024, 3, 1))
+
+        # Assert: список срезов версии 4 не остался в индексе
+        assert stale.version == 4
+        assert fresh.version == 5
+
+    @pytest.mark.asyncio
+    async def test_locks_released(self, tmp_path, mock_service):
+        # Arrange
+        publisher = SnapshotPublisher(str(tmp_path))
+
+        # Act
+        for dictionary_id in range(1, 20):
+            await publisher.get(dictionary_id, date(2024, 3, 1))
+
+        # Assert: блокировки не накапливаются
+        assert len(publisher._locks) == 0
+
+
+class TestBatch:
+    """Тесты получения нескольких срезов"""
+
+    @pytest.mark.asyncio
+    async def test_cached_served_without_database(self, tmp_path, mock_service):
+        # Arrange
+        publisher = SnapshotPublisher(str(tmp_path))
+        await publisher.get(1, date(2024, 3, 1))
+        mock_service.get_dictionary_version.reset_mock()
+
+        # Act
+        snapshots = await publisher.get_many([1, 1], date(2024, 4, 1), 2)
+
+        # Assert
+        assert list(snapshots) == [1]
+        mock_service.get_dictionary_version.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_missing_published_and_unknown_null(self, tmp_path, mock_service):
+        # Arrange
+        publisher = SnapshotPublisher(str(tmp_path))
+        mock_service.get_dictionary_version.side_effect = lambda id: (
+            None if id == 99 else 4
+        )
+
+        # Act
+        snapshots = await publisher.get_many([2, 99, 3], date(2024, 3, 1), 2)
+        body = await publisher.batch_body(snapshots)
+
+        # Assert
+        assert list(snapshots) == [2, 99, 3]
+        assert snapshots[99] is None
+        result = json.loads(body)
+        assert list(result) == ["2", "99", "3"]
+        assert result["99"] is None
+        assert result["2"][0]["attrs"][0]["value"] == "001"
+        assert mock_service.get_dictionary_values.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_deleted_file_republished_in_batch(self, tmp_path, mock_service):
+        # Arrange: файл удален после get_many
+        publisher = SnapshotPublisher(str(tmp_path))
+        snapshots = await publisher.get_many([1], date(2024, 3, 1), 1)
+        os.remove(snapshots[1].path)
+
+        # Act
+        body = await publisher.batch_body(snapshots)
+
+        # Assert
+        assert json.loads(body)["1"][0]["attrs"][0]["value"] == "001"
+        assert mock_service.get_dictionary_values.await_count == 2
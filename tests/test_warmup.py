@@ -0,0 +1,81 @@
+"""
+Тесты для модуля warmup.py
+"""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from warmup import WarmUp
+
+
+class TestWarmUp:
+    """Тесты для прогрева кэшей"""
+
+    @pytest.mark.asyncio
+    async def test_ready_after_all_dictionaries(self):
+        # Arrange
+        warmup = WarmUp([1, 2, 3], concurrency=2)
+
+        with patch.object(WarmUp, "warm_dictionary", new_callable=AsyncMock) as warm:
+            # Act
+            assert warmup.status()["status"] == "warming"
+            await warmup.run()
+
+        # Assert
+        assert warmup.ready
+        assert sorted(call.args[0] for call in warm.await_args_list) == [1, 2, 3]
+        assert warmup.status()["status"] == "ready"
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        # Arrange
+        warmup = WarmUp(list(range(10)), concurrency=3)
+        active, peak = 0, 0
+
+        async def warm(dictionary_id):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+        with patch.object(WarmUp, "warm_dictionary", side_effect=warm):
+            # Act
+            await warmup.run()
+
+        # Assert
+        assert peak == 3
+
+    @pytest.mark.asyncio
+    async def test_failure_does_not_block_readiness(self):
+        # Arrange
+        warmup = WarmUp([1, 2], concurrency=2)
+
+        async def warm(dictionary_id):
+            if dictionary_id == 2:
+                raise LookupError("Dictionary 2 not found")
+
+        with patch.object(WarmUp, "warm_dictionary", side_effect=warm):
+            # Act
+            await warmup.run()
+
+        # Assert
+        assert warmup.ready
+        assert warmup.status()["failed"] == [2]
+
+    @pytest.mark.asyncio
+    async def test_warm_dictionary_loads_metadata_and_snapshot(self):
+        with patch(
+            "warmup.MetadataCache.get", new_callable=AsyncMock
+        ) as metadata, patch(
+            "warmup.DictionaryService.get_dictionary_structure", new_callable=AsyncMock
+        ) as structure, patch(
+            "warmup.snapshot_publisher.get", new_callable=AsyncMock
+        ) as snapshot:
+            await WarmUp.warm_dictionary(5)
+
+        metadata.assert_awaited_once_with(5)
+        structure.assert_awaited_once_with(5)
+        assert snapshot.await_args.args[0] == 5
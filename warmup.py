@@ -0,0 +1,111 @@
+"""
+Прогрев кэшей после запуска
+
+После деплоя все кэши процесса пусты, и первые запросы к популярным
+справочникам одновременно уходят в тяжелые запросы к Postgres. При старте
+для справочников из settings.warmup_dictionaries заранее загружаются
+метаданные и структура (MetadataCache) и публикуется срез на текущую дату
+(snapshot_publisher). Прогрев идет в фоне с ограничением параллельности,
+а эндпоинт готовности (/ready) отвечает успехом только после его окончания.
+"""
+
+import asyncio
+import datetime
+import logging
+import time
+from typing import Dict, List, Optional
+
+from config import settings
+from models.model_dictionary import DictionaryService
+from models.model_metadata import MetadataCache
+from snapshots import snapshot_publisher
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """
+    Фоновый прогрев кэшей справочников
+    """
+
+    def __init__(self, dictionary_ids: List[int], concurrency: int):
+        self.dictionary_ids = dictionary_ids
+        self.concurrency = max(1, concurrency)
+        self.ready = False
+        # идентификатор справочника -> "ok" или текст ошибки
+        self.results: Dict[int, str] = {}
+        self.duration: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запуск прогрева в фоне"""
+        self.ready = False
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """Остановка незавершенного прогрева"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self) -> None:
+        """
+        Прогрев всех справочников; ошибки отдельных справочников
+        не мешают готовности сервиса
+        """
+        started = time.perf_counter()
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def warm(dictionary_id: int) -> None:
+            async with slots:
+                try:
+                    await self.warm_dictionary(dictionary_id)
+                    self.results[dictionary_id] = "ok"
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning(
+                        "Warm-up of dictionary %d failed: %s", dictionary_id, e
+                    )
+                    self.results[dictionary_id] = str(e)
+
+        await asyncio.gather(
+            *(warm(dictionary_id) for dictionary_id in self.dictionary_ids)
+        )
+        self.duration = time.perf_counter() - started
+        self.ready = True
+        logger.info(
+            "Warm-up finished: %d dictionaries in %.1fs",
+            len(self.dictionary_ids),
+            self.duration,
+        )
+
+    @staticmethod
+    async def warm_dictionary(dictionary_id: int) -> None:
+        """
+        Прогрев одного справочника: метаданные, структура и срез на сегодня
+        :param dictionary_id: идентификатор справочника
+        """
+        await MetadataCache.get(dictionary_id)
+        await DictionaryService.get_dictionary_structure(dictionary_id)
+        await snapshot_publisher.get(dictionary_id, datetime.date.today())
+
+    def status(self) -> dict:
+        """Состояние прогрева для эндпоинта готовности"""
+        return {
+            "status": "ready" if self.ready else "warming",
+            "dictionaries": len(self.dictionary_ids),
+            "warmed": len(self.results),
+            "failed": sorted(
+                dictionary_id
+                for dictionary_id, result in self.results.items()
+                if result != "ok"
+            ),
+            "duration": self.duration,
+        }
+
+
+warmup = WarmUp(settings.warmup_dictionaries, settings.warmup_concurrency)